@@ -0,0 +1,206 @@
+"""
+Batch processing of many videos from a job manifest.
+
+Jobs run on a bounded pool of worker processes. Each worker creates its
+detector backend once and reuses it for every job it picks up. Every job
+writes a status file that is updated when the job starts and finishes.
+
+Manifest format (JSON):
+
+    {
+        "defaults": {"trajectories_only": true},
+        "jobs": [
+            {
+                "name": "camera_1",
+                "video": "Detection/test_footage/1.mp4",
+                "output_csv": "Detection/output/camera_1.csv",
+                "start_time": "0:10",
+                "end_time": 80
+            }
+        ]
+    }
+
+start_time and end_time are seconds or "MM:SS"/"H:MM:SS" strings. Any other
+job or default key is passed to VehicleTracker (e.g. "frame_stride").
+"""
+
+import os
+import json
+import time
+import traceback
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from detection_config import *
+from detection_utils import ensure_directory_exists, parse_time_string
+from inference_pool import _configure_worker
+from detector_backends import create_detector_backend
+
+JOB_FIELDS = ('name', 'video', 'output_csv', 'output_video', 'start_time', 'end_time', 'status_path')
+
+# Detector backend created once per worker process by _init_worker
+_worker_backend = None
+
+def _parse_job_time(value):
+    """Convert a manifest time (seconds or time string) to seconds."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return parse_time_string(value)
+
+def load_manifest(manifest_path):
+    """
+    Read a job manifest and fill in defaults.
+
+    Args:
+        manifest_path: Path to the JSON manifest
+
+    Returns:
+        list: Job dicts with name, video, output_csv, output_video, start_time,
+              end_time, status_path and the VehicleTracker options
+    """
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    if isinstance(manifest, list):
+        manifest = {'jobs': manifest}
+
+    defaults = manifest.get('defaults', {})
+    jobs = []
+    for index, entry in enumerate(manifest.get('jobs', [])):
+        entry = {**defaults, **entry}
+        if 'video' not in entry or 'output_csv' not in entry:
+            raise ValueError(f"Job {index} in {manifest_path} needs 'video' and 'output_csv'")
+
+        output_csv = entry['output_csv']
+        job = {
+            'name': entry.get('name') or os.path.splitext(os.path.basename(entry['video']))[0],
+            'video': entry['video'],
+            'output_csv': output_csv,
+            'output_video': entry.get('output_video'),
+            'start_time': _parse_job_time(entry.get('start_time')),
+            'end_time': _parse_job_time(entry.get('end_time')),
+            'status_path': entry.get('status_path') or os.path.splitext(output_csv)[0] + ".status.json",
+            'options': {key: value for key, value in entry.items() if key not in JOB_FIELDS}
+        }
+
+        # Without an output video the job only needs trajectories
+        if job['output_video'] is None:
+            job['options'].setdefault('trajectories_only', True)
+        jobs.append(job)
+
+    return jobs
+
+def write_status(status_path, status):
+    """Write a job status file, replacing it atomically."""
+    ensure_directory_exists(status_path)
+    temp_path = status_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(status, f, indent=2)
+    os.replace(temp_path, status_path)
+
+def _init_worker(model_path, detector_backend, torch_threads, opencv_threads):
+    """Configure a batch worker process and create its detector backend."""
+    global _worker_backend
+    _configure_worker(torch_threads, opencv_threads, None)
+
+    _worker_backend = create_detector_backend(detector_backend, model_path, threads=torch_threads)
+
+def _run_job(job, model_path):
+    """Run one job in a worker process with the worker's detector backend."""
+    from vehicle_tracker import VehicleTracker
+
+    status = {
+        'name': job['name'],
+        'video': job['video'],
+        'output_csv': job['output_csv'],
+        'output_video': job['output_video'],
+        'start_time': job['start_time'],
+        'end_time': job['end_time'],
+        'state': 'running',
+        'pid': os.getpid(),
+        'started_at': time.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    write_status(job['status_path'], status)
+
+    job_start = time.time()
+    try:
+        # Jobs already run in parallel, so each one tracks in-process
+        options = {'inference_workers': 0, **job['options']}
+        tracker = VehicleTracker(
+            job['video'],
+            model_path,
+            output_video_path=job['output_video'],
+            output_csv_path=job['output_csv'],
+            start_time=job['start_time'],
+            end_time=job['end_time'],
+            backend=_worker_backend,
+            **options
+        )
+        tracker.run()
+        status.update(state='done', **tracker.summary())
+    except Exception as e:
+        status.update(state='failed', error=str(e), traceback=traceback.format_exc())
+
+    status['finished_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    status['duration'] = round(time.time() - job_start, 3)
+    write_status(job['status_path'], status)
+    return status
+
+def run_batch(manifest_path, model_path=DEFAULT_MODEL_PATH, workers=BATCH_WORKERS,
+              detector_backend=DETECTOR_BACKEND):
+    """
+    Run every job of a manifest on a pool of worker processes.
+
+    Args:
+        manifest_path: Path to the JSON job manifest
+        model_path: YOLO model loaded once by each worker
+        workers: Number of worker processes
+        detector_backend: Detector backend created once by each worker
+
+    Returns:
+        list: Final status of each job, in manifest order
+    """
+    jobs = load_manifest(manifest_path)
+    if not jobs:
+        print(f"No jobs in {manifest_path}")
+        return []
+
+    workers = max(1, min(workers, len(jobs)))
+    torch_threads = max(1, (mp.cpu_count() or 1) // workers)
+
+    print(f"Running {len(jobs)} jobs on {workers} worker processes "
+          f"({detector_backend}, {torch_threads} threads each)")
+    for job in jobs:
+        write_status(job['status_path'], {'name': job['name'], 'video': job['video'], 'state': 'queued'})
+
+    statuses = [None] * len(jobs)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_path, detector_backend, torch_threads, WORKER_OPENCV_THREADS)
+    ) as executor:
+        futures = {
+            executor.submit(_run_job, job, model_path): index
+            for index, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            job = jobs[index]
+            try:
+                statuses[index] = future.result()
+            except Exception as e:
+                # The worker process itself died, so the job could not report
+                statuses[index] = {'name': job['name'], 'video': job['video'], 'state': 'failed', 'error': str(e)}
+                write_status(job['status_path'], statuses[index])
+
+            status = statuses[index]
+            if status['state'] == 'done':
+                print(f"[{status['name']}] done: {status['frames_processed']} frames at {status['fps']} fps, "
+                      f"{status['vehicles_exported']} vehicles -> {job['output_csv']}")
+            else:
+                print(f"[{status['name']}] failed: {status['error']}")
+
+    failed = sum(status['state'] != 'done' for status in statuses)
+    print(f"Batch finished: {len(jobs) - failed} of {len(jobs)} jobs succeeded")
+    return statuses
@@ -0,0 +1,331 @@
+"""
+Throughput benchmark for the detection pipeline.
+
+Generates deterministic synthetic traffic videos (moving rectangles in lanes)
+together with their ground-truth boxes, then measures frames per second,
+per-stage time and peak RSS of VideoProcessor and VehicleTracker. Tracker
+scenarios use a stub detector that returns the ground truth, plus the real
+YOLO model when its weights are available. Every scenario runs in a fresh
+process so peak RSS is measured per scenario.
+
+Results can be saved as a baseline and later runs compared against it,
+exiting with status 1 when fps drops or peak RSS grows beyond the threshold.
+
+Usage:
+    python Detection/benchmark.py --save-baseline
+    python Detection/benchmark.py --resolution 1920x1080 --density 12
+"""
+
+import os
+import sys
+import json
+import argparse
+import resource
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from detection_config import *
+from detection_cache import DetectionRecorder, DetectionReplay
+
+SYNTHETIC_CLASS_NAMES = {2: 'car', 7: 'truck'}
+
+# Scenario name -> what it runs
+SCENARIOS = {
+    'video_decode': "VideoProcessor decoding only",
+    'video_decode_encode': "VideoProcessor decoding and encoding (pipelined)",
+    'tracker_trajectories_only': "VehicleTracker with the stub detector, CSV only",
+    'tracker_annotated': "VehicleTracker with the stub detector, annotated video",
+    'tracker_model': "VehicleTracker with the YOLO model, CSV only"
+}
+
+def generate_synthetic_video(video_path, width=1280, height=720, fps=30, seconds=20,
+                             density=8, lanes=4, seed=0):
+    """
+    Write a synthetic traffic video and its ground-truth detections.
+
+    Vehicles drive down fixed lanes inside the default ROI at a constant
+    speed per lane. New vehicles arrive at random, but the sequence is fully
+    determined by the seed.
+
+    Args:
+        video_path: Output video path (.mp4)
+        width: Frame width in pixels
+        height: Frame height in pixels
+        fps: Frame rate
+        seconds: Video length
+        density: Average number of vehicles on screen
+        lanes: Number of lanes
+        seed: Random seed
+
+    Returns:
+        str: Path of the ground-truth .npz (DetectionReplay format)
+    """
+    rng = np.random.default_rng(seed)
+    total_frames = int(fps * seconds)
+
+    # Lanes spread over the middle of the frame, each with its own speed
+    lane_centers = [int(width * (0.25 + 0.5 * (i + 0.5) / lanes)) for i in range(lanes)]
+    lane_speeds = rng.uniform(0.004, 0.012, size=lanes) * height
+    vehicle_width = int(width * 0.5 / lanes * 0.6)
+
+    # Arrival rate that keeps `density` vehicles on screen on average
+    mean_frames_on_screen = np.mean((height + 2 * vehicle_width) / lane_speeds)
+    arrival_rate = density / mean_frames_on_screen / lanes
+
+    # Schedule arrivals per lane, keeping a gap so vehicles never overlap
+    vehicles = []
+    for lane, speed in enumerate(lane_speeds):
+        last_spawn = -np.inf
+        for frame in range(-int(mean_frames_on_screen), total_frames):
+            if rng.random() >= arrival_rate:
+                continue
+            is_truck = rng.random() < 0.2
+            length = int(vehicle_width * (2.5 if is_truck else 1.6))
+            if (frame - last_spawn) * speed < length * 1.5:
+                continue
+            last_spawn = frame
+            color = tuple(int(c) for c in rng.integers(60, 256, size=3))
+            vehicles.append((lane, frame, speed, length, 7 if is_truck else 2, color))
+
+    # Static road background with lane markings
+    background = np.full((height, width, 3), 70, dtype=np.uint8)
+    for x in lane_centers:
+        for boundary in (x - vehicle_width, x + vehicle_width):
+            cv2.line(background, (boundary, 0), (boundary, height), (200, 200, 200), 2)
+
+    os.makedirs(os.path.dirname(video_path) or ".", exist_ok=True)
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    recorder = DetectionRecorder()
+    try:
+        for frame_number in range(total_frames):
+            frame = background.copy()
+            boxes = []
+            class_ids = []
+            for lane, spawn, speed, length, class_id, color in vehicles:
+                y1 = int(-length + (frame_number - spawn) * speed)
+                if frame_number < spawn or y1 >= height:
+                    continue
+                x1 = lane_centers[lane] - vehicle_width // 2
+                box = np.clip([x1, y1, x1 + vehicle_width, y1 + length], 0, [width, height, width, height])
+                if (box[3] - box[1]) < length * 0.2:
+                    continue
+                cv2.rectangle(frame, (int(box[0]), int(box[1])), (int(box[2]), int(box[3])), color, -1)
+                boxes.append(box)
+                class_ids.append(class_id)
+
+            writer.write(frame)
+            recorder.add(
+                frame_number,
+                np.array(boxes, dtype=np.float32).reshape(-1, 4),
+                np.full(len(boxes), 0.9, dtype=np.float32),
+                np.array(class_ids, dtype=np.int16)
+            )
+    finally:
+        writer.release()
+
+    ground_truth_path = os.path.splitext(video_path)[0] + ".gt.npz"
+    recorder.save(ground_truth_path, SYNTHETIC_CLASS_NAMES)
+    return ground_truth_path
+
+class GroundTruthDetector:
+    """Stub detector returning the ground-truth boxes of a synthetic video."""
+
+    def __init__(self, ground_truth_path):
+        self.replay = DetectionReplay(ground_truth_path)
+        self.class_names = self.replay.class_names
+
+    def __call__(self, frames, frame_numbers):
+        return [self.replay.detections(frame_number) for frame_number in frame_numbers]
+
+def peak_rss_mb():
+    """Peak resident set size of the current process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _run_scenario(name, video_path, ground_truth_path, work_dir, model_path):
+    """Run one scenario in the current (fresh) process and collect its measurements."""
+    from video_processor import VideoProcessor
+    from vehicle_tracker import VehicleTracker
+
+    if name.startswith('video_'):
+        output_path = os.path.join(work_dir, "encoded.mp4") if name == 'video_decode_encode' else None
+        video = VideoProcessor(video_path, output_path)
+        with video:
+            video.process_video_batches(
+                lambda frames, frame_numbers: frames,
+                pipelined=output_path is not None
+            )
+        profiler = video.profiler
+        frames, processing_time = video.processed_count, video.processing_time
+    else:
+        use_model = name == 'tracker_model'
+        tracker = VehicleTracker(
+            video_path,
+            model_path if use_model else None,
+            output_video_path=os.path.join(work_dir, f"{name}.mp4"),
+            output_csv_path=os.path.join(work_dir, f"{name}.csv"),
+            trajectories_only=name != 'tracker_annotated',
+            detector=None if use_model else GroundTruthDetector(ground_truth_path),
+            checkpoint_interval=0,
+            profile_report=False
+        )
+        tracker.run()
+        profiler = tracker.profiler
+        frames, processing_time = tracker.video_processor.processed_count, tracker.video_processor.processing_time
+
+    return {
+        'frames': frames,
+        'processing_time': round(processing_time, 3),
+        'fps': round(frames / processing_time, 2) if processing_time > 0 else 0.0,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'stages': profiler.summary()
+    }
+
+def model_available(model_path):
+    """Check whether the real YOLO model can be benchmarked."""
+    if not model_path or not os.path.exists(model_path):
+        return False
+    try:
+        import ultralytics  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def run_benchmarks(width=1280, height=720, fps=30, seconds=20, density=8, seed=0,
+                   scenarios=None, model_path=DEFAULT_MODEL_PATH, work_dir=BENCHMARK_DIR):
+    """
+    Generate (or reuse) the synthetic video and run the scenarios.
+
+    Returns:
+        dict: Benchmark settings and the results of each scenario
+    """
+    settings = {'width': width, 'height': height, 'fps': fps, 'seconds': seconds,
+                'density': density, 'seed': seed}
+    tag = f"synthetic_{width}x{height}_{fps}fps_{seconds}s_d{density}_s{seed}"
+    video_path = os.path.join(work_dir, f"{tag}.mp4")
+    ground_truth_path = os.path.splitext(video_path)[0] + ".gt.npz"
+
+    if not (os.path.exists(video_path) and os.path.exists(ground_truth_path)):
+        print(f"Generating synthetic video {video_path}...")
+        generate_synthetic_video(video_path, width, height, fps, seconds, density, seed=seed)
+
+    scenarios = list(scenarios or SCENARIOS)
+    if 'tracker_model' in scenarios and not model_available(model_path):
+        print(f"Skipping tracker_model: {model_path} or ultralytics not available")
+        scenarios.remove('tracker_model')
+
+    results = {}
+    for name in scenarios:
+        print(f"\n=== {name}: {SCENARIOS[name]} ===")
+        # One fresh process per scenario so ru_maxrss is the scenario's own peak
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as executor:
+            results[name] = executor.submit(
+                _run_scenario, name, video_path, ground_truth_path, work_dir, model_path
+            ).result()
+
+    return {'settings': settings, 'results': results}
+
+def compare_to_baseline(report, baseline, threshold=BENCHMARK_REGRESSION_THRESHOLD):
+    """
+    Compare benchmark results with a baseline.
+
+    Args:
+        report: Output of run_benchmarks
+        baseline: A previously saved report
+        threshold: Allowed relative fps drop and peak RSS growth
+
+    Returns:
+        list: Description of each regression (empty when there is none)
+    """
+    if baseline.get('settings') != report['settings']:
+        print("Warning: baseline was recorded with different benchmark settings")
+
+    regressions = []
+    for name, result in report['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None:
+            continue
+
+        if result['fps'] < reference['fps'] * (1 - threshold):
+            regressions.append(f"{name}: {result['fps']} fps vs baseline {reference['fps']} fps")
+        if result['peak_rss_mb'] > reference['peak_rss_mb'] * (1 + threshold):
+            regressions.append(f"{name}: peak RSS {result['peak_rss_mb']} MB vs baseline "
+                               f"{reference['peak_rss_mb']} MB")
+    return regressions
+
+def print_report(report, baseline=None):
+    """Print a results table, with the change against the baseline when given."""
+    print(f"\n{'scenario':<28}{'fps':>10}{'peak RSS':>12}  slowest stages")
+    for name, result in report['results'].items():
+        stages = sorted(result['stages'].items(), key=lambda item: -item[1]['total_s'])[:3]
+        slowest = ", ".join(f"{stage} {summary['total_s']:.2f}s" for stage, summary in stages)
+        line = f"{name:<28}{result['fps']:>10.1f}{result['peak_rss_mb']:>9.1f} MB  {slowest}"
+
+        reference = (baseline or {}).get('results', {}).get(name)
+        if reference and reference['fps'] > 0:
+            line += f"  ({(result['fps'] / reference['fps'] - 1) * 100:+.1f}% fps)"
+        print(line)
+
+def parse_arguments():
+    """Parse benchmark command line options."""
+    parser = argparse.ArgumentParser(description="DriveTRACE pipeline benchmark")
+    parser.add_argument("--resolution", default="1280x720", help="synthetic video size as WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=int, default=30, help="synthetic video frame rate")
+    parser.add_argument("--seconds", type=int, default=20, help="synthetic video length")
+    parser.add_argument("--density", type=int, default=8, help="average vehicles on screen")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic video")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), help="scenarios to run (default: all)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="YOLO weights for the tracker_model scenario")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE, help="baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=BENCHMARK_REGRESSION_THRESHOLD,
+                        help="allowed relative fps drop and peak RSS growth")
+    parser.add_argument("--output", default=None, help="also write the results to this JSON file")
+    return parser.parse_args()
+
+def main():
+    """Run the benchmark and compare with the baseline."""
+    args = parse_arguments()
+    try:
+        width, height = (int(v) for v in args.resolution.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Resolution must look like 1280x720, got '{args.resolution}'")
+
+    report = run_benchmarks(width, height, args.fps, args.seconds, args.density, args.seed,
+                            scenarios=args.scenarios, model_path=args.model)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to: {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+
+    regressions = compare_to_baseline(report, baseline, args.threshold)
+    if regressions:
+        print(f"\nRegressions beyond {args.threshold * 100:.0f}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+
+    print(f"\nNo regressions beyond {args.threshold * 100:.0f}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Checkpoint files for resuming an interrupted tracking run.
+
+A checkpoint is a pickle of the tracker state after a given frame: the
+ByteTrack object, the trajectories collected so far and the streaming CSV
+position. It is written under a temporary name and moved into place, so a
+crash while saving leaves the previous checkpoint intact.
+"""
+
+import os
+import pickle
+
+from detection_utils import ensure_directory_exists
+
+CHECKPOINT_VERSION = 1
+
+def checkpoint_path_for(output_csv_path):
+    """Get the checkpoint file used for an output CSV."""
+    return os.path.splitext(output_csv_path)[0] + ".checkpoint.pkl"
+
+def save_checkpoint(path, state):
+    """
+    Write a checkpoint atomically.
+
+    Args:
+        path: Checkpoint file path
+        state: Picklable dict describing the run and its progress
+    """
+    ensure_directory_exists(path)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        pickle.dump({'version': CHECKPOINT_VERSION, **state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint.
+
+    Returns:
+        dict: The saved state, or None if there is no checkpoint
+
+    Raises:
+        ValueError: If the file was written by an incompatible version
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as f:
+        state = pickle.load(f)
+
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {state.get('version')} in {path}")
+    return state
+
+def remove_checkpoint(path):
+    """Delete a checkpoint once its run has finished."""
+    if os.path.exists(path):
+        os.remove(path)
@@ -7,32 +7,97 @@ import numpy as np
 from detection_config import *
 
 class CoordinateTransformer:
-    def __init__(self, frame_width, frame_height):
+    def __init__(self, frame_width, frame_height, roi_relative_points=None, dst_points=None):
+        """
+        Args:
+            frame_width: Frame width in pixels
+            frame_height: Frame height in pixels
+            roi_relative_points: ROI corners as fractions of the frame (None for ROI_RELATIVE_POINTS)
+            dst_points: Bird's eye points the ROI corners map to (None for PERSPECTIVE_DST_POINTS)
+        """
         self.frame_width = frame_width
         self.frame_height = frame_height
         
         # Define ROI points based on frame dimensions
         self.roi_points = np.array([
             [int(frame_width * x), int(frame_height * y)]
-            for x, y in ROI_RELATIVE_POINTS
+            for x, y in (roi_relative_points or ROI_RELATIVE_POINTS)
         ], dtype=np.float32)
         
         # Define destination points for perspective transform
-        self.dst_points = np.array(PERSPECTIVE_DST_POINTS, dtype=np.float32)
+        self.dst_points = np.array(dst_points or PERSPECTIVE_DST_POINTS, dtype=np.float32)
         
         # Calculate perspective transform matrix
         self.perspective_matrix = cv2.getPerspectiveTransform(
             self.roi_points, self.dst_points
         )
+        
+        # Integer polygon for ROI membership tests
+        self.roi_polygon = self.roi_points.astype(np.int32)
     
     def point_in_roi(self, point):
         """Check if a point is within the region of interest."""
         return cv2.pointPolygonTest(
-            self.roi_points.astype(np.int32), 
+            self.roi_polygon, 
             tuple(point), 
             False
         ) >= 0
     
+    def points_in_roi(self, points):
+        """
+        Check which points are within the region of interest in one pass.
+        
+        Same rule as point_in_roi (points on the edges are inside): a point
+        is inside when it lies on an edge or a ray from it crosses the edges
+        an odd number of times. The crossings are compared as products, not
+        divided out, so box centers (whole and half pixels) are tested exactly.
+        
+        Args:
+            points: (N, 2) array of (x, y) points
+            
+        Returns:
+            np.ndarray: Boolean array, True for points inside the ROI
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x, y = points[:, 0], points[:, 1]
+        inside = np.zeros(len(points), dtype=bool)
+        on_edge = np.zeros(len(points), dtype=bool)
+        
+        corners = self.roi_polygon.astype(np.float64)
+        for (x1, y1), (x2, y2) in zip(corners, np.roll(corners, -1, axis=0)):
+            # Side of the edge's line the point is on (0 on the line)
+            side = (x2 - x1) * (y - y1) - (y2 - y1) * (x - x1)
+            on_edge |= (
+                (side == 0) & 
+                (np.minimum(x1, x2) <= x) & (x <= np.maximum(x1, x2)) & 
+                (np.minimum(y1, y2) <= y) & (y <= np.maximum(y1, y2))
+            )
+            
+            # Edges spanning the point's row, crossed to the right of the point
+            if y1 != y2:
+                spans = (y1 > y) != (y2 > y)
+                inside ^= spans & ((side > 0) if y2 > y1 else (side < 0))
+        
+        return inside | on_edge
+    
+    def roi_crop_rect(self, margin=ROI_CROP_MARGIN):
+        """
+        Get the ROI's bounding rectangle plus a margin, clipped to the frame.
+        
+        Args:
+            margin: Pixels added on every side so vehicles cut by the ROI edge stay whole
+            
+        Returns:
+            tuple: (x1, y1, x2, y2) in pixels, usable as frame[y1:y2, x1:x2]
+        """
+        x, y, width, height = cv2.boundingRect(self.roi_polygon)
+        return (
+            max(0, x - margin),
+            max(0, y - margin),
+            min(self.frame_width, x + width + margin),
+            min(self.frame_height, y + height + margin)
+        )
+    
     def transform_to_birds_eye(self, point):
         """Transform a point to bird's eye view coordinates."""
         return cv2.perspectiveTransform(
@@ -40,6 +105,21 @@ class CoordinateTransformer:
             self.perspective_matrix
         )[0][0]
     
+    def transform_points_to_birds_eye(self, points):
+        """
+        Transform many points to bird's eye view coordinates with one call.
+        
+        Args:
+            points: (N, 2) array of (x, y) points
+            
+        Returns:
+            np.ndarray: (N, 2) float32 array of transformed points
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 1, 2)
+        if len(points) == 0:
+            return np.empty((0, 2), dtype=np.float32)
+        return cv2.perspectiveTransform(points, self.perspective_matrix).reshape(-1, 2)
+    
     def to_simulation_coordinates(self, bird_eye_point):
         """
         Convert bird's eye view coordinates to simulation world coordinates.
@@ -55,11 +135,25 @@ class CoordinateTransformer:
         world_y = int(bird_eye_point[1] * 5)  # Scale for forward movement
         return world_x, world_y
     
+    def points_to_simulation_coordinates(self, bird_eye_points):
+        """
+        Convert many bird's eye view points to simulation world coordinates.
+        
+        Args:
+            bird_eye_points: (N, 2) array of bird's eye view points
+            
+        Returns:
+            np.ndarray: (N, 2) integer array of (world_x, world_y)
+        """
+        bird_eye_points = np.asarray(bird_eye_points)
+        scale = np.array([2, 5], dtype=bird_eye_points.dtype)  # Same scaling as to_simulation_coordinates
+        return (bird_eye_points * scale).astype(int)
+    
     def draw_roi(self, frame):
         """Draw the region of interest on the frame."""
         cv2.polylines(
             frame, 
-            [self.roi_points.astype(np.int32)], 
+            [self.roi_polygon], 
             True, 
             (0, 255, 0), 
             2
@@ -1,14 +1,101 @@
 """
 CSV export utilities for vehicle tracking data.
+
+Besides the CSV, the exporter can write the same rows as a columnar NumPy
+.npz file next to it: one typed array per column, sorted by frame and
+vehicle, which loads far faster than parsing the text again. Compacted
+output is marked by a .compaction.json file next to the CSV, which lists
+the frame gaps inside tracks that playback must not interpolate over.
 """
 
+import os
 import csv
+import json
+import numpy as np
+from detection_config import *
 from coordinate_transformer import CoordinateTransformer
+from trajectory_compaction import compact_rows
+
+CSV_HEADER = ['frame_id', 'vehicle_id', 'world_x', 'world_y', 'speed']
+
+# Column types of the binary output (world coordinates fall back to int32 when int16 is too small)
+BINARY_COLUMN_TYPES = {
+    'frame_id': np.int32,
+    'vehicle_id': np.int32,
+    'world_x': np.int16,
+    'world_y': np.int16,
+    'speed': np.int16
+}
+
+def binary_path_for(output_csv_path):
+    """Get the columnar binary file written next to an output CSV."""
+    return os.path.splitext(output_csv_path)[0] + ".npz"
+
+def compaction_path_for(output_csv_path):
+    """Get the compaction marker written next to a compacted output CSV."""
+    return os.path.splitext(output_csv_path)[0] + ".compaction.json"
+
+def save_trajectory_columns(path, rows):
+    """
+    Write trajectory rows as typed columns, sorted by frame and vehicle.
+    
+    Args:
+        path: Output .npz path
+        rows: (N, 5) integer array in CSV_HEADER column order
+    """
+    rows = rows[np.lexsort((rows[:, 1], rows[:, 0]))]
+    
+    columns = {}
+    for index, (name, dtype) in enumerate(BINARY_COLUMN_TYPES.items()):
+        column = rows[:, index]
+        limits = np.iinfo(dtype)
+        if len(column) and (column.min() < limits.min or column.max() > limits.max):
+            dtype = np.int32
+        columns[name] = column.astype(dtype)
+    
+    # Written under a temporary name so readers never see a partial file
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        np.savez_compressed(f, **columns)
+    os.replace(temp_path, path)
+
+def load_trajectory_columns(path):
+    """
+    Read a columnar trajectory file.
+    
+    Returns:
+        dict: Column name to array, in CSV_HEADER order
+    """
+    with np.load(path) as data:
+        return {name: data[name] for name in CSV_HEADER}
 
 class CSVExporter:
-    def __init__(self, output_path):
+    def __init__(self, output_path, interpolation_gap=1, flush_rows=CSV_FLUSH_ROWS,
+                 binary_export=BINARY_EXPORT, compact=COMPACT_EXPORT):
         self.output_path = output_path
         self.coordinate_transformer = None
+        self._file = None
+        self.exported_vehicles = 0
+        self.exported_rows = 0
+        
+        # Largest gap between samples (in frames) that is filled by interpolation,
+        # matches the frame stride so sampled runs still export dense rows
+        self.interpolation_gap = interpolation_gap
+        
+        # Rows buffered by write_trajectory before they are written to disk
+        self.flush_rows = flush_rows
+        
+        # Compaction of flushed rows (see trajectory_compaction), the row
+        # count before compaction and the frame gaps inside compacted tracks
+        self.compact = compact
+        self.source_rows = 0
+        self.gaps = []
+        
+        # Columnar binary copy: rows are spooled as raw int32 while exporting,
+        # then sorted and written as typed columns on close
+        self.binary_path = binary_path_for(output_path) if binary_export and output_path else None
+        self._spool_path = self.binary_path + ".rows" if self.binary_path else None
+        self._spool = None
     
     def set_coordinate_transformer(self, transformer):
         """Set the coordinate transformer for world coordinate conversion."""
@@ -19,55 +106,252 @@ class CSVExporter:
         Export vehicle tracking data to CSV file.
         
         Args:
-            vehicle_data: Dictionary containing tracking data for all vehicles
+            vehicle_data: TrajectoryStore (or dict of trajectories) for all vehicles
         """
         print(f"\nProcessing vehicle tracking data...")
         
-        with open(self.output_path, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            # Write header
-            writer.writerow(['frame_id', 'vehicle_id', 'world_x', 'world_y', 'speed'])
-            
+        self.open()
+        try:
             total_vehicles = len(vehicle_data)
             print(f"Processing data for {total_vehicles} vehicles...")
             
-            for vehicle_id, data in vehicle_data.items():
-                if data['initial_position'] is not None and len(data['positions']) > 0:
-                    self._export_vehicle_trajectory(writer, vehicle_id, data)
-        
-        print(f"Data saved to: {self.output_path}")
+            for vehicle_id, trajectory in vehicle_data.items():
+                self.write_trajectory(vehicle_id, trajectory)
+        finally:
+            self.close()
     
-    def _export_vehicle_trajectory(self, writer, vehicle_id, data):
-        """Export trajectory data for a single vehicle."""
-        for i in range(len(data['positions'])):
-            pos = data['positions'][i]
-            frame_id = data['frames'][i]
-            
-            # Convert coordinates to simulation world coordinates
-            if self.coordinate_transformer:
-                world_x, world_y = self.coordinate_transformer.to_simulation_coordinates(pos)
-            else:
-                # Fallback if no transformer is set
-                world_x = int(pos[0] * 2)
-                world_y = int(pos[1] * 5)
+    def open(self, resume_state=None):
+        """
+        Open the output file for (streaming) export and write the header.
+        
+        Args:
+            resume_state: State from checkpoint() to continue a partly written
+                          file instead of starting a new one
+        """
+        if resume_state is None:
+            self._file = open(self.output_path, 'w', newline='')
+            self._writer = csv.writer(self._file)
+            # Write header
+            self._writer.writerow(CSV_HEADER)
+            self.exported_vehicles = 0
+            self.exported_rows = 0
+            self.source_rows = 0
+            self.gaps = []
+            if self._spool_path:
+                self._spool = open(self._spool_path, 'wb')
             
-            # Get speed (already in simulation units)
-            speed = data['speeds'][i] if i < len(data['speeds']) else 400
+            # A marker left by an earlier compacted run would expand this file
+            compaction_path = compaction_path_for(self.output_path)
+            if not self.compact and os.path.exists(compaction_path):
+                os.remove(compaction_path)
+        else:
+            # Drop rows written after the checkpoint, then append from there
+            os.truncate(self.output_path, resume_state['offset'])
+            self._file = open(self.output_path, 'a', newline='')
+            self._writer = csv.writer(self._file)
+            self.exported_vehicles = resume_state['exported_vehicles']
+            self.exported_rows = resume_state['exported_rows']
+            self.source_rows = resume_state.get('source_rows', self.exported_rows)
+            self.gaps = resume_state.get('gaps', [])
+            if self._spool_path:
+                os.truncate(self._spool_path, resume_state['binary_offset'])
+                self._spool = open(self._spool_path, 'ab')
+        self._pending_rows = []
+        self._pending_row_count = 0
+    
+    def write_trajectory(self, vehicle_id, trajectory):
+        """
+        Queue a finished vehicle trajectory for export.
+        
+        Rows are buffered and written in batches of flush_rows, so
+        trajectories can be streamed out as tracks are retired.
+        """
+        if len(trajectory) == 0:
+            return
+        
+        rows = self._trajectory_rows(vehicle_id, trajectory)
+        self._pending_rows.append(rows)
+        self._pending_row_count += len(rows)
+        self.exported_vehicles += 1
+        
+        if self._pending_row_count >= self.flush_rows:
+            self.flush()
+    
+    def write_tracks(self, vehicle_ids, frames, positions, speeds):
+        """
+        Queue many finished trajectories at once from flat sample arrays.
+        
+        Args:
+            vehicle_ids: Vehicle ID of each sample, samples of a vehicle contiguous
+            frames: Frame number of each sample, in order within each vehicle
+            positions: (N, 2) bird's eye positions
+            speeds: Simulation speeds
+        """
+        if len(frames) == 0:
+            return
+        
+        rows = self._track_rows(vehicle_ids, frames, positions, speeds)
+        self._pending_rows.append(rows)
+        self._pending_row_count += len(rows)
+        self.exported_vehicles += int(np.count_nonzero(np.diff(vehicle_ids))) + 1
+        
+        if self._pending_row_count >= self.flush_rows:
+            self.flush()
+    
+    def flush(self):
+        """Write buffered rows to disk."""
+        if self._pending_rows:
+            rows = np.concatenate(self._pending_rows)
+            self.source_rows += len(rows)
+            if self.compact:
+                # Buffered trajectories are complete, so they can be compacted as a batch
+                rows, dropped_vehicles, gaps = compact_rows(rows)
+                self.exported_vehicles -= dropped_vehicles
+                self.gaps.extend(gaps.tolist())
             
-            writer.writerow([
-                frame_id,
-                vehicle_id,
-                world_x,
-                world_y,
-                speed
-            ])
+            self._writer.writerows(rows.tolist())
+            if self._spool:
+                rows.astype(np.int32).tofile(self._spool)
+            self.exported_rows += len(rows)
+            self._pending_rows = []
+            self._pending_row_count = 0
+        self._file.flush()
+        if self._spool:
+            self._spool.flush()
+    
+    def checkpoint(self):
+        """
+        Flush buffered rows and get the state needed to resume this file.
+        
+        Returns:
+            dict: File offset and export counts, for open(resume_state=...)
+        """
+        self.flush()
+        return {
+            'offset': self._file.tell(),
+            'binary_offset': self._spool.tell() if self._spool else None,
+            'exported_vehicles': self.exported_vehicles,
+            'exported_rows': self.exported_rows,
+            'source_rows': self.source_rows,
+            'gaps': list(self.gaps)
+        }
+    
+    def close(self, complete=True):
+        """
+        Flush remaining rows and close the output file.
+        
+        Args:
+            complete: Whether the export is finished; an interrupted one keeps
+                      its binary spool for resuming instead of writing the .npz
+        """
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        print(f"Data saved to: {self.output_path}")
+        if self.compact:
+            self._write_compaction_marker()
+            if self.source_rows:
+                print(f"Compacted {self.source_rows} rows to {self.exported_rows} "
+                      f"({self.exported_rows / self.source_rows * 100:.1f}%)")
+        
+        if self._spool:
+            self._spool.close()
+            self._spool = None
+            if not complete:
+                return
+            rows = np.fromfile(self._spool_path, dtype=np.int32).reshape(-1, len(CSV_HEADER))
+            save_trajectory_columns(self.binary_path, rows)
+            os.remove(self._spool_path)
+            print(f"Columnar data saved to: {self.binary_path}")
+    
+    def _write_compaction_marker(self):
+        """Record the compaction settings and the track gaps playback must keep."""
+        with open(compaction_path_for(self.output_path), 'w') as f:
+            json.dump({
+                'position_tolerance': COMPACT_POSITION_TOLERANCE,
+                'speed_tolerance': COMPACT_SPEED_TOLERANCE,
+                'gaps': self.gaps
+            }, f)
+    
+    def _trajectory_rows(self, vehicle_id, trajectory):
+        """Build the CSV rows of a single vehicle as an integer array."""
+        return self._track_rows(
+            np.full(len(trajectory), vehicle_id),
+            trajectory.frames,
+            trajectory.positions,
+            trajectory.speeds
+        )
+    
+    def _track_rows(self, vehicle_ids, frames, positions, speeds):
+        """Build the CSV rows of contiguous vehicle samples as an integer array."""
+        vehicle_ids, frames, positions, speeds = self._fill_sampling_gaps(
+            vehicle_ids, 
+            frames, 
+            positions, 
+            speeds
+        )
+        
+        # Convert coordinates to simulation world coordinates
+        world_coordinates = self._to_world_coordinates(positions)
+        
+        return np.column_stack([
+            frames,
+            vehicle_ids,
+            world_coordinates,
+            speeds
+        ]).astype(np.int64)
+    
+    def _fill_sampling_gaps(self, vehicle_ids, frames, positions, speeds):
+        """
+        Linearly interpolate samples for frames skipped by frame-stride sampling.
+        
+        Only gaps up to interpolation_gap frames within one vehicle are filled,
+        longer gaps (a vehicle leaving and re-entering the ROI) are left as they are.
+        
+        Returns:
+            tuple: (vehicle_ids, frames, positions, speeds) with one entry per exported row
+        """
+        if len(frames) < 2 or self.interpolation_gap <= 1:
+            return vehicle_ids, frames, positions, speeds
+        
+        gaps = np.diff(frames)
+        fill = (gaps > 1) & (gaps <= self.interpolation_gap) & (vehicle_ids[1:] == vehicle_ids[:-1])
+        if not fill.any():
+            return vehicle_ids, frames, positions, speeds
+        
+        # Each sample is followed by (gap - 1) interpolated rows where the gap is filled
+        repeats = np.ones(len(frames), dtype=np.intp)
+        repeats[:-1][fill] = gaps[fill]
+        segment = np.repeat(np.arange(len(frames)), repeats)
+        offset = np.arange(len(segment)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        next_sample = np.minimum(segment + 1, len(frames) - 1)
+        t = offset / np.maximum(np.append(gaps, 1), 1)[segment]
+        
+        dense_positions = positions[segment] + (
+            t.astype(np.float32)[:, None] * (positions[next_sample] - positions[segment])
+        )
+        dense_speeds = np.round(
+            speeds[segment] + t * (speeds[next_sample] - speeds[segment])
+        ).astype(int)
+        
+        return vehicle_ids[segment], frames[segment] + offset, dense_positions, dense_speeds
+    
+    def _to_world_coordinates(self, positions):
+        """Convert bird's eye positions to (N, 2) integer world coordinates."""
+        if self.coordinate_transformer:
+            return self.coordinate_transformer.points_to_simulation_coordinates(positions)
+        
+        # Fallback if no transformer is set
+        return (positions * np.array([2, 5], dtype=positions.dtype)).astype(int)
     
     def validate_data(self, vehicle_data):
         """
         Validate vehicle data before export.
         
         Args:
-            vehicle_data: Dictionary containing tracking data
+            vehicle_data: TrajectoryStore (or dict of trajectories)
             
         Returns:
             bool: True if data is valid for export
@@ -77,10 +361,8 @@ class CSVExporter:
             return False
         
         valid_vehicles = 0
-        for vehicle_id, data in vehicle_data.items():
-            if (data['initial_position'] is not None and 
-                len(data['positions']) > 0 and 
-                len(data['frames']) > 0):
+        for vehicle_id, trajectory in vehicle_data.items():
+            if len(trajectory) > 0:
                 valid_vehicles += 1
         
         if valid_vehicles == 0:
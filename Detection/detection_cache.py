@@ -0,0 +1,118 @@
+"""
+Persistent cache of raw per-frame YOLO detections.
+
+Running the model is by far the most expensive step, while the ROI,
+perspective, class filter and speed settings only affect what happens to
+its detections afterwards. Raw detections (all classes) are stored per run
+in a compressed .npz file keyed by the video content, the model weights and
+every setting that changes what the model sees, so later runs with a
+different configuration can replay them instead of calling the model.
+"""
+
+import os
+import json
+import hashlib
+
+import numpy as np
+import supervision as sv
+from detection_config import *
+from detection_utils import file_sha256, sampled_file_digest, ensure_directory_exists
+
+def detection_cache_key(video_path, model_path, frame_range, stride, **settings):
+    """
+    Build the cache key for a detection run.
+
+    Args:
+        video_path: Path to input video
+        model_path: Path to YOLO model weights (None when a detector hook is used)
+        frame_range: (start_frame, end_frame) that was processed
+        stride: Frame stride
+        **settings: Any other inference settings that change the detections
+
+    Returns:
+        str: Hex digest identifying the run
+    """
+    key = {
+        'video': sampled_file_digest(video_path),
+        'model': file_sha256(model_path) if model_path is not None else None,
+        'frame_range': list(frame_range),
+        'stride': stride,
+        'settings': settings
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+def detection_cache_path(key, cache_dir=DETECTION_CACHE_DIR):
+    """Get the cache file for a key."""
+    return os.path.join(cache_dir, f"detections_{key[:32]}.npz")
+
+class DetectionRecorder:
+    """Collects raw detections frame by frame and saves them as one .npz file."""
+
+    def __init__(self):
+        self.frame_numbers = []
+        self.counts = []
+        self.xyxy = []
+        self.confidence = []
+        self.class_id = []
+
+    def add(self, frame_number, xyxy, confidence, class_id):
+        """Record the raw detections of one frame."""
+        self.frame_numbers.append(frame_number)
+        self.counts.append(len(xyxy))
+        self.xyxy.append(np.asarray(xyxy, dtype=np.float32).reshape(-1, 4))
+        self.confidence.append(np.asarray(confidence, dtype=np.float32))
+        self.class_id.append(np.asarray(class_id, dtype=np.int16))
+
+    def save(self, path, class_names):
+        """
+        Write the recorded detections to disk.
+
+        The file is written under a temporary name and moved into place, so
+        an interrupted save never leaves a truncated cache entry behind.
+        """
+        ensure_directory_exists(path)
+        offsets = np.zeros(len(self.counts) + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=offsets[1:])
+
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                frame_numbers=np.asarray(self.frame_numbers, dtype=np.int32),
+                offsets=offsets,
+                xyxy=np.concatenate(self.xyxy) if self.xyxy else np.empty((0, 4), dtype=np.float32),
+                confidence=np.concatenate(self.confidence) if self.confidence else np.empty(0, dtype=np.float32),
+                class_id=np.concatenate(self.class_id) if self.class_id else np.empty(0, dtype=np.int16),
+                class_names=json.dumps({int(k): v for k, v in class_names.items()})
+            )
+        os.replace(temp_path, path)
+
+class DetectionReplay:
+    """Serves cached raw detections by frame number."""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.frame_numbers = data['frame_numbers']
+            self.offsets = data['offsets']
+            self.xyxy = data['xyxy']
+            self.confidence = data['confidence']
+            self.class_id = data['class_id'].astype(int)
+            self.class_names = {int(k): v for k, v in json.loads(str(data['class_names'])).items()}
+
+        self.index = {frame_number: i for i, frame_number in enumerate(self.frame_numbers.tolist())}
+
+    def __len__(self):
+        return len(self.frame_numbers)
+
+    def detections(self, frame_number):
+        """Get the raw detections of a frame as sv.Detections."""
+        i = self.index.get(frame_number)
+        if i is None:
+            return sv.Detections.empty()
+
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return sv.Detections(
+            xyxy=self.xyxy[start:end],
+            confidence=self.confidence[start:end],
+            class_id=self.class_id[start:end]
+        )
@@ -7,6 +7,7 @@ DEFAULT_MODEL_PATH = "Detection/yolov8m.pt"
 DEFAULT_INPUT_VIDEO = "Detection/test_footage/1.mp4"
 DEFAULT_OUTPUT_VIDEO = "Detection/annotated_test1.mp4"
 DEFAULT_OUTPUT_CSV = "Detection/traffic_simulation_data.csv"
+TRAJECTORIES_ONLY = False  # Only write the CSV, skip annotation and the output video
 
 # Time range settings for video processing
 # Set to None to process entire video, or specify in seconds
@@ -20,6 +21,71 @@ END_TIME_STRING = "0:20"     # e.g., "1:20" or "2:45"
 # Detection settings
 VEHICLE_CLASS_IDS = [2, 3, 5, 7]  # cars, trucks, buses, motorcycles in COCO dataset
 
+# Decoder settings
+VIDEO_DECODER = "opencv"   # "opencv" (cv2.VideoCapture) or "ffmpeg" (raw frames piped from an ffmpeg process)
+DECODER_SCALE = None       # ffmpeg only: scale frames in the decoder by this factor (e.g. 0.5 for 4K), None keeps them
+FFMPEG_BINARY = "ffmpeg"   # ffmpeg executable
+
+# Inference settings
+INFERENCE_BATCH_SIZE = 4  # Frames per YOLO call (1 runs the model frame by frame)
+
+# Detector backend settings
+DETECTOR_BACKEND = "ultralytics"  # "ultralytics" (PyTorch), "onnxruntime" or "onnxruntime-int8" (CPU)
+DETECTOR_EXPORT_DIR = "Detection/exported_models"  # ONNX exports, keyed by weights hash and input size
+DETECTOR_CONFIDENCE = 0.25        # Minimum score for ONNX Runtime backends (ultralytics' default)
+DETECTOR_IOU = 0.7                # NMS IoU threshold for ONNX Runtime backends (ultralytics' default)
+DETECTOR_MAX_DETECTIONS = 300     # Detections kept per frame by ONNX Runtime backends
+ONNX_THREADS = None               # ONNX Runtime intra-op threads (None lets it decide)
+
+# Inference resolution settings
+INFERENCE_IMAGE_SIZE = None  # Model input size in pixels (None uses the model's default, 640 for YOLOv8)
+CAMERA_INFERENCE_SIZES = {}  # Per-camera sizes keyed by video file name (or live device index), e.g. {"highway_4k.mp4": 1280, "0": 960}
+INFERENCE_DOWNSCALE = None   # Shrink frames by this factor before the model (e.g. 0.5 for 4K), None to keep them
+
+# Frame sampling settings
+FRAME_STRIDE = 1  # Run detection on every Nth frame, skipped frames are interpolated in the CSV
+
+# Sharded processing settings (split one long range into parallel time chunks)
+SHARD_COUNT = 1                  # Number of time shards (1 processes the range sequentially)
+SHARD_OVERLAP_SECONDS = 2.0      # Warm-up overlap before each shard, used to stitch track IDs
+SHARD_STITCH_MAX_DISTANCE = 5.0  # Max mean bird's eye distance for matching tracks in the overlap
+SHARD_STITCH_MIN_FRAMES = 3      # Min common frames in the overlap for a match
+
+# Batch processing settings (job manifests)
+BATCH_WORKERS = 2  # Worker processes running jobs, each loads the model once
+
+# Profiling settings
+PROFILE_REPORT = True    # Write per-stage timings to <output>.profile.json after each run
+PROGRESS_STREAM = False  # Write progress and stage timings to <output>.progress.jsonl while running (resumed runs append)
+
+# Checkpoint settings
+CHECKPOINT_INTERVAL = 1800  # Processed frames between checkpoints (0 disables checkpoints)
+
+# Raw detection cache settings
+DETECTION_CACHE = False                  # Record raw detections and replay them on later runs
+DETECTION_CACHE_DIR = "Detection/cache"  # Where cached detections are stored
+
+# Track cache settings (re-derive the CSV with a new ROI, perspective or speed setting without re-tracking)
+TRACK_CACHE = False          # Save the post-ByteTrack boxes of every frame to <output>.tracks.npz
+SPEED_SMOOTHING_WINDOW = 0   # Samples on each side that re-derived speeds span (0: the tracking speed filter)
+
+# Pipeline settings
+PIPELINED_PROCESSING = True  # Decode and encode on worker threads alongside inference
+PIPELINE_QUEUE_SIZE = 4      # Batches buffered between stages (bounds memory use)
+PIPELINE_QUEUE_TIMEOUT = 0.1  # seconds between checks for a stopped pipeline
+
+# Live ingest settings
+LIVE_MODE = False          # Treat the input as a live capture source (device index, stream URL or pipe)
+LIVE_DEFAULT_FPS = 30      # Frame rate assumed when a live source does not report one
+LIVE_CSV_FLUSH_ROWS = 1    # Rows buffered before writing in live mode (1 writes every retired track at once)
+
+# Multi-process inference settings
+INFERENCE_WORKERS = 0          # Inference processes fed from a shared-memory frame ring (0 runs in-process)
+WORKER_TORCH_THREADS = None    # Torch threads per worker (None uses the cores pinned to each worker)
+WORKER_OPENCV_THREADS = 1      # OpenCV threads per worker
+WORKER_CPU_AFFINITY = "auto"   # "auto" splits cores evenly, a list of core lists per worker, or None
+FRAME_RING_SLOTS = None        # Frames in the shared ring (None uses 2 per worker + 2)
+
 # ROI settings (as fractions of frame dimensions)
 ROI_RELATIVE_POINTS = [
     (0.2, 0.2),  # Top-left
@@ -28,6 +94,17 @@ ROI_RELATIVE_POINTS = [
     (0.2, 0.8)   # Bottom-left
 ]
 
+# ROI crop inference settings
+ROI_CROP_INFERENCE = False  # Run the model on the ROI's bounding rectangle instead of the full frame
+ROI_CROP_MARGIN = 96        # Pixels kept around the ROI rectangle (about a vehicle length, so tracks start before the ROI)
+
+# Motion gate settings (skip inference on frames where nothing moved inside the ROI)
+MOTION_GATE = False                # Gate inference on a downscaled frame difference inside the ROI
+MOTION_GATE_SCALE = 0.25           # Downscale factor of the compared images
+MOTION_GATE_PIXEL_DELTA = 20       # Grey level change (0-255) that counts a pixel as changed
+MOTION_GATE_THRESHOLD = 0.002      # Changed fraction of the ROI below which a frame is gated
+MOTION_GATE_MAX_GATED_FRAMES = 10  # Gated frames in a row before a full detection is forced
+
 # Perspective transform destination points
 PERSPECTIVE_DST_POINTS = [
     (0, 0),
@@ -36,16 +113,52 @@ PERSPECTIVE_DST_POINTS = [
     (0, 600)
 ]
 
+# Trajectory storage settings
+TRAJECTORY_INITIAL_CAPACITY = 64  # Samples preallocated per track
+TRAJECTORY_GROWTH_FACTOR = 2      # Capacity multiplier when a track's arrays are full
+
+# Streaming export settings
+STREAMING_EXPORT = True    # Write tracks to the CSV as soon as ByteTrack drops them
+TRACK_RETIRE_FRAMES = 90   # Tracker updates without a sighting before a track is retired
+                           # (never less than ByteTrack's lost-track buffer)
+CSV_FLUSH_ROWS = 10000     # Rows buffered before writing to disk
+
+# Trajectory compaction settings (CSVTrafficManager re-expands compacted files for playback)
+COMPACT_EXPORT = False             # Drop rows that linear interpolation restores, and short tracks
+COMPACT_POSITION_TOLERANCE = 4.0   # Largest world_x/world_y error of the interpolated rows
+COMPACT_SPEED_TOLERANCE = None     # Largest speed error of the interpolated rows (None: speed only
+                                   # kept at position keyframes, per-frame speeds are noisy)
+COMPACT_MIN_TRACK_ROWS = 10        # Tracks with fewer rows are dropped
+COMPACT_MIN_TRACK_FRAMES = 15      # Tracks spanning fewer frames are dropped
+
+# Binary trajectory output
+BINARY_EXPORT = True       # Also write the trajectories as typed columns in a .npz next to the CSV
+
 # Speed calculation settings
 SIMULATION_SPEED_RANGE = (0, 600)  # Min and max speeds for simulation
 DEFAULT_SIMULATION_SPEED = 300
 BASE_SIMULATION_SPEED = 200
 SPEED_SCALE_FACTOR = 3
+SPEED_FILTER_ALPHA = 0.3          # Alpha-beta speed filter: share of the position residual taken (1: raw position)
+SPEED_FILTER_BETA = 0.05          # Share of the residual that corrects the velocity (alpha = beta = 1: two-point speeds)
+SPEED_FILTER_RESET_SECONDS = 1.0  # Restart a track's velocity after a gap this long (e.g. leaving and re-entering the ROI)
+SPEED_ESTIMATOR_CAPACITY = 256    # Track slots preallocated by the speed filter (doubled when full)
 
 # Video codec settings
 PRIMARY_CODEC = 'avc1'  # H.264
 FALLBACK_CODEC = 'mp4v'
 
+# Encoder settings
+VIDEO_ENCODER = "opencv"    # "opencv" (cv2.VideoWriter, codecs above) or "ffmpeg" (raw frames piped to an ffmpeg process)
+FFMPEG_CODEC = "libx264"    # ffmpeg encoder for the output video
+FFMPEG_PRESET = "veryfast"  # Encoder speed against file size ("ultrafast" to "veryslow" for x264)
+FFMPEG_CRF = 23             # Constant rate factor, lower is better quality (0-51 for x264)
+PREVIEW_OUTPUT = False      # Also write a quick-look clip to <output video>_preview.mp4 (always encoded by ffmpeg)
+PREVIEW_ONLY = False        # Write the preview clip instead of the full-resolution video
+PREVIEW_WIDTH = 640         # Preview width in pixels, the height keeps the aspect ratio
+PREVIEW_FPS = 10            # Preview frame rate, reached by dropping frames
+PREVIEW_CRF = 28            # Constant rate factor of the preview
+
 # Annotation settings
 BOX_THICKNESS = 2
 TRACE_LENGTH = 75
@@ -54,3 +167,8 @@ FONT_THICKNESS = 2
 
 # Progress reporting
 PROGRESS_UPDATE_INTERVAL = 30  # frames
+
+# Benchmark settings
+BENCHMARK_DIR = "Detection/benchmark_data"               # Synthetic videos and scenario outputs
+BENCHMARK_BASELINE = "Detection/benchmark_baseline.json"  # Stored results to compare against
+BENCHMARK_REGRESSION_THRESHOLD = 0.15                    # Allowed fps drop / peak RSS growth (fraction)
@@ -4,6 +4,10 @@ Utility functions for the vehicle detection system.
 
 import os
 import sys
+import json
+import time
+import bisect
+import hashlib
 from pathlib import Path
 
 def ensure_directory_exists(file_path):
@@ -45,6 +49,52 @@ def get_file_size_mb(file_path):
         return 0
     return os.path.getsize(file_path) / (1024 * 1024)
 
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-256 of a file's full content.
+    
+    Args:
+        file_path: Path to the file
+        chunk_size: Bytes read at a time
+        
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def sampled_file_digest(file_path, block_count=16, block_size=1024 * 1024):
+    """
+    Compute a content fingerprint from evenly spaced blocks of a large file.
+    
+    Hashing every byte of a multi-gigabyte video takes longer than is worth it
+    for a cache key, so the file size and a fixed number of blocks spread over
+    the file are hashed instead.
+    
+    Args:
+        file_path: Path to the file
+        block_count: Number of blocks to sample
+        block_size: Size of each block in bytes
+        
+    Returns:
+        str: Hex digest
+    """
+    file_size = os.path.getsize(file_path)
+    digest = hashlib.sha256(str(file_size).encode())
+    
+    with open(file_path, 'rb') as f:
+        if file_size <= block_count * block_size:
+            digest.update(f.read())
+        else:
+            step = (file_size - block_size) // (block_count - 1)
+            for i in range(block_count):
+                f.seek(i * step)
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
 def print_system_info():
     """Print system and environment information."""
     print("System Information:")
@@ -150,41 +200,142 @@ def validate_time_range(start_time, end_time, video_duration):
     
     return start_time, end_time, True
 
-class ProgressTracker:
-    """Simple progress tracking utility."""
-    
-    def __init__(self, total_items, update_interval=10):
-        self.total_items = total_items
-        self.update_interval = update_interval
-        self.current_item = 0
-        self.start_time = None
-    
-    def start(self):
-        """Start tracking progress."""
-        import time
-        self.start_time = time.time()
-        self.current_item = 0
-    
-    def update(self, items_processed=1):
-        """Update progress."""
-        import time
-        self.current_item += items_processed
-        
-        if self.current_item % self.update_interval == 0 or self.current_item >= self.total_items:
-            if self.start_time:
-                elapsed = time.time() - self.start_time
-                progress_pct = (self.current_item / self.total_items) * 100
-                rate = self.current_item / elapsed if elapsed > 0 else 0
-                
-                if self.current_item < self.total_items:
-                    eta = (self.total_items - self.current_item) / rate if rate > 0 else 0
-                    print(f"\rProgress: {self.current_item}/{self.total_items} ({progress_pct:.1f}%) - {rate:.1f}/s - ETA: {format_time(eta)}", end="")
-                else:
-                    print(f"\rCompleted: {self.current_item}/{self.total_items} ({progress_pct:.1f}%) - Total time: {format_time(elapsed)}")
-    
-    def finish(self):
-        """Finish progress tracking."""
-        if self.current_item < self.total_items:
-            self.current_item = self.total_items
-            self.update(0)
-        print()  # New line
+# Log-spaced stage timer buckets: 20 per decade from 1 microsecond to 1000 seconds
+TIMER_BUCKET_EDGES = [10 ** (k / 20) * 1e-6 for k in range(181)]
+
+class StageTimer:
+    """Count, total and a log-scale histogram of one pipeline stage's durations."""
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(TIMER_BUCKET_EDGES) + 1)
+    
+    def add(self, seconds, count=1):
+        """
+        Record a duration.
+        
+        Args:
+            seconds: Time spent
+            count: Items (e.g. frames of a batch) the time was spent on, each
+                   recorded with the average duration
+        """
+        per_item = seconds / count
+        self.count += count
+        self.total += seconds
+        self.max = max(self.max, per_item)
+        self.histogram[bisect.bisect_left(TIMER_BUCKET_EDGES, per_item)] += count
+    
+    def percentile(self, q):
+        """Get the q-th percentile (0-100) as the upper edge of its bucket, in seconds."""
+        if self.count == 0:
+            return 0.0
+        
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.histogram):
+            seen += bucket_count
+            if seen >= rank and bucket_count > 0:
+                edge = TIMER_BUCKET_EDGES[min(bucket, len(TIMER_BUCKET_EDGES) - 1)]
+                return min(edge, self.max)
+        return self.max
+    
+    def summary(self):
+        """Get count, total and per-item timings in milliseconds."""
+        return {
+            'count': self.count,
+            'total_s': round(self.total, 4),
+            'mean_ms': round(self.total / self.count * 1000, 4) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 4),
+            'p95_ms': round(self.percentile(95) * 1000, 4),
+            'p99_ms': round(self.percentile(99) * 1000, 4),
+            'max_ms': round(self.max * 1000, 4)
+        }
+
+class PipelineProfiler:
+    """
+    Per-stage timers for the detection pipeline.
+    
+    Each stage is recorded from a single thread, so no locking is needed.
+    Stages are created on first use by whichever thread records them, so
+    readers iterate over a copy of the stage table. Progress can be streamed
+    as JSON lines while running and a full report written as JSON at the end.
+    """
+    
+    def __init__(self, progress_path=None, append=False):
+        """
+        Args:
+            progress_path: JSON-lines progress stream, None to disable it
+            append: Continue an existing stream (when resuming) instead of starting a new one
+        """
+        self.stages = {}
+        self.progress_path = progress_path
+        self.append = append
+        self._progress_file = None
+    
+    def stage(self, name):
+        """Get the timer of a stage, creating it on first use."""
+        timer = self.stages.get(name)
+        if timer is None:
+            timer = self.stages[name] = StageTimer()
+        return timer
+    
+    def add(self, name, seconds, count=1):
+        """Record time spent in a stage."""
+        self.stage(name).add(seconds, count)
+    
+    def total(self, name):
+        """Total seconds spent in a stage."""
+        timer = self.stages.get(name)
+        return timer.total if timer is not None else 0.0
+    
+    def summary(self):
+        """Get the summary of every stage."""
+        return {name: timer.summary() for name, timer in list(self.stages.items())}
+    
+    def progress(self, processed, total, elapsed):
+        """
+        Write a progress record to the JSON-lines stream, if enabled.
+        
+        Args:
+            processed: Frames processed so far
+            total: Frames to process
+            elapsed: Seconds since processing started
+        """
+        if self.progress_path is None:
+            return
+        
+        if self._progress_file is None:
+            ensure_directory_exists(self.progress_path)
+            self._progress_file = open(self.progress_path, 'a' if self.append else 'w')
+        
+        record = {
+            'time': time.time(),
+            'processed': processed,
+            'total': total,
+            'percent': round(processed / total * 100, 2) if total > 0 else 0.0,
+            'fps': round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+            'stages': self.summary()
+        }
+        self._progress_file.write(json.dumps(record) + "\n")
+        self._progress_file.flush()
+    
+    def close(self):
+        """Close the progress stream."""
+        if self._progress_file is not None:
+            self._progress_file.close()
+            self._progress_file = None
+    
+    def write_report(self, report_path, **run_info):
+        """
+        Write the stage timings and run information as JSON.
+        
+        Args:
+            report_path: Path of the JSON report
+            **run_info: Extra fields, e.g. frames processed and fps
+        """
+        ensure_directory_exists(report_path)
+        with open(report_path, 'w') as f:
+            json.dump({**run_info, 'stages': self.summary()}, f, indent=2)
+
@@ -0,0 +1,288 @@
+"""
+Detector backends: the inference engines that turn images into raw detections.
+
+Every backend takes a list of model-ready images (already cropped or
+downscaled) and returns sv.Detections in the coordinates of those images.
+Mapping back to the full frame is left to the caller, so one backend
+instance can be reused across videos, image sizes and worker jobs.
+
+Backends:
+    ultralytics       PyTorch through ultralytics.YOLO (default)
+    onnxruntime       The same weights exported to ONNX, run on the CPU
+    onnxruntime-int8  The ONNX export with dynamically quantized INT8 weights
+
+ONNX exports are cached in DETECTOR_EXPORT_DIR, keyed by the weights hash
+and the input size, so only the first run pays for the export and later runs
+start without loading PyTorch at all.
+"""
+
+import os
+import json
+import shutil
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+import supervision as sv
+from detection_config import *
+from detection_utils import file_sha256
+
+DETECTOR_BACKENDS = ('ultralytics', 'onnxruntime', 'onnxruntime-int8')
+
+# Input size used when neither the run nor the camera sets one (ultralytics' default)
+DEFAULT_IMAGE_SIZE = 640
+
+class DetectorBackend(ABC):
+    """Interface shared by all detector backends."""
+
+    name = None
+
+    def __init__(self):
+        self.class_names = {}
+
+    @abstractmethod
+    def detect(self, images, classes=None, imgsz=None):
+        """
+        Run the detector on a batch of images.
+
+        Args:
+            images: List of BGR images
+            classes: Class ids to keep (None keeps every class)
+            imgsz: Model input size in pixels (None for the backend default)
+
+        Returns:
+            list: sv.Detections per image, in that image's pixel coordinates
+        """
+
+class UltralyticsBackend(DetectorBackend):
+    """YOLO through ultralytics with PyTorch eager execution."""
+
+    name = 'ultralytics'
+
+    def __init__(self, model_path, model=None):
+        """
+        Args:
+            model_path: Path to the .pt weights
+            model: Already loaded ultralytics.YOLO to reuse instead of loading model_path
+        """
+        super().__init__()
+        if model is None:
+            from ultralytics import YOLO
+            print("Loading YOLO model...")
+            model = YOLO(model_path)
+        self.model = model
+        self.class_names = model.model.names
+
+    def detect(self, images, classes=None, imgsz=None):
+        options = {'verbose': False, 'classes': classes}
+        if imgsz is not None:
+            options['imgsz'] = imgsz
+        return [sv.Detections.from_ultralytics(result) for result in self.model(images, **options)]
+
+def export_onnx_model(model_path, imgsz, int8=False, export_dir=DETECTOR_EXPORT_DIR):
+    """
+    Get the ONNX export of a YOLO model, exporting and quantizing on first use.
+
+    Args:
+        model_path: Path to the .pt weights
+        imgsz: Square input size the model is exported for
+        int8: Also produce a dynamically quantized INT8 variant and return it
+        export_dir: Directory of the export cache
+
+    Returns:
+        tuple: (onnx_path, class_names)
+    """
+    weights_hash = file_sha256(model_path)[:16]
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    base_path = os.path.join(export_dir, f"{stem}_{weights_hash}_{imgsz}")
+    fp32_path = base_path + ".onnx"
+    names_path = base_path + ".names.json"
+
+    if not (os.path.exists(fp32_path) and os.path.exists(names_path)):
+        from ultralytics import YOLO
+        print(f"Exporting {model_path} to ONNX at {imgsz}px (cached in {export_dir})...")
+        os.makedirs(export_dir, exist_ok=True)
+
+        # Export from a private copy so concurrent exports never share output files
+        temp_weights = f"{base_path}.{os.getpid()}.pt"
+        shutil.copyfile(model_path, temp_weights)
+        try:
+            model = YOLO(temp_weights)
+            exported_path = model.export(format='onnx', imgsz=imgsz, dynamic=True)
+            with open(names_path + ".tmp", 'w') as f:
+                json.dump({int(k): v for k, v in model.model.names.items()}, f)
+            os.replace(names_path + ".tmp", names_path)
+            os.replace(exported_path, fp32_path)
+        finally:
+            if os.path.exists(temp_weights):
+                os.remove(temp_weights)
+
+    with open(names_path, 'r') as f:
+        class_names = {int(k): v for k, v in json.load(f).items()}
+
+    if not int8:
+        return fp32_path, class_names
+
+    int8_path = base_path + "_int8.onnx"
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        print(f"Quantizing {fp32_path} to INT8...")
+        temp_path = f"{base_path}.{os.getpid()}_int8.onnx"
+        quantize_dynamic(fp32_path, temp_path, weight_type=QuantType.QUInt8)
+        os.replace(temp_path, int8_path)
+    return int8_path, class_names
+
+class OnnxRuntimeBackend(DetectorBackend):
+    """YOLOv8 ONNX export on ONNX Runtime's CPU provider, with YOLO-style pre- and post-processing."""
+
+    name = 'onnxruntime'
+
+    def __init__(self, model_path, int8=False, export_dir=DETECTOR_EXPORT_DIR,
+                 confidence=DETECTOR_CONFIDENCE, iou=DETECTOR_IOU,
+                 max_detections=DETECTOR_MAX_DETECTIONS, threads=ONNX_THREADS, imgsz=None):
+        """
+        Args:
+            model_path: Path to the .pt weights
+            int8: Use the dynamically quantized INT8 export
+            export_dir: Directory of the export cache
+            confidence: Minimum class score
+            iou: IoU threshold of the per-class non-maximum suppression
+            max_detections: Detections kept per image
+            threads: ONNX Runtime intra-op threads (None lets it decide)
+            imgsz: Input size to prepare a session for right away
+        """
+        super().__init__()
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ValueError(f"The {'onnxruntime-int8' if int8 else 'onnxruntime'} backend needs the "
+                             f"onnxruntime package (pip install -r requirements-onnx.txt)")
+        self.onnxruntime = onnxruntime
+
+        self.model_path = model_path
+        self.int8 = int8
+        self.export_dir = export_dir
+        self.confidence = confidence
+        self.iou = iou
+        self.max_detections = max_detections
+        self.threads = threads
+        if int8:
+            self.name = 'onnxruntime-int8'
+
+        # One session per input size, created on first use (the first also loads the class names)
+        self.sessions = {}
+        self._session(imgsz or DEFAULT_IMAGE_SIZE)
+
+    def _session(self, imgsz):
+        """Get the inference session for an input size."""
+        session = self.sessions.get(imgsz)
+        if session is None:
+            onnx_path, self.class_names = export_onnx_model(
+                self.model_path, imgsz, int8=self.int8, export_dir=self.export_dir
+            )
+            options = self.onnxruntime.SessionOptions()
+            options.graph_optimization_level = self.onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if self.threads is not None:
+                options.intra_op_num_threads = self.threads
+            session = self.onnxruntime.InferenceSession(
+                onnx_path,
+                sess_options=options,
+                providers=['CPUExecutionProvider']
+            )
+            self.sessions[imgsz] = session
+        return session
+
+    def detect(self, images, classes=None, imgsz=None):
+        imgsz = imgsz or DEFAULT_IMAGE_SIZE
+        session = self._session(imgsz)
+
+        # Letterbox every image into one NCHW float batch
+        batch = np.empty((len(images), 3, imgsz, imgsz), dtype=np.float32)
+        letterboxes = []
+        for i, image in enumerate(images):
+            padded, gain, pad = self._letterbox(image, imgsz)
+            batch[i] = padded[:, :, ::-1].transpose(2, 0, 1) / 255.0
+            letterboxes.append((gain, pad, image.shape[:2]))
+
+        outputs = session.run(None, {session.get_inputs()[0].name: batch})[0]
+        return [
+            self._postprocess(prediction, classes, *letterbox)
+            for prediction, letterbox in zip(outputs, letterboxes)
+        ]
+
+    @staticmethod
+    def _letterbox(image, imgsz):
+        """Resize keeping the aspect ratio and pad to a square, like ultralytics."""
+        height, width = image.shape[:2]
+        gain = min(imgsz / height, imgsz / width)
+        new_width, new_height = int(round(width * gain)), int(round(height * gain))
+        pad_x, pad_y = (imgsz - new_width) / 2, (imgsz - new_height) / 2
+
+        if (new_width, new_height) != (width, height):
+            image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+        left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+        padded = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                                    value=(114, 114, 114))
+        return padded, gain, (left, top)
+
+    def _postprocess(self, prediction, classes, gain, pad, image_shape):
+        """Turn one (4 + classes, anchors) YOLOv8 output into detections in image pixels."""
+        prediction = prediction.T
+        scores = prediction[:, 4:]
+        class_id = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(scores)), class_id]
+
+        keep = confidence >= self.confidence
+        if classes is not None:
+            keep &= np.isin(class_id, classes)
+        boxes, confidence, class_id = prediction[keep, :4], confidence[keep], class_id[keep]
+        if len(boxes) == 0:
+            return sv.Detections.empty()
+
+        # Center/size to corners, then undo the letterbox
+        xyxy = np.empty_like(boxes)
+        xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+        xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+        xyxy -= np.array([pad[0], pad[1], pad[0], pad[1]], dtype=xyxy.dtype)
+        xyxy /= gain
+        height, width = image_shape
+        xyxy = np.clip(xyxy, 0, [width, height, width, height]).astype(np.float32)
+
+        # Per-class NMS by shifting each class into its own coordinate range
+        offset_boxes = xyxy + class_id[:, None].astype(np.float32) * 8192
+        indices = cv2.dnn.NMSBoxes(
+            np.column_stack([offset_boxes[:, :2], offset_boxes[:, 2:] - offset_boxes[:, :2]]).tolist(),
+            confidence.tolist(),
+            self.confidence,
+            self.iou,
+            top_k=self.max_detections
+        )
+        indices = np.asarray(indices, dtype=int).reshape(-1)
+        return sv.Detections(
+            xyxy=xyxy[indices],
+            confidence=confidence[indices].astype(np.float32),
+            class_id=class_id[indices].astype(int)
+        )
+
+def create_detector_backend(name, model_path, model=None, imgsz=None, threads=ONNX_THREADS):
+    """
+    Create a detector backend by name.
+
+    Args:
+        name: One of DETECTOR_BACKENDS
+        model_path: Path to the .pt weights
+        model: Already loaded ultralytics.YOLO, reused by the ultralytics backend
+        imgsz: Input size the run will use, so ONNX backends export it up front
+        threads: ONNX Runtime intra-op threads (None lets it decide)
+
+    Returns:
+        DetectorBackend: The backend
+    """
+    if name == 'ultralytics':
+        return UltralyticsBackend(model_path, model=model)
+    if name == 'onnxruntime':
+        return OnnxRuntimeBackend(model_path, threads=threads, imgsz=imgsz)
+    if name == 'onnxruntime-int8':
+        return OnnxRuntimeBackend(model_path, int8=True, threads=threads, imgsz=imgsz)
+    raise ValueError(f"Unknown detector backend '{name}', expected one of {', '.join(DETECTOR_BACKENDS)}")
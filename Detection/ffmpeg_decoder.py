@@ -0,0 +1,187 @@
+"""
+Video decoding through an ffmpeg subprocess pipe.
+
+cv2.VideoCapture seeks with CAP_PROP_POS_FRAMES, which is slow and not
+always frame accurate on long H.264 files, and it always decodes at full
+resolution. The ffmpeg decoder instead:
+
+    - seeks on the input (-ss before -i): ffmpeg jumps to the keyframe before
+      the start and decodes forward, dropping frames up to the exact start
+    - applies the frame stride in the decoder, so skipped frames are never
+      converted to BGR or piped
+    - optionally scales in the decoder, so only the smaller frames are
+      converted and piped
+    - reads raw BGR frames from the pipe straight into preallocated buffers
+
+FFmpegFrameReader has the read()/grab()/isOpened()/release() subset of
+cv2.VideoCapture that the video processor and the inference pool's decoder
+use, so both decoders plug into the same loops.
+"""
+
+import cv2
+import numpy as np
+from detection_config import *
+
+VIDEO_DECODERS = ('opencv', 'ffmpeg')
+
+def scaled_frame_size(width, height, scale):
+    """
+    Get the size frames are decoded at.
+
+    Scaled sizes are rounded to even numbers, which YUV 4:2:0 encoders need.
+
+    Args:
+        width: Source width in pixels
+        height: Source height in pixels
+        scale: Factor in (0, 1], None to keep the source size
+
+    Returns:
+        tuple: (width, height)
+    """
+    if scale is None or scale == 1:
+        return width, height
+    if not 0 < scale <= 1:
+        raise ValueError(f"Decoder scale must be in (0, 1], got {scale}")
+    return max(2, int(round(width * scale / 2)) * 2), max(2, int(round(height * scale / 2)) * 2)
+
+class FFmpegFrameReader:
+    """Sampled frames of a video range, decoded by ffmpeg and read from its stdout."""
+
+    def __init__(self, input_path, frame_size, start_frame=0, frame_count=None, fps=30.0, stride=1,
+                 slots=1, source_size=None, ffmpeg_binary=FFMPEG_BINARY):
+        """
+        Args:
+            input_path: Path to the video
+            frame_size: (width, height) frames are decoded at
+            start_frame: First frame to decode
+            frame_count: Sampled frames to decode (None until the end of the video)
+            fps: Exact frame rate of the video, used to turn start_frame into a seek time
+            stride: Decode every stride-th frame from start_frame
+            slots: Frame buffers read() cycles through when it is not given one; must cover
+                   every frame the caller holds at once
+            source_size: (width, height) of the video, frames are only scaled when it differs
+            ffmpeg_binary: ffmpeg executable
+        """
+        import ffmpeg
+
+        self.input_path = input_path
+        self.width, self.height = frame_size
+        self.frame_bytes = self.width * self.height * 3
+        self.buffers = np.empty((max(1, slots), self.height, self.width, 3), dtype=np.uint8)
+        self.next_slot = 0
+
+        # Seek half a frame early so rounding never skips the start frame
+        input_options = {}
+        if start_frame > 0:
+            input_options['ss'] = f"{max(0.0, (start_frame - 0.5) / fps):.6f}"
+        video = ffmpeg.input(input_path, **input_options).video
+        if stride > 1:
+            video = video.filter('framestep', stride)
+        if source_size is not None and tuple(source_size) != (self.width, self.height):
+            video = video.filter('scale', self.width, self.height, flags='area')
+
+        # Passthrough keeps ffmpeg from duplicating or dropping frames to hold a constant rate
+        output_options = {'format': 'rawvideo', 'pix_fmt': 'bgr24', 'vsync': 'passthrough'}
+        if frame_count is not None:
+            output_options['frames:v'] = frame_count
+
+        try:
+            self.process = (
+                video.output('pipe:', **output_options)
+                .global_args('-loglevel', 'error', '-nostdin')
+                .run_async(cmd=ffmpeg_binary, pipe_stdout=True)
+            )
+        except FileNotFoundError:
+            raise ValueError(f"ffmpeg executable not found: {ffmpeg_binary}")
+
+    def isOpened(self):
+        """Check whether the ffmpeg process is still in use."""
+        return self.process is not None
+
+    def read(self, image=None):
+        """
+        Read the next sampled frame.
+
+        Args:
+            image: Contiguous (height, width, 3) uint8 array to read into,
+                   None to use the next of the reader's own buffers
+
+        Returns:
+            tuple: (True, frame), or (False, None) at the end of the range
+        """
+        if self.process is None:
+            return False, None
+
+        if image is None:
+            image = self.buffers[self.next_slot]
+            self.next_slot = (self.next_slot + 1) % len(self.buffers)
+        elif image.shape != (self.height, self.width, 3) or image.dtype != np.uint8:
+            raise ValueError(f"Frame buffer {image.shape} {image.dtype} does not fit "
+                             f"{self.width}x{self.height} BGR frames")
+
+        view = memoryview(image).cast('B')
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                self._check_exit()
+                return False, None
+            filled += count
+        return True, image
+
+    def grab(self):
+        """Skip a frame between samples; the decoder already dropped it, so there is nothing to do."""
+        return self.process is not None
+
+    def _check_exit(self):
+        """Raise if ffmpeg stopped because of an error (its messages go to the console)."""
+        returncode = self.process.wait()
+        if returncode != 0:
+            raise ValueError(f"ffmpeg failed to decode {self.input_path} (exit code {returncode})")
+
+    def release(self):
+        """Stop ffmpeg and close its output pipe."""
+        if self.process is None:
+            return
+        self.process.stdout.close()
+        if self.process.poll() is None:
+            self.process.terminate()
+        self.process.wait()
+        self.process = None
+
+def open_frame_reader(input_path, start_frame, end_frame, stride=1, decoder=VIDEO_DECODER,
+                      frame_size=None, source_size=None, fps=None, slots=1):
+    """
+    Open a reader positioned at start_frame for a decoder.
+
+    Args:
+        input_path: Path to the video
+        start_frame: First frame to read
+        end_frame: Frame after the last one to read
+        stride: Frame stride (the opencv reader leaves skipping to the caller's grab() calls)
+        decoder: One of VIDEO_DECODERS
+        frame_size: (width, height) the ffmpeg decoder outputs
+        source_size: (width, height) of the video
+        fps: Exact frame rate of the video, for the ffmpeg seek
+        slots: Frame buffers of the ffmpeg reader
+
+    Returns:
+        cv2.VideoCapture or FFmpegFrameReader
+    """
+    if decoder == 'opencv':
+        cap = cv2.VideoCapture(input_path)
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        return cap
+    if decoder == 'ffmpeg':
+        return FFmpegFrameReader(
+            input_path,
+            frame_size,
+            start_frame=start_frame,
+            frame_count=len(range(start_frame, end_frame, stride)),
+            fps=fps,
+            stride=stride,
+            slots=slots,
+            source_size=source_size
+        )
+    raise ValueError(f"Unknown video decoder '{decoder}', expected one of {', '.join(VIDEO_DECODERS)}")
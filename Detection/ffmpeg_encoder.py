@@ -0,0 +1,143 @@
+"""
+Video encoding through an ffmpeg subprocess pipe.
+
+cv2.VideoWriter encodes on the calling thread with whatever codec the OpenCV
+build supports, so the output falls back from H.264 to MPEG-4 Part 2 on
+many installs and gives no control over speed or quality. The ffmpeg
+encoder instead pipes raw BGR frames to an ffmpeg process:
+
+    - encoding runs in a separate process, so it overlaps the pipeline on
+      multi-core machines and a write only blocks when ffmpeg falls behind
+    - the x264 preset and CRF set the speed/size and quality tradeoffs
+    - a preview writer scales frames down and drops frames to a lower rate,
+      for a quick-look clip that is far cheaper to encode and share than
+      the full-resolution video
+
+FFmpegFrameWriter has the write()/isOpened()/release() subset of
+cv2.VideoWriter that the video processor uses, so both encoders plug into
+the same loops.
+"""
+
+import os
+
+import numpy as np
+from detection_config import *
+from ffmpeg_decoder import scaled_frame_size
+
+VIDEO_ENCODERS = ('opencv', 'ffmpeg')
+
+def preview_path_for(output_video_path):
+    """Get the preview clip that belongs to an output video."""
+    return os.path.splitext(output_video_path)[0] + "_preview.mp4"
+
+def preview_settings(frame_width, frame_height, fps, width=PREVIEW_WIDTH, preview_fps=PREVIEW_FPS):
+    """
+    Get the size and frame step of the preview clip.
+
+    Frames are never scaled up or duplicated: smaller videos keep their size
+    and slower ones their rate.
+
+    Args:
+        frame_width: Width of the processed frames
+        frame_height: Height of the processed frames
+        fps: Rate frames are written at
+        width: Preview width in pixels
+        preview_fps: Preview frame rate
+
+    Returns:
+        tuple: ((width, height), frame_step) where every frame_step-th frame is kept
+    """
+    scale = min(1.0, width / frame_width)
+    frame_step = max(1, int(round(fps / preview_fps))) if preview_fps else 1
+    return scaled_frame_size(frame_width, frame_height, scale), frame_step
+
+class FFmpegFrameWriter:
+    """Frames piped to an ffmpeg process that encodes them to a video file."""
+
+    def __init__(self, output_path, frame_size, fps, output_size=None, frame_step=1,
+                 codec=FFMPEG_CODEC, preset=FFMPEG_PRESET, crf=FFMPEG_CRF, ffmpeg_binary=FFMPEG_BINARY):
+        """
+        Args:
+            output_path: Path of the video to write
+            frame_size: (width, height) of the frames passed to write()
+            fps: Rate of the frames passed to write()
+            output_size: (width, height) to scale frames to, None to keep frame_size
+            frame_step: Keep every frame_step-th frame written, the output rate is fps / frame_step
+            codec: ffmpeg video encoder
+            preset: Encoder preset (speed against file size)
+            crf: Constant rate factor (quality, lower is better)
+            ffmpeg_binary: ffmpeg executable
+        """
+        import ffmpeg
+
+        self.output_path = output_path
+        self.width, self.height = frame_size
+        self.frame_step = max(1, int(frame_step))
+        self.frame_index = 0
+        self.frames_written = 0
+
+        video = ffmpeg.input(
+            'pipe:', format='rawvideo', pix_fmt='bgr24',
+            s=f"{self.width}x{self.height}", framerate=fps / self.frame_step
+        ).video
+        output_width, output_height = output_size or frame_size
+        if (output_width, output_height) != (self.width, self.height):
+            video = video.filter('scale', output_width, output_height, flags='area')
+        elif output_width % 2 or output_height % 2:
+            # 4:2:0 chroma needs even sizes, drop the odd row or column
+            video = video.filter('crop', output_width // 2 * 2, output_height // 2 * 2, 0, 0)
+
+        try:
+            self.process = (
+                video.output(output_path, vcodec=codec, preset=preset, crf=crf,
+                             pix_fmt='yuv420p', movflags='+faststart')
+                .global_args('-loglevel', 'error')
+                .overwrite_output()
+                .run_async(cmd=ffmpeg_binary, pipe_stdin=True)
+            )
+        except FileNotFoundError:
+            raise ValueError(f"ffmpeg executable not found: {ffmpeg_binary}")
+
+    def isOpened(self):
+        """Check whether the ffmpeg process is still in use."""
+        return self.process is not None
+
+    def write(self, frame):
+        """
+        Send a frame to the encoder (dropped when it falls between preview frames).
+
+        Args:
+            frame: (height, width, 3) uint8 BGR frame of frame_size
+        """
+        index = self.frame_index
+        self.frame_index += 1
+        if index % self.frame_step or self.process is None:
+            return
+
+        if frame.shape != (self.height, self.width, 3) or frame.dtype != np.uint8:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} does not fit "
+                             f"{self.width}x{self.height} BGR frames")
+        try:
+            self.process.stdin.write(memoryview(np.ascontiguousarray(frame)).cast('B'))
+        except BrokenPipeError:
+            returncode = self.process.wait()
+            self.process = None
+            raise ValueError(f"ffmpeg failed to encode {self.output_path} (exit code {returncode})")
+        self.frames_written += 1
+
+    def release(self):
+        """
+        Close the pipe and wait for ffmpeg to finish the file.
+
+        Returns:
+            bool: Whether ffmpeg exited cleanly (its messages go to the console)
+        """
+        if self.process is None:
+            return False
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.process.wait()
+        self.process = None
+        return returncode == 0
@@ -0,0 +1,271 @@
+"""
+Multi-process inference pool fed by a shared-memory frame ring.
+
+A decoder process writes frames into slots of a shared memory ring buffer,
+inference worker processes (each with its own detector backend) read the slots
+without copying and return detections, and the parent process consumes the
+results in frame order to run tracking.
+"""
+
+import os
+import queue
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+from detection_config import *
+from model_input import ModelInputTransform
+from ffmpeg_decoder import open_frame_reader
+
+class SharedFrameRing:
+    """Fixed number of frame-sized slots in a single shared memory block."""
+
+    def __init__(self, slot_count, frame_shape, name=None):
+        self.slot_count = slot_count
+        self.frame_shape = tuple(frame_shape)
+        slot_bytes = int(np.prod(self.frame_shape))
+
+        # Create the block in the parent, attach by name in worker processes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slot_count * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.frames = np.ndarray(
+            (slot_count,) + self.frame_shape,
+            dtype=np.uint8,
+            buffer=self.shm.buf
+        )
+
+    @property
+    def name(self):
+        """Name used by other processes to attach to the ring."""
+        return self.shm.name
+
+    def slot(self, index):
+        """Get a zero-copy view of a slot."""
+        return self.frames[index]
+
+    def close(self):
+        """Detach from the ring, removing it if this process created it."""
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _configure_worker(torch_threads, opencv_threads, cpu_set):
+    """Limit thread pools and pin the current process so workers don't oversubscribe cores."""
+    if cpu_set and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpu_set)
+
+    if opencv_threads is not None:
+        cv2.setNumThreads(opencv_threads)
+
+    if torch_threads is not None:
+        os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+
+def _decoder_main(input_path, reader_options, ring_name, slot_count, frame_shape, start_frame, end_frame, stride,
+                  free_slots, task_queue, result_queue, worker_count):
+    """Decode sampled frames straight into free ring slots and queue them for inference."""
+    ring = SharedFrameRing(slot_count, frame_shape, name=ring_name)
+    cap = open_frame_reader(input_path, start_frame, end_frame, stride, **reader_options)
+    frame_number = start_frame
+    try:
+        while cap.isOpened() and frame_number < end_frame:
+            slot = free_slots.get()
+            buffer = ring.slot(slot)
+            ret, frame = cap.read(buffer)
+            if not ret:
+                break
+            if frame is not buffer:
+                buffer[:] = frame
+
+            task_queue.put((slot, frame_number))
+
+            # Skip to the next sampled frame without decoding
+            for _ in range(min(stride, end_frame - frame_number) - 1):
+                if not cap.grab():
+                    break
+            frame_number += stride
+    except Exception:
+        result_queue.put(("error", "decoder", traceback.format_exc()))
+    finally:
+        # Tell the consumer how many frames exist and stop every worker
+        result_queue.put(("end", frame_number))
+        for _ in range(worker_count):
+            task_queue.put(None)
+        cap.release()
+        ring.close()
+
+def _inference_worker_main(worker_index, model_path, ring_name, slot_count, frame_shape, backend_name,
+                           classes, imgsz, model_input, task_queue, result_queue, torch_threads, opencv_threads, cpu_set):
+    """Run the detector backend on ring slots and return raw detections to the consumer."""
+    _configure_worker(torch_threads, opencv_threads, cpu_set)
+    ring = SharedFrameRing(slot_count, frame_shape, name=ring_name)
+    try:
+        from detector_backends import create_detector_backend
+
+        backend = create_detector_backend(backend_name, model_path, imgsz=imgsz, threads=torch_threads)
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            slot, frame_number = task
+
+            frame = model_input.apply(ring.slot(slot))
+            detections = backend.detect([frame], classes=classes, imgsz=imgsz)[0]
+            result_queue.put((
+                "frame",
+                slot,
+                frame_number,
+                model_input.boxes_to_frame(detections.xyxy),
+                detections.confidence,
+                detections.class_id
+            ))
+    except Exception:
+        result_queue.put(("error", f"worker {worker_index}", traceback.format_exc()))
+    finally:
+        ring.close()
+
+def assign_worker_cpus(worker_count, cpu_affinity=WORKER_CPU_AFFINITY):
+    """
+    Work out the CPU set for each inference worker.
+
+    Args:
+        worker_count: Number of inference workers
+        cpu_affinity: "auto" to split the available cores evenly, a list with
+                      one core list per worker, or None to disable pinning
+
+    Returns:
+        list: CPU set (or None) for each worker
+    """
+    if cpu_affinity is None or not hasattr(os, "sched_getaffinity"):
+        return [None] * worker_count
+
+    if cpu_affinity == "auto":
+        cpus = sorted(os.sched_getaffinity(0))
+        per_worker = max(1, len(cpus) // worker_count)
+        return [
+            cpus[(i * per_worker) % len(cpus):(i * per_worker) % len(cpus) + per_worker]
+            for i in range(worker_count)
+        ]
+
+    if len(cpu_affinity) < worker_count:
+        raise ValueError(f"WORKER_CPU_AFFINITY lists {len(cpu_affinity)} core sets for {worker_count} workers")
+    return [list(cpus) for cpus in cpu_affinity[:worker_count]]
+
+class InferencePool:
+    def __init__(self, video_processor, model_path, workers=INFERENCE_WORKERS,
+                 torch_threads=WORKER_TORCH_THREADS, opencv_threads=WORKER_OPENCV_THREADS,
+                 cpu_affinity=WORKER_CPU_AFFINITY, ring_slots=FRAME_RING_SLOTS,
+                 backend=DETECTOR_BACKEND, classes=VEHICLE_CLASS_IDS, imgsz=None, model_input=None):
+        self.video_processor = video_processor
+        self.model_path = model_path
+        self.backend = backend  # Detector backend name, created in each worker
+        self.classes = classes
+        self.imgsz = imgsz
+        self.model_input = model_input  # ModelInputTransform applied in the workers (None for full frames)
+        self.workers = max(1, int(workers))
+        self.opencv_threads = opencv_threads
+        self.cpu_sets = assign_worker_cpus(self.workers, cpu_affinity)
+        self.ring_slots = ring_slots or 2 * self.workers + 2
+
+        # Default torch threads to the cores each worker is pinned to
+        if torch_threads is None:
+            cpus_per_worker = [len(cpus) for cpus in self.cpu_sets if cpus]
+            torch_threads = min(cpus_per_worker) if cpus_per_worker else max(1, (os.cpu_count() or 1) // self.workers)
+        self.torch_threads = torch_threads
+
+    def results(self):
+        """
+        Run the pool and yield detections in frame order.
+
+        The yielded frame is a view into the shared ring. It stays valid until
+        the next item is requested, after which its slot is reused.
+
+        Yields:
+            tuple: (frame, xyxy, confidence, class_id, frame_number)
+        """
+        video = self.video_processor
+        frame_shape = (video.frame_height, video.frame_width, 3)
+        model_input = self.model_input or ModelInputTransform(video.frame_width, video.frame_height)
+        context = mp.get_context("spawn")
+
+        ring = SharedFrameRing(self.ring_slots, frame_shape)
+        free_slots = context.Queue()
+        task_queue = context.Queue()
+        result_queue = context.Queue()
+        for slot in range(self.ring_slots):
+            free_slots.put(slot)
+
+        processes = [context.Process(
+            target=_decoder_main,
+            args=(video.input_path, video.reader_options(), ring.name, self.ring_slots, frame_shape,
+                  video.start_frame, video.end_frame, video.stride, free_slots, task_queue,
+                  result_queue, self.workers),
+            name="frame-decoder",
+            daemon=True
+        )]
+        for worker_index, cpu_set in enumerate(self.cpu_sets):
+            processes.append(context.Process(
+                target=_inference_worker_main,
+                args=(worker_index, self.model_path, ring.name, self.ring_slots, frame_shape, self.backend,
+                      self.classes, self.imgsz, model_input, task_queue, result_queue, self.torch_threads, self.opencv_threads, cpu_set),
+                name=f"inference-worker-{worker_index}",
+                daemon=True
+            ))
+
+        print(f"Starting {self.workers} inference workers "
+              f"({self.torch_threads} torch threads each, {self.ring_slots} ring slots)")
+        for process in processes:
+            process.start()
+
+        try:
+            pending = {}
+            next_frame = video.start_frame
+            end_frame = None
+
+            while end_frame is None or next_frame < end_frame:
+                # Reorder: hand out frames strictly in sequence
+                if next_frame in pending:
+                    slot, xyxy, confidence, class_id = pending.pop(next_frame)
+                    yield ring.slot(slot), xyxy, confidence, class_id, next_frame
+                    free_slots.put(slot)
+                    next_frame += video.stride
+                    continue
+
+                message = self._next_message(result_queue, processes)
+                if message[0] == "frame":
+                    _, slot, frame_number, xyxy, confidence, class_id = message
+                    pending[frame_number] = (slot, xyxy, confidence, class_id)
+                elif message[0] == "end":
+                    end_frame = message[1]
+                else:
+                    _, source, error = message
+                    raise RuntimeError(f"Inference pool {source} failed:\n{error}")
+        finally:
+            for process in processes:
+                process.join(timeout=PIPELINE_QUEUE_TIMEOUT)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+            ring.close()
+
+    @staticmethod
+    def _next_message(result_queue, processes):
+        """Wait for the next result, failing if a process died without reporting."""
+        while True:
+            try:
+                return result_queue.get(timeout=1.0)
+            except queue.Empty:
+                for process in processes:
+                    if process.exitcode not in (None, 0):
+                        raise RuntimeError(f"{process.name} exited with code {process.exitcode}")
@@ -0,0 +1,152 @@
+"""
+Live capture source that always hands out the freshest frame.
+
+A capture thread reads the source as fast as it delivers frames and keeps
+only the latest one. When processing falls behind, older frames are
+overwritten and counted as dropped instead of queueing up, so latency stays
+bounded by the time it takes to process a single frame.
+
+Every frame gets a frame number derived from its capture timestamp
+(elapsed capture time times the source fps), so gaps left by dropped frames
+keep their true length and speeds computed from frame differences stay
+correct. A video file can stand in for a live feed: it is played at its
+native rate and its frame numbers are its own frame indices.
+"""
+
+import os
+import time
+import threading
+
+import cv2
+from detection_config import *
+
+class LiveFrameSource:
+    def __init__(self, source, default_fps=LIVE_DEFAULT_FPS):
+        """
+        Args:
+            source: Device index (int or digit string), stream URL, pipe or video file
+            default_fps: Frame rate assumed when the source does not report one
+        """
+        self.source = source
+        self.default_fps = default_fps
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+        self.cap = None
+        self.frame_width = 0
+        self.frame_height = 0
+        self.fps = 0
+        self.profiler = None  # Times decoding when set
+
+        # Freshest frame as (frame, frame_number, capture_time), guarded by _condition
+        self._latest = None
+        self._ended = False
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._first_frame = None  # Read by open() when the source reports no frame size
+        self.start_time = None
+
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.error = None
+
+    def open(self):
+        """Open the capture and read its properties."""
+        source = int(self.source) if str(self.source).isdigit() else self.source
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open live source: {self.source}")
+
+        # Keep the driver's own queue short, frames waiting there only add latency
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        # Pipes and some streams only know their size once a frame arrived
+        if self.frame_width <= 0 or self.frame_height <= 0:
+            ret, self._first_frame = self.cap.read()
+            if not ret:
+                raise ValueError(f"Live source delivered no frames: {self.source}")
+            self.frame_height, self.frame_width = self._first_frame.shape[:2]
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or self.default_fps
+        if self.fps <= 0 or self.fps > 1000:
+            self.fps = self.default_fps
+
+    def start(self):
+        """Start capturing on a background thread."""
+        self.start_time = time.monotonic()
+        self._thread = threading.Thread(target=self._capture_loop, name="live-capture", daemon=True)
+        self._thread.start()
+
+    def _capture_loop(self):
+        """Read frames until the source ends or stop() is called, keeping the latest."""
+        index = 0
+        last_frame_number = -1
+        try:
+            while not self._stop_event.is_set():
+                # A file stands in for a live feed by playing at its native rate
+                if self.is_file:
+                    delay = self.start_time + index / self.fps - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                decode_start = time.perf_counter()
+                if self._first_frame is not None:
+                    ret, frame, self._first_frame = True, self._first_frame, None
+                else:
+                    ret, frame = self.cap.read()
+                capture_time = time.monotonic()
+                if not ret:
+                    break
+                if self.profiler is not None:
+                    self.profiler.add('decode', time.perf_counter() - decode_start)
+
+                if self.is_file:
+                    frame_number = index
+                else:
+                    frame_number = max(last_frame_number + 1, round((capture_time - self.start_time) * self.fps))
+                last_frame_number = frame_number
+                index += 1
+
+                with self._condition:
+                    if self._latest is not None:
+                        self.dropped_frames += 1
+                    self._latest = (frame, frame_number, capture_time)
+                    self.captured_frames += 1
+                    self._condition.notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._condition:
+                self._ended = True
+                self._condition.notify()
+
+    def latest(self):
+        """
+        Wait for a frame that has not been handed out yet.
+
+        Returns:
+            tuple: (frame, frame_number, capture_time), or None once the source has ended
+
+        Raises:
+            Exception: The error that stopped the capture thread, if any
+        """
+        with self._condition:
+            while self._latest is None and not self._ended:
+                self._condition.wait()
+            item, self._latest = self._latest, None
+
+        if item is None and self.error is not None:
+            raise self.error
+        return item
+
+    def stop(self):
+        """Stop capturing and release the source."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
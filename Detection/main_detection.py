@@ -2,9 +2,15 @@
 Main entry point for the modular vehicle detection and tracking system.
 """
 
+import argparse
+
 from vehicle_tracker import VehicleTracker
 from detection_config import *
 from detection_utils import parse_time_string
+from detector_backends import DETECTOR_BACKENDS
+from track_cache import track_cache_path_for, rederive_trajectories
+from ffmpeg_decoder import VIDEO_DECODERS
+from ffmpeg_encoder import VIDEO_ENCODERS, preview_path_for
 
 def get_time_range_from_config():
     """
@@ -33,21 +39,187 @@ def get_time_range_from_config():
     
     return start_time, end_time
 
+def parse_arguments():
+    """Parse command line options that override the configuration defaults."""
+    parser = argparse.ArgumentParser(description="DriveTRACE vehicle detection and tracking")
+    parser.add_argument(
+        "--trajectories-only",
+        action=argparse.BooleanOptionalAction,
+        default=TRAJECTORIES_ONLY,
+        help="only write the trajectory CSV, skipping annotation and the output video"
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=SHARD_COUNT,
+        help="split the time range into this many overlapping chunks processed in parallel"
+    )
+    parser.add_argument(
+        "--compact",
+        action=argparse.BooleanOptionalAction,
+        default=COMPACT_EXPORT,
+        help="compact the trajectory output (stationary runs, simplified paths, no short tracks)"
+    )
+    parser.add_argument(
+        "--detection-cache",
+        action=argparse.BooleanOptionalAction,
+        default=DETECTION_CACHE,
+        help="record raw detections, or replay them if this video and model were processed before"
+    )
+    parser.add_argument(
+        "--track-cache",
+        action=argparse.BooleanOptionalAction,
+        default=TRACK_CACHE,
+        help="save the tracked boxes of every frame next to the output CSV for --rederive"
+    )
+    parser.add_argument(
+        "--rederive",
+        metavar="TRACK_CACHE",
+        nargs="?",
+        const=track_cache_path_for(DEFAULT_OUTPUT_CSV),
+        default=None,
+        help="rebuild the output CSV from a track cache with the current ROI, perspective and speed settings"
+    )
+    parser.add_argument(
+        "--speed-window",
+        type=int,
+        default=SPEED_SMOOTHING_WINDOW,
+        help="samples on each side that --rederive speeds span (0 for the speed filter used while tracking)"
+    )
+    parser.add_argument(
+        "--roi-crop",
+        action=argparse.BooleanOptionalAction,
+        default=ROI_CROP_INFERENCE,
+        help="run the model on the ROI's bounding rectangle instead of the full frame"
+    )
+    parser.add_argument(
+        "--motion-gate",
+        action=argparse.BooleanOptionalAction,
+        default=MOTION_GATE,
+        help="skip inference on frames where nothing moved inside the ROI"
+    )
+    parser.add_argument(
+        "--imgsz",
+        type=int,
+        default=None,
+        help="model input size in pixels (defaults to CAMERA_INFERENCE_SIZES, then INFERENCE_IMAGE_SIZE)"
+    )
+    parser.add_argument(
+        "--downscale",
+        type=float,
+        default=INFERENCE_DOWNSCALE,
+        help="shrink frames by this factor before inference, e.g. 0.5 for 4K footage"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=DETECTOR_BACKENDS,
+        default=DETECTOR_BACKEND,
+        help="detector backend; the ONNX Runtime ones export the weights on first use"
+    )
+    parser.add_argument(
+        "--decoder",
+        choices=VIDEO_DECODERS,
+        default=VIDEO_DECODER,
+        help="video decoder; ffmpeg seeks on the input and applies the stride and scaling while decoding"
+    )
+    parser.add_argument(
+        "--decoder-scale",
+        type=float,
+        default=DECODER_SCALE,
+        help="scale frames in the ffmpeg decoder by this factor, e.g. 0.5 for 4K footage"
+    )
+    parser.add_argument(
+        "--encoder",
+        choices=VIDEO_ENCODERS,
+        default=VIDEO_ENCODER,
+        help="video encoder; ffmpeg encodes in a separate process with the configured preset and CRF"
+    )
+    parser.add_argument(
+        "--preview",
+        action=argparse.BooleanOptionalAction,
+        default=PREVIEW_OUTPUT,
+        help="also write a low-resolution, low frame rate quick-look clip next to the output video"
+    )
+    parser.add_argument(
+        "--preview-only",
+        action=argparse.BooleanOptionalAction,
+        default=PREVIEW_ONLY,
+        help="write the quick-look clip instead of the full-resolution video"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted run from the checkpoint next to the output CSV"
+    )
+    parser.add_argument(
+        "--live",
+        metavar="SOURCE",
+        default=None,
+        help="process a live capture source (device index, stream URL or pipe; a video file plays at native rate)"
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=None,
+        help="stop --live processing after this many seconds"
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="run the jobs of a JSON job manifest instead of the configured video"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=BATCH_WORKERS,
+        help="worker processes for --manifest, each loads the model once"
+    )
+    return parser.parse_args()
+
 def main():
     """Main function to run vehicle detection and tracking."""
+    args = parse_arguments()
+    
+    if args.manifest is not None:
+        from batch_runner import run_batch
+        print("=== DriveTRACE Batch Processing ===")
+        print(f"Manifest: {args.manifest}")
+        run_batch(args.manifest, DEFAULT_MODEL_PATH, workers=args.workers, detector_backend=args.backend)
+        return
+    
+    if args.rederive is not None:
+        print("=== DriveTRACE Trajectory Re-derivation ===")
+        print(f"Track cache: {args.rederive}")
+        print(f"Output CSV: {DEFAULT_OUTPUT_CSV}")
+        rederive_trajectories(
+            args.rederive,
+            DEFAULT_OUTPUT_CSV,
+            smoothing_window=args.speed_window,
+            compact=args.compact
+        )
+        return
+    
     # Configuration
     video_path = DEFAULT_INPUT_VIDEO
     model_path = DEFAULT_MODEL_PATH
     output_video_path = DEFAULT_OUTPUT_VIDEO
     output_csv_path = DEFAULT_OUTPUT_CSV
     
-    # Get time range settings
-    start_time, end_time = get_time_range_from_config()
+    # Get time range settings (a live source runs for the requested duration instead)
+    if args.live is not None:
+        if args.shards > 1:
+            raise ValueError("--live can't be combined with --shards")
+        video_path = args.live
+        start_time, end_time = None, args.duration
+    else:
+        start_time, end_time = get_time_range_from_config()
     
     print("=== DriveTRACE Vehicle Detection & Tracking ===")
-    print(f"Input video: {video_path}")
-    print(f"YOLO model: {model_path}")
-    print(f"Output video: {output_video_path}")
+    print(f"Input {'source (live)' if args.live is not None else 'video'}: {video_path}")
+    print(f"YOLO model: {model_path} ({args.backend})")
+    print(f"Output video: {'disabled (trajectories only)' if args.trajectories_only else 'disabled (preview only)' if args.preview_only else output_video_path}")
+    if (args.preview or args.preview_only) and not args.trajectories_only:
+        print(f"Preview: {preview_path_for(output_video_path)}")
     print(f"Output CSV: {output_csv_path}")
     
     if start_time is not None or end_time is not None:
@@ -60,6 +232,40 @@ def main():
     
     print("=" * 50)
     
+    if args.shards > 1:
+        # Shards only write the stitched CSV: no checkpoints, track cache or videos
+        unsupported = [
+            flag for flag, used in (
+                ("--resume", args.resume),
+                ("--track-cache", args.track_cache),
+                ("--preview", args.preview),
+                ("--preview-only", args.preview_only)
+            ) if used
+        ]
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} can't be combined with --shards")
+        
+        from sharded_runner import run_sharded
+        print(f"Sharded mode: {args.shards} shards, trajectories only")
+        run_sharded(
+            video_path,
+            model_path,
+            output_csv_path,
+            start_time=start_time,
+            end_time=end_time,
+            shard_count=args.shards,
+            compact=args.compact,
+            decoder=args.decoder,
+            decoder_scale=args.decoder_scale,
+            detection_cache=args.detection_cache,
+            roi_crop=args.roi_crop,
+            inference_size=args.imgsz,
+            inference_downscale=args.downscale,
+            detector_backend=args.backend,
+            motion_gate=args.motion_gate
+        )
+        return
+    
     # Create and run tracker
     tracker = VehicleTracker(
         video_path=video_path,
@@ -67,7 +273,23 @@ def main():
         output_video_path=output_video_path,
         output_csv_path=output_csv_path,
         start_time=start_time,
-        end_time=end_time
+        end_time=end_time,
+        trajectories_only=args.trajectories_only,
+        detection_cache=args.detection_cache,
+        roi_crop=args.roi_crop,
+        inference_size=args.imgsz,
+        inference_downscale=args.downscale,
+        resume=args.resume,
+        detector_backend=args.backend,
+        motion_gate=args.motion_gate,
+        live=args.live is not None,
+        compact_export=args.compact,
+        track_cache=args.track_cache,
+        decoder=args.decoder,
+        decoder_scale=args.decoder_scale,
+        encoder=args.encoder,
+        preview=args.preview,
+        preview_only=args.preview_only
     )
     
     tracker.run()
@@ -0,0 +1,76 @@
+"""
+Frame preparation before inference and the matching box mapping back.
+
+The model can run on the ROI crop of a frame and on a downscaled copy of it.
+Boxes it returns are mapped back to full-frame pixel coordinates, so the ROI
+test, perspective transform and annotation never see the difference.
+"""
+
+import cv2
+import numpy as np
+
+class ModelInputTransform:
+    """Crop and downscale applied to frames before the model, and its inverse for boxes."""
+
+    def __init__(self, frame_width, frame_height, crop_rect=None, downscale=None):
+        """
+        Args:
+            frame_width: Width of the decoded frames
+            frame_height: Height of the decoded frames
+            crop_rect: (x1, y1, x2, y2) region the model runs on, None for the full frame
+            downscale: Factor in (0, 1] applied to the (cropped) frame, None to keep its size
+        """
+        if downscale is not None and not 0 < downscale <= 1:
+            raise ValueError(f"Inference downscale must be in (0, 1], got {downscale}")
+
+        self.crop_rect = tuple(int(v) for v in crop_rect) if crop_rect is not None else None
+        self.downscale = downscale if downscale not in (None, 1) else None
+
+        x1, y1, x2, y2 = self.crop_rect or (0, 0, frame_width, frame_height)
+        width, height = x2 - x1, y2 - y1
+        if self.downscale is not None:
+            self.input_width = max(1, int(round(width * self.downscale)))
+            self.input_height = max(1, int(round(height * self.downscale)))
+        else:
+            self.input_width, self.input_height = width, height
+
+        # Model input pixels -> full-frame pixels, per axis as in the resize
+        self.box_scale = np.array([
+            width / self.input_width,
+            height / self.input_height
+        ] * 2)
+        self.box_offset = np.array([x1, y1, x1, y1])
+
+    @property
+    def is_identity(self):
+        """True when frames go to the model unchanged."""
+        return self.crop_rect is None and self.downscale is None
+
+    def apply(self, frame):
+        """Get the model input for a frame (a view when only cropping)."""
+        if self.crop_rect is not None:
+            x1, y1, x2, y2 = self.crop_rect
+            frame = frame[y1:y2, x1:x2]
+
+        if self.downscale is not None:
+            frame = cv2.resize(
+                frame,
+                (self.input_width, self.input_height),
+                interpolation=cv2.INTER_AREA
+            )
+        return frame
+
+    def boxes_to_frame(self, xyxy):
+        """Map (N, 4) boxes from model input to full-frame coordinates."""
+        if self.is_identity or len(xyxy) == 0:
+            return xyxy
+
+        xyxy = np.asarray(xyxy)
+        return (xyxy * self.box_scale + self.box_offset).astype(xyxy.dtype)
+
+    def cache_settings(self):
+        """Settings that change the detections, for the detection cache key."""
+        return {
+            'crop_rect': list(self.crop_rect) if self.crop_rect is not None else None,
+            'downscale': self.downscale
+        }
@@ -0,0 +1,78 @@
+"""
+Motion gate: skip inference on frames where nothing moved around the ROI.
+
+Each frame is reduced to a small blurred grayscale image of the ROI's
+bounding rectangle (with the ROI crop margin, so vehicles about to enter
+count too) and compared with the last frame the model actually ran on. When
+too few pixels changed, the frame is gated: the model is skipped and the
+tracker is advanced with the boxes it predicts from its own motion model,
+so tracks and speeds keep moving rather than freezing at their last
+detected positions. A full detection is forced after
+max_gated_frames gated frames in a row, so slow changes never go unseen
+for long.
+"""
+
+import cv2
+from detection_config import *
+
+class MotionGate:
+    def __init__(self, crop_rect, threshold=MOTION_GATE_THRESHOLD, pixel_delta=MOTION_GATE_PIXEL_DELTA,
+                 scale=MOTION_GATE_SCALE, max_gated_frames=MOTION_GATE_MAX_GATED_FRAMES):
+        """
+        Args:
+            crop_rect: (x1, y1, x2, y2) region of the frame to compare
+            threshold: Fraction of pixels that must change for a frame to be detected
+            pixel_delta: Grey level change that counts a pixel as changed
+            scale: Downscale factor of the compared images
+            max_gated_frames: Gated frames in a row before a detection is forced
+        """
+        x1, y1, x2, y2 = crop_rect
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"Empty motion gate region {crop_rect}")
+
+        self.crop_rect = crop_rect
+        self.size = (max(1, round((x2 - x1) * scale)), max(1, round((y2 - y1) * scale)))
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.max_gated_frames = max(0, int(max_gated_frames))
+
+        # Last detected frame and the current run of gated frames
+        self.reference = None
+        self.gated_run = 0
+        self.gated_frames = 0
+        self.checked_frames = 0
+
+    def _signature(self, frame):
+        """Small blurred grayscale image of the compared region."""
+        x1, y1, x2, y2 = self.crop_rect
+        small = cv2.resize(frame[y1:y2, x1:x2], self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (3, 3), 0)
+
+    def changed_fraction(self, signature):
+        """Fraction of pixels that differ from the reference frame."""
+        changed = cv2.absdiff(signature, self.reference) > self.pixel_delta
+        return float(changed.mean())
+
+    def needs_detection(self, frame):
+        """
+        Decide whether the model has to run on a frame.
+
+        Args:
+            frame: Video frame, in processing order
+
+        Returns:
+            bool: True to run the model, False to use the tracker's predicted boxes
+        """
+        self.checked_frames += 1
+        signature = self._signature(frame)
+
+        if (self.reference is not None and self.gated_run < self.max_gated_frames
+                and self.changed_fraction(signature) < self.threshold):
+            self.gated_run += 1
+            self.gated_frames += 1
+            return False
+
+        self.reference = signature
+        self.gated_run = 0
+        return True
@@ -0,0 +1,247 @@
+"""
+Time-sharded parallel processing of one long video with track stitching.
+
+The frame range is split into consecutive shards that are processed in
+parallel worker processes, each with its own VehicleTracker. Every shard
+except the first starts a little early so its tracker is warmed up by the
+time it reaches its own frames, and that overlap window is used to match
+its tracker IDs to the previous shard's tracks.
+"""
+
+import math
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from detection_config import *
+from coordinate_transformer import CoordinateTransformer
+from csv_exporter import CSVExporter
+from video_processor import VideoProcessor
+from inference_pool import _configure_worker
+from trajectory_store import TrajectoryStore
+
+def plan_shards(start_frame, end_frame, shard_count, overlap_frames, stride=1):
+    """
+    Split a frame range into shards aligned to the frame stride.
+
+    Args:
+        start_frame: First frame to process
+        end_frame: Frame after the last frame to process
+        shard_count: Number of shards
+        overlap_frames: Warm-up frames processed before each shard's own range
+        stride: Frame stride, so shards sample the same frames as a sequential run
+
+    Returns:
+        list: (warmup_start, own_start, own_end) frame numbers for each shard
+    """
+    total_frames = end_frame - start_frame
+    shard_length = math.ceil(math.ceil(total_frames / shard_count) / stride) * stride
+    overlap_frames = math.ceil(overlap_frames / stride) * stride
+
+    shards = []
+    for own_start in range(start_frame, end_frame, shard_length):
+        own_end = min(own_start + shard_length, end_frame)
+        warmup_start = max(start_frame, own_start - overlap_frames)
+        shards.append((warmup_start, own_start, own_end))
+    return shards
+
+def _process_shard(video_path, model_path, frame_range, frame_stride, tracker_options):
+    """Track one shard in a worker process and return its raw trajectories."""
+    from vehicle_tracker import VehicleTracker
+
+    tracker = VehicleTracker(
+        video_path,
+        model_path,
+        output_video_path=None,
+        output_csv_path=None,
+        trajectories_only=True,
+        frame_stride=frame_stride,
+        frame_range=frame_range,
+        inference_workers=0,
+        streaming_export=False,
+        **tracker_options
+    )
+    tracker.initialize()
+    tracker.track_video()
+
+    return tracker.vehicle_data
+
+def _window_positions(trajectory, window_start, window_end):
+    """Get a trajectory's positions inside a frame window, keyed by frame number."""
+    in_window = (trajectory.frames >= window_start) & (trajectory.frames < window_end)
+    return dict(zip(trajectory.frames[in_window].tolist(), trajectory.positions[in_window]))
+
+def match_overlap(previous_tracks, current_tracks, window_start, window_end,
+                  max_distance=SHARD_STITCH_MAX_DISTANCE, min_frames=SHARD_STITCH_MIN_FRAMES):
+    """
+    Match tracks of two neighbouring shards over their overlap window.
+
+    Tracks are paired greedily by the mean bird's eye distance between their
+    positions on the frames both shards saw. A track needs min_frames common
+    frames, unless it has fewer samples in the window (a vehicle entering the
+    ROI just before the boundary): then all of them must be common, and each
+    within max_distance of the previous shard's track.
+
+    Returns:
+        dict: current shard tracker ID -> previous shard tracker ID
+    """
+    previous_windows = {
+        tracker_id: _window_positions(track, window_start, window_end)
+        for tracker_id, track in previous_tracks.items()
+    }
+
+    candidates = []
+    for current_id, current_track in current_tracks.items():
+        current_window = _window_positions(current_track, window_start, window_end)
+        if not current_window:
+            continue
+        required_frames = min(min_frames, len(current_window))
+
+        for previous_id, previous_window in previous_windows.items():
+            common_frames = current_window.keys() & previous_window.keys()
+            if len(common_frames) < required_frames:
+                continue
+
+            distances = [
+                np.linalg.norm(current_window[frame] - previous_window[frame])
+                for frame in common_frames
+            ]
+            if len(common_frames) < min_frames and max(distances) > max_distance:
+                continue
+
+            distance = np.mean(distances)
+            if distance <= max_distance:
+                candidates.append((distance, current_id, previous_id))
+
+    matches = {}
+    matched_previous = set()
+    for distance, current_id, previous_id in sorted(candidates):
+        if current_id in matches or previous_id in matched_previous:
+            continue
+        matches[current_id] = previous_id
+        matched_previous.add(previous_id)
+    return matches
+
+def stitch_shards(shards, shard_tracks):
+    """
+    Merge per-shard trajectories into globally numbered vehicle data.
+
+    Each shard contributes only samples from its own frame range, and tracks
+    matched across a boundary continue under the same global vehicle ID.
+
+    Args:
+        shards: (warmup_start, own_start, own_end) for each shard
+        shard_tracks: Trajectories returned by each shard, in shard order
+
+    Returns:
+        TrajectoryStore: vehicle_data keyed by global vehicle ID, in order of first appearance
+    """
+    vehicle_data = TrajectoryStore()
+    next_vehicle_id = 1
+    previous_tracks = {}
+    previous_ids = {}
+
+    for (warmup_start, own_start, own_end), tracks in zip(shards, shard_tracks):
+        matches = match_overlap(previous_tracks, tracks, warmup_start, own_start)
+
+        own_samples = {}
+        for tracker_id, trajectory in tracks.items():
+            in_range = (trajectory.frames >= own_start) & (trajectory.frames < own_end)
+            if in_range.any():
+                own_samples[tracker_id] = in_range
+
+        current_ids = {}
+        for tracker_id in sorted(own_samples, key=lambda t: tracks[t].frames[own_samples[t]][0]):
+            previous_id = matches.get(tracker_id)
+            if previous_id in previous_ids:
+                vehicle_id = previous_ids[previous_id]
+            else:
+                vehicle_id = next_vehicle_id
+                next_vehicle_id += 1
+            current_ids[tracker_id] = vehicle_id
+
+            trajectory = tracks[tracker_id]
+            in_range = own_samples[tracker_id]
+            vehicle_data.track(vehicle_id).extend(
+                trajectory.frames[in_range],
+                trajectory.positions[in_range],
+                trajectory.speeds[in_range]
+            )
+
+        previous_tracks = {tracker_id: tracks[tracker_id] for tracker_id in current_ids}
+        previous_ids = current_ids
+
+    return vehicle_data
+
+def run_sharded(video_path, model_path, output_csv_path, start_time=None, end_time=None,
+                shard_count=SHARD_COUNT, overlap_seconds=SHARD_OVERLAP_SECONDS,
+                frame_stride=FRAME_STRIDE, workers=None, compact=COMPACT_EXPORT,
+                decoder=VIDEO_DECODER, decoder_scale=DECODER_SCALE, **tracker_options):
+    """
+    Process a video range as parallel shards and write one stitched CSV.
+
+    Args:
+        video_path: Path to input video
+        model_path: Path to YOLO model
+        output_csv_path: Path of the merged CSV
+        start_time: Start time in seconds (None for the beginning)
+        end_time: End time in seconds (None for the end)
+        shard_count: Number of time shards
+        overlap_seconds: Warm-up overlap before each shard, used for stitching
+        frame_stride: Frame stride used by every shard
+        workers: Parallel worker processes (defaults to shard_count)
+        compact: Compact the stitched trajectories before writing them
+        decoder: Video decoder of every shard (ffmpeg seeks to each shard's start on the input)
+        decoder_scale: Factor the ffmpeg decoder scales frames by
+        **tracker_options: Further VehicleTracker options of every shard (detector backend,
+            ROI crop, inference size and downscale, motion gate, detection cache)
+    """
+    if not VideoProcessor.validate_input_files(video_path, model_path):
+        raise ValueError("Input file validation failed")
+
+    # Resolve the frame range the same way a sequential run would
+    video = VideoProcessor(video_path, None, start_time=start_time, end_time=end_time,
+                           stride=frame_stride, decoder=decoder, decoder_scale=decoder_scale)
+    video.initialize()
+    video.cleanup()
+
+    shards = plan_shards(
+        video.start_frame,
+        video.end_frame,
+        shard_count,
+        int(overlap_seconds * video.fps),
+        stride=video.stride
+    )
+    shard_options = dict(tracker_options, decoder=decoder, decoder_scale=decoder_scale)
+    workers = min(workers or len(shards), len(shards))
+    torch_threads = max(1, (mp.cpu_count() or 1) // workers)
+
+    print(f"Processing {len(shards)} shards on {workers} worker processes "
+          f"({torch_threads} torch threads each)")
+    for index, (warmup_start, own_start, own_end) in enumerate(shards):
+        print(f"  Shard {index}: frames {own_start} to {own_end} (warm-up from {warmup_start})")
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_configure_worker,
+        initargs=(torch_threads, WORKER_OPENCV_THREADS, None)
+    ) as executor:
+        futures = [
+            executor.submit(_process_shard, video_path, model_path,
+                            (warmup_start, own_end), video.stride, shard_options)
+            for warmup_start, own_start, own_end in shards
+        ]
+        shard_tracks = [future.result() for future in futures]
+
+    print("Stitching tracks across shard boundaries...")
+    vehicle_data = stitch_shards(shards, shard_tracks)
+
+    csv_exporter = CSVExporter(output_csv_path, interpolation_gap=video.stride, compact=compact)
+    csv_exporter.set_coordinate_transformer(
+        CoordinateTransformer(video.frame_width, video.frame_height)
+    )
+    if csv_exporter.validate_data(vehicle_data):
+        csv_exporter.export_vehicle_data(vehicle_data)
+    else:
+        print("No valid tracking data to export")
@@ -5,46 +5,225 @@ Speed calculation utilities for vehicle tracking.
 import numpy as np
 from detection_config import *
 
-class SpeedCalculator:
-    def __init__(self, fps):
+class SpeedEstimator:
+    """
+    Online alpha-beta filtered speeds of all tracks.
+    
+    Each track's bird's eye position and velocity live in preallocated
+    arrays indexed by a slot, which is taken when the track first appears
+    and handed back when it retires. update() advances every track seen in
+    a frame in one vectorized step: predict with the current velocity, then
+    correct position and velocity by alpha and beta times the residual.
+    
+    A track's second sample (or its first after a long gap) starts the
+    velocity from the two-point difference. Until the steady gains take
+    over, the n-th sample uses the gains of a least-squares constant
+    velocity fit, 2(2n - 1) / (n(n + 1)) and 6 / (n(n + 1)), so new tracks
+    settle quickly instead of trusting that first difference. alpha =
+    beta = 1 gives the raw two-point speeds.
+    """
+    
+    def __init__(self, fps, alpha=SPEED_FILTER_ALPHA, beta=SPEED_FILTER_BETA,
+                 reset_seconds=SPEED_FILTER_RESET_SECONDS, capacity=SPEED_ESTIMATOR_CAPACITY):
         self.fps = fps
+        
+        # Gap (in frames) after which a track's velocity is started again
+        self.reset_frames = reset_seconds * fps
+        
+        # Gains by sample number n (the first sample takes the position only,
+        # the second the two-point velocity), until the steady gains take over
+        n = np.arange(1, 64, dtype=np.float64)
+        self.alpha_table = np.r_[0.0, np.maximum(alpha, 2 * (2 * n - 1) / (n * (n + 1)))]
+        self.beta_table = np.r_[0.0, 0.0, np.maximum(beta, 6 / (n[1:] * (n[1:] + 1)))]
+        self.steady_sample = len(n)
+        
+        # Tracker ID to slot, and slots handed back by retired tracks
+        self.slots = {}
+        self.free_slots = []
+        self.used_slots = 0
+        
+        # One row per slot: x, y, x velocity, y velocity, last frame and sample
+        # number (0 for a free slot, capped once the gains are steady)
+        self.state = np.zeros((max(1, int(capacity)), 6))
     
-    def calculate_speeds(self, positions, frames):
+    def update(self, tracker_ids, positions, frames):
         """
-        Calculate display and simulation speeds from position data.
+        Add one sample to each of several tracks.
         
         Args:
-            positions: List of (x, y) positions
-            frames: List of frame numbers
+            tracker_ids: Tracker IDs, each at most once
+            positions: (N, 2) bird's eye positions
+            frames: Frame number of the samples (one for all, or one each)
             
         Returns:
-            tuple: (display_speed_px_per_sec, simulation_speed)
+            tuple: (display_speed_px_per_sec, simulation_speed) integer arrays
         """
-        if len(positions) < 2 or len(frames) < 2:
-            return 0, DEFAULT_SIMULATION_SPEED
-        
-        # Get last two positions and frames
-        pos1 = positions[-2]
-        pos2 = positions[-1]
-        frame1 = frames[-2]
-        frame2 = frames[-1]
-        
-        time_diff = (frame2 - frame1) / self.fps
-        if time_diff <= 0:
-            return 0, DEFAULT_SIMULATION_SPEED
-        
-        # Calculate speed in pixels per second for display
-        distance = np.linalg.norm(np.array(pos2) - np.array(pos1))
-        speed_display = int(distance / time_diff)
-        
-        # Map pixel speed to simulation speed range (0-600)
-        if speed_display == 0:
-            speed_simulation = 0  # Stopped
-        else:
-            # Scale pixel speed to simulation range, with some base speed
-            speed_simulation = min(
-                SIMULATION_SPEED_RANGE[1], 
-                max(100, int(speed_display * SPEED_SCALE_FACTOR + BASE_SIMULATION_SPEED))
-            )
+        if len(tracker_ids) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        
+        slots = self._slots_for(tracker_ids)
+        state = self.state[slots]
+        position = state[:, :2]
+        velocity = state[:, 2:4]
+        
+        # Sample number of this sample, back to the second after a long gap
+        elapsed = frames - state[:, 4]
+        sample = np.minimum(
+            state[:, 5] + 1,
+            np.where(elapsed > self.reset_frames, 2, self.steady_sample)
+        ).astype(np.intp)
+        alpha = self.alpha_table[sample][:, None]
+        beta = self.beta_table[sample][:, None]
+        dt = (np.maximum(elapsed, 1) / self.fps)[:, None]
         
+        # Predict with the current velocity and blend in the measurement; a gain
+        # of 1 takes the measured position or two-point velocity as it is
+        measured = np.asarray(positions, dtype=np.float64)
+        predicted = position + velocity * dt
+        new_velocity = (1 - beta) * velocity + beta * ((measured - position) / dt)
+        state[:, :2] = (1 - alpha) * predicted + alpha * measured
+        state[:, 2:4] = new_velocity
+        state[:, 4] = frames
+        state[:, 5] = sample
+        self.state[slots] = state
+        
+        velocity = state[:, 2:4]
+        speed_display = np.sqrt(np.einsum('ij,ij->i', velocity, velocity)).astype(int)
+        speed_simulation = to_simulation_speeds(speed_display)
+        speed_simulation[sample == 1] = DEFAULT_SIMULATION_SPEED
         return speed_display, speed_simulation
+    
+    def release(self, tracker_ids):
+        """Hand back the slots of tracks that ended."""
+        for tracker_id in tracker_ids:
+            slot = self.slots.pop(tracker_id, None)
+            if slot is not None:
+                self.state[slot] = 0
+                self.free_slots.append(slot)
+    
+    def _slots_for(self, tracker_ids):
+        """Get the slot of each tracker ID, taking free ones for new tracks."""
+        tracker_ids = np.asarray(tracker_ids).tolist()
+        slots = [self.slots.get(tracker_id) for tracker_id in tracker_ids]
+        if None in slots:
+            for index, tracker_id in enumerate(tracker_ids):
+                if slots[index] is None:
+                    slots[index] = self.slots[tracker_id] = self._take_slot()
+        return np.array(slots, dtype=np.intp)
+    
+    def _take_slot(self):
+        """Take a free slot, growing the state arrays when all are in use."""
+        if self.free_slots:
+            return self.free_slots.pop()
+        
+        if self.used_slots == len(self.state):
+            state = np.zeros((len(self.state) * 2, self.state.shape[1]))
+            state[:len(self.state)] = self.state
+            self.state = state
+        
+        self.used_slots += 1
+        return self.used_slots - 1
+
+def to_simulation_speeds(speed_display):
+    """
+    Map display speeds (px/s) to simulation speeds (0 for stopped vehicles, at least 100 otherwise).
+    
+    Args:
+        speed_display: Integer array of display speeds
+        
+    Returns:
+        np.ndarray: Simulation speeds (0 for stopped vehicles)
+    """
+    speed_display = np.asarray(speed_display)
+    speed_simulation = np.minimum(
+        SIMULATION_SPEED_RANGE[1],
+        np.maximum(100, speed_display * SPEED_SCALE_FACTOR + BASE_SIMULATION_SPEED)
+    )
+    return np.where(speed_display == 0, 0, speed_simulation)
+
+def trajectory_speeds(track_ids, frames, positions, fps, window):
+    """
+    Calculate centered-window speeds over whole trajectories in one pass.
+    
+    Each sample's speed is the distance covered between the samples window
+    steps before and after it (clipped to its track), divided by the time
+    between them. Used when re-deriving with a smoothing window; the speeds
+    recorded while tracking come from the alpha-beta filter (filtered_speeds).
+    
+    Args:
+        track_ids: Track of each sample, samples of a track contiguous
+        frames: Frame number of each sample, increasing within each track
+        positions: (N, 2) float32 positions
+        fps: Frame rate of the frame numbers
+        window: Samples on each side of a sample that its speed spans (at least 1)
+        
+    Returns:
+        tuple: (display_speed_px_per_sec, simulation_speed) integer arrays
+    """
+    if window < 1:
+        raise ValueError(f"Speed window must span at least one sample, got {window}")
+    
+    count = len(frames)
+    if count == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    
+    # First and last sample index of each sample's track
+    starts = np.flatnonzero(np.r_[True, track_ids[1:] != track_ids[:-1]])
+    lengths = np.diff(np.r_[starts, count])
+    track_start = np.repeat(starts, lengths)
+    track_end = np.repeat(starts + lengths - 1, lengths)
+    
+    index = np.arange(count)
+    first = np.maximum(index - window, track_start)
+    last = np.minimum(index + window, track_end)
+    
+    # Distance and time between the window ends (float32 like the stored positions)
+    delta = positions[last] - positions[first]
+    distance = np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+    time_diff = ((frames[last] - frames[first]) / fps).astype(np.float32)
+    
+    valid = time_diff > 0
+    speed_display = np.zeros(count, dtype=int)
+    speed_display[valid] = (distance[valid] / time_diff[valid]).astype(int)
+    
+    # Samples without a time span get the same default as SpeedEstimator
+    speed_simulation = to_simulation_speeds(speed_display)
+    speed_simulation[~valid] = DEFAULT_SIMULATION_SPEED
+    return speed_display, speed_simulation
+
+def filtered_speeds(track_ids, frames, positions, fps, **estimator_options):
+    """
+    Run SpeedEstimator over whole trajectories, giving the speeds recorded while tracking.
+    
+    Tracks are independent, so the n-th samples of all tracks go through
+    one update together.
+    
+    Args:
+        track_ids: Track of each sample, samples of a track contiguous
+        frames: Frame number of each sample, increasing within each track
+        positions: (N, 2) positions
+        fps: Frame rate of the frame numbers
+        **estimator_options: Filter settings passed on to SpeedEstimator
+        
+    Returns:
+        tuple: (display_speed_px_per_sec, simulation_speed) integer arrays
+    """
+    count = len(frames)
+    speed_display = np.zeros(count, dtype=int)
+    speed_simulation = np.zeros(count, dtype=int)
+    if count == 0:
+        return speed_display, speed_simulation
+    
+    # Rank of each sample within its track
+    starts = np.flatnonzero(np.r_[True, track_ids[1:] != track_ids[:-1]])
+    lengths = np.diff(np.r_[starts, count])
+    rank = np.arange(count) - np.repeat(starts, lengths)
+    
+    estimator = SpeedEstimator(fps, capacity=len(starts), **estimator_options)
+    order = np.argsort(rank, kind='stable')
+    step_ends = np.cumsum(np.bincount(rank))
+    for step in np.split(order, step_ends[:-1]):
+        speed_display[step], speed_simulation[step] = estimator.update(
+            track_ids[step], positions[step], frames[step]
+        )
+    return speed_display, speed_simulation
@@ -0,0 +1,56 @@
+"""
+Regression tests for stitching shard trajectories (run with pytest from Detection/).
+"""
+
+import numpy as np
+import pytest
+
+from sharded_runner import plan_shards, stitch_shards
+from trajectory_store import TrajectoryStore
+
+def _shard_tracks(shards, vehicles):
+    """
+    Build what each shard's tracker would return for vehicles moving in a straight line.
+
+    Args:
+        shards: (warmup_start, own_start, own_end) for each shard
+        vehicles: (frames, lane) of each vehicle, frames on the stride grid
+
+    Returns:
+        list: TrajectoryStore per shard, tracker IDs numbered per shard
+    """
+    shard_tracks = []
+    for warmup_start, own_start, own_end in shards:
+        tracks = TrajectoryStore()
+        for tracker_id, (frames, lane) in enumerate(vehicles, start=1):
+            frames = np.asarray(frames)
+            frames = frames[(frames >= warmup_start) & (frames < own_end)]
+            if len(frames):
+                positions = np.stack([np.full(len(frames), lane), frames * 2.0], axis=1)
+                tracks.track(tracker_id).extend(frames, positions.astype(np.float32), np.zeros(len(frames)))
+        shard_tracks.append(tracks)
+    return shard_tracks
+
+@pytest.mark.parametrize("stride, shard_count, samples_before", [(1, 3, 1), (1, 3, 2), (3, 5, 1), (3, 5, 2)])
+def test_vehicle_entering_just_before_a_boundary_keeps_one_id(stride, shard_count, samples_before):
+    shards = plan_shards(0, 600, shard_count, 30, stride=stride)
+    boundary = shards[1][1]
+
+    entering = np.arange(boundary - samples_before * stride, boundary + 25 * stride, stride)
+    passing = np.arange(boundary - 40 * stride, boundary + 40 * stride, stride)
+    vehicle_data = stitch_shards(shards, _shard_tracks(shards, [(entering, 10.0), (passing, 200.0)]))
+
+    assert len(vehicle_data) == 2
+    assert sorted(tuple(trajectory.frames.tolist()) for _, trajectory in vehicle_data.items()) == sorted(
+        [tuple(entering.tolist()), tuple(passing.tolist())]
+    )
+
+def test_short_overlap_needs_every_sample_to_agree():
+    shards = plan_shards(0, 400, 2, 30)
+    boundary = shards[1][1]
+
+    previous, current = _shard_tracks(shards, [(np.arange(boundary - 2, boundary + 20), 10.0)])
+    current.track(1).positions[1, 0] += 50  # The second window sample is somewhere else
+    vehicle_data = stitch_shards(shards, [previous, current])
+
+    assert len(vehicle_data) == 2
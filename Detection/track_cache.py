@@ -0,0 +1,153 @@
+"""
+Cache of post-ByteTrack tracks, and re-deriving trajectories from it.
+
+The detection cache spares the model, but replaying it still runs ByteTrack
+and the whole per-frame pipeline. The ROI, the perspective transform and the
+speed estimate only change what happens to the tracked boxes, so a run can
+also save every frame's tracked boxes (tracker ID, box and class, before the
+ROI filter) next to its CSV. rederive_trajectories rebuilds the CSV from
+that file in one vectorized pass with a new calibration and speeds computed
+over whole trajectories, which takes seconds instead of a detection run.
+"""
+
+import os
+import json
+import time
+
+import numpy as np
+from detection_config import *
+from detection_utils import ensure_directory_exists
+from coordinate_transformer import CoordinateTransformer
+from speed_calculator import trajectory_speeds, filtered_speeds
+from csv_exporter import CSVExporter
+
+def track_cache_path_for(output_csv_path):
+    """Get the track cache file that belongs to an output CSV."""
+    return os.path.splitext(output_csv_path)[0] + ".tracks.npz"
+
+class TrackRecorder:
+    """Collects the tracked boxes of every frame and saves them as one .npz file."""
+
+    def __init__(self):
+        self.frame_numbers = []
+        self.counts = []
+        self.xyxy = []
+        self.tracker_id = []
+        self.class_id = []
+
+    def add(self, frame_number, xyxy, tracker_id, class_id):
+        """Record the tracked boxes of one frame (none for a frame without vehicles)."""
+        self.frame_numbers.append(frame_number)
+        self.counts.append(len(xyxy))
+        self.xyxy.append(np.asarray(xyxy, dtype=np.float32).reshape(-1, 4))
+        self.tracker_id.append(np.asarray(tracker_id, dtype=np.int32))
+        self.class_id.append(np.asarray(class_id, dtype=np.int16))
+
+    def save(self, path, **metadata):
+        """
+        Write the recorded tracks to disk.
+
+        Args:
+            path: Output .npz path
+            **metadata: Frame size, fps, stride and anything else needed to
+                        re-derive trajectories (stored as JSON)
+        """
+        ensure_directory_exists(path)
+        offsets = np.zeros(len(self.counts) + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=offsets[1:])
+
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                frame_numbers=np.asarray(self.frame_numbers, dtype=np.int32),
+                offsets=offsets,
+                xyxy=np.concatenate(self.xyxy) if self.xyxy else np.empty((0, 4), dtype=np.float32),
+                tracker_id=np.concatenate(self.tracker_id) if self.tracker_id else np.empty(0, dtype=np.int32),
+                class_id=np.concatenate(self.class_id) if self.class_id else np.empty(0, dtype=np.int16),
+                metadata=json.dumps(metadata)
+            )
+        os.replace(temp_path, path)
+
+def load_track_cache(path):
+    """
+    Load a track cache as flat per-box arrays.
+
+    Returns:
+        dict: 'frame', 'xyxy', 'tracker_id' and 'class_id' arrays with one
+              entry per tracked box in frame order, plus the saved metadata
+    """
+    with np.load(path) as data:
+        counts = np.diff(data['offsets'])
+        cache = {
+            'frame': np.repeat(data['frame_numbers'], counts),
+            'xyxy': data['xyxy'],
+            'tracker_id': data['tracker_id'],
+            'class_id': data['class_id'].astype(int),
+            'frames_recorded': len(data['frame_numbers'])
+        }
+        cache.update(json.loads(str(data['metadata'])))
+    return cache
+
+def rederive_trajectories(cache_path, output_csv_path, roi_relative_points=None, dst_points=None,
+                          smoothing_window=SPEED_SMOOTHING_WINDOW, compact=COMPACT_EXPORT):
+    """
+    Rebuild the trajectory CSV from a track cache.
+
+    Args:
+        cache_path: Track cache written by a run with track caching enabled
+        output_csv_path: Path of the CSV to write (the .npz copy goes next to it)
+        roi_relative_points: ROI corners as fractions of the frame (None for ROI_RELATIVE_POINTS)
+        dst_points: Bird's eye points of the ROI corners (None for PERSPECTIVE_DST_POINTS)
+        smoothing_window: Samples on each side that speeds span (0 for the speed filter used while tracking)
+        compact: Compact the trajectories before writing them
+
+    Returns:
+        dict: Exported vehicles and rows, and the time taken
+    """
+    if not os.path.exists(cache_path):
+        raise ValueError(f"Track cache not found: {cache_path}")
+
+    start = time.perf_counter()
+    cache = load_track_cache(cache_path)
+    print(f"Loaded {len(cache['frame'])} tracked boxes over {cache['frames_recorded']} frames from {cache_path}")
+
+    transformer = CoordinateTransformer(
+        cache['frame_width'], cache['frame_height'],
+        roi_relative_points=roi_relative_points, dst_points=dst_points
+    )
+
+    # Box centers, ROI membership and bird's eye positions, as while tracking
+    boxes = cache['xyxy'].astype(int)
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    in_roi = transformer.points_in_roi(centers)
+    frames = cache['frame'][in_roi]
+    tracker_ids = cache['tracker_id'][in_roi]
+    positions = transformer.transform_points_to_birds_eye(centers[in_roi])
+
+    # Group the samples by track, tracks in order of their first sample in the ROI
+    _, first_index, inverse = np.unique(tracker_ids, return_index=True, return_inverse=True)
+    order = np.argsort(first_index[inverse], kind='stable')
+    frames, tracker_ids, positions = frames[order], tracker_ids[order], positions[order]
+
+    if smoothing_window > 0:
+        _, speeds = trajectory_speeds(tracker_ids, frames, positions, cache['fps'], window=smoothing_window)
+    else:
+        _, speeds = filtered_speeds(tracker_ids, frames, positions, cache['fps'])
+
+    exporter = CSVExporter(output_csv_path, interpolation_gap=cache['stride'], compact=compact)
+    exporter.set_coordinate_transformer(transformer)
+    exporter.open()
+    try:
+        exporter.write_tracks(tracker_ids, frames, positions, speeds.astype(np.int16))
+    finally:
+        exporter.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Re-derived {exporter.exported_vehicles} vehicle trajectories ({exporter.exported_rows} rows) "
+          f"in {elapsed:.2f}s")
+    return {
+        'vehicles_exported': exporter.exported_vehicles,
+        'rows_exported': exporter.exported_rows,
+        'processing_time': round(elapsed, 3)
+    }
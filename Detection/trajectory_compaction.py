@@ -0,0 +1,158 @@
+"""
+Compaction of exported trajectory rows.
+
+Rows are (frame_id, vehicle_id, world_x, world_y, speed) integer arrays with
+each vehicle's rows contiguous and in frame order, as CSVExporter produces
+them. Compaction removes rows that linear interpolation over frames can
+restore within a tolerance:
+
+    1. Tracks shorter than a minimum number of rows or frames are dropped
+       (mostly short, noisy ByteTrack fragments).
+    2. Stationary runs (identical position and speed on consecutive frames)
+       keep only their first and last row.
+    3. Each run of consecutive frames is simplified Ramer-Douglas-Peucker
+       style, measuring the error at every row against the rounded position
+       interpolated at that frame. Speed is carried by the kept rows as
+       keyframes; with a speed tolerance set, rows are also kept wherever
+       interpolated speed would miss it.
+
+Frame gaps inside a track (a vehicle leaving the ROI, lost detections) are
+real and must not be interpolated over, so the rows on both sides of every
+gap are kept and the gaps are returned for the exporter to record.
+CSVTrafficManager in the simulation rebuilds one row per frame by linear
+interpolation between the kept rows, except across the recorded gaps.
+"""
+
+import numpy as np
+from detection_config import *
+
+def _track_bounds(vehicle_ids):
+    """Start index and row count of each contiguous track."""
+    starts = np.flatnonzero(np.r_[True, vehicle_ids[1:] != vehicle_ids[:-1]])
+    counts = np.diff(np.r_[starts, len(vehicle_ids)])
+    return starts, counts
+
+def _gap_keys(vehicle_ids, frames):
+    """Combine vehicle IDs and frame numbers into one int64 key per row."""
+    return (np.asarray(vehicle_ids, dtype=np.int64) << 32) | np.asarray(frames, dtype=np.int64)
+
+def find_track_gaps(rows):
+    """
+    Find the frame gaps inside tracks.
+
+    Returns:
+        np.ndarray: (N, 3) rows of vehicle_id, last frame before and first frame after each gap
+    """
+    inside = np.flatnonzero((rows[1:, 1] == rows[:-1, 1]) & (np.diff(rows[:, 0]) > 1))
+    return np.column_stack([rows[inside, 1], rows[inside, 0], rows[inside + 1, 0]])
+
+def filter_short_tracks(rows, min_rows=COMPACT_MIN_TRACK_ROWS, min_frames=COMPACT_MIN_TRACK_FRAMES):
+    """
+    Drop tracks with fewer than min_rows rows or spanning fewer than min_frames frames.
+
+    Returns:
+        tuple: (remaining rows, number of dropped tracks)
+    """
+    if len(rows) == 0:
+        return rows, 0
+
+    starts, counts = _track_bounds(rows[:, 1])
+    durations = rows[starts + counts - 1, 0] - rows[starts, 0] + 1
+    short = (counts < min_rows) | (durations < min_frames)
+    return rows[~np.repeat(short, counts)], int(short.sum())
+
+def collapse_stationary_runs(rows):
+    """Keep only the first and last row of runs with identical position and speed on consecutive frames."""
+    if len(rows) < 3:
+        return rows
+
+    same = (rows[1:, 1:] == rows[:-1, 1:]).all(axis=1) & (np.diff(rows[:, 0]) == 1)
+    interior = np.r_[False, same[:-1] & same[1:], False]
+    return rows[~interior]
+
+def _simplify_track(frames, values, tolerances):
+    """
+    Indices of the rows kept by time-synchronized Douglas-Peucker on one track.
+
+    Args:
+        frames: Frame numbers of the track, increasing
+        values: (N, 3) float array of world_x, world_y and speed
+        tolerances: (position, speed) largest allowed interpolation errors,
+                    speed None to only carry speed on the kept rows
+    """
+    count = len(frames)
+    keep = np.zeros(count, dtype=bool)
+    keep[[0, -1]] = True
+
+    position_tolerance, speed_tolerance = tolerances
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        # Values interpolated at the frames between the two kept rows
+        t = (frames[first + 1:last] - frames[first]) / (frames[last] - frames[first])
+        interpolated = values[first] + t[:, None] * (values[last] - values[first])
+        error = values[first + 1:last] - np.round(interpolated)
+
+        # Worst row relative to its tolerance
+        score = np.hypot(error[:, 0], error[:, 1]) / max(position_tolerance, 1e-9)
+        if speed_tolerance is not None:
+            score = np.maximum(score, np.abs(error[:, 2]) / max(speed_tolerance, 1e-9))
+        worst = int(np.argmax(score))
+        if score[worst] > 1:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+def simplify_tracks(rows, position_tolerance=COMPACT_POSITION_TOLERANCE,
+                    speed_tolerance=COMPACT_SPEED_TOLERANCE, gaps=None):
+    """
+    Simplify every track so interpolation stays within the given tolerances.
+
+    Args:
+        rows: Trajectory rows, tracks contiguous and in frame order
+        position_tolerance: Largest world_x/world_y distance from the original
+        speed_tolerance: Largest speed difference from the original (None for keyframes only)
+        gaps: Track gaps from find_track_gaps, simplified as separate runs
+              (None to find them in rows)
+
+    Returns:
+        np.ndarray: The kept rows
+    """
+    if len(rows) < 3:
+        return rows
+
+    if gaps is None:
+        gaps = find_track_gaps(rows)
+    run_starts = np.r_[True, rows[1:, 1] != rows[:-1, 1]]
+    run_starts |= np.isin(_gap_keys(rows[:, 1], rows[:, 0]), _gap_keys(gaps[:, 0], gaps[:, 2]))
+    starts = np.flatnonzero(run_starts)
+    counts = np.diff(np.r_[starts, len(rows)])
+
+    values = rows[:, 2:5].astype(np.float64)
+    kept = []
+    for start, count in zip(starts, counts):
+        if count < 3:
+            kept.append(np.arange(start, start + count))
+            continue
+        end = start + count
+        kept.append(start + _simplify_track(rows[start:end, 0], values[start:end],
+                                            (position_tolerance, speed_tolerance)))
+    return rows[np.concatenate(kept)]
+
+def compact_rows(rows, position_tolerance=COMPACT_POSITION_TOLERANCE, speed_tolerance=COMPACT_SPEED_TOLERANCE,
+                 min_rows=COMPACT_MIN_TRACK_ROWS, min_frames=COMPACT_MIN_TRACK_FRAMES):
+    """
+    Run all compaction steps.
+
+    Returns:
+        tuple: (compacted rows, number of dropped tracks, gaps inside the remaining tracks)
+    """
+    rows, dropped = filter_short_tracks(rows, min_rows, min_frames)
+    gaps = find_track_gaps(rows)
+    rows = collapse_stationary_runs(rows)
+    return simplify_tracks(rows, position_tolerance, speed_tolerance, gaps), dropped, gaps
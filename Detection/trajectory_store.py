@@ -0,0 +1,125 @@
+"""
+Compact columnar storage for vehicle trajectories.
+
+Each track keeps its samples in typed NumPy arrays (frame int32, bird's eye
+x/y float32, simulation speed int16) that grow geometrically, so appending is
+amortized O(1) and a sample costs 14 bytes instead of several Python objects.
+"""
+
+import numpy as np
+from detection_config import *
+
+class Trajectory:
+    """Growable typed arrays holding the samples of one track."""
+
+    __slots__ = ('_frames', '_positions', '_speeds', 'length')
+
+    def __init__(self, capacity=TRAJECTORY_INITIAL_CAPACITY):
+        capacity = max(1, int(capacity))
+        self._frames = np.empty(capacity, dtype=np.int32)
+        self._positions = np.empty((capacity, 2), dtype=np.float32)
+        self._speeds = np.zeros(capacity, dtype=np.int16)
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def frames(self):
+        """Frame numbers of the samples (view)."""
+        return self._frames[:self.length]
+
+    @property
+    def positions(self):
+        """Bird's eye (x, y) positions as an (N, 2) array (view)."""
+        return self._positions[:self.length]
+
+    @property
+    def speeds(self):
+        """Simulation speeds (view)."""
+        return self._speeds[:self.length]
+
+    @property
+    def initial_position(self):
+        """First recorded position, or None for an empty track."""
+        return self._positions[0] if self.length > 0 else None
+
+    def append(self, frame, position, speed=0):
+        """Append one sample, growing the arrays when they are full."""
+        if self.length == len(self._frames):
+            self._reserve(self.length + 1)
+
+        self._frames[self.length] = frame
+        self._positions[self.length] = position
+        self._speeds[self.length] = speed
+        self.length += 1
+
+    def extend(self, frames, positions, speeds):
+        """Append many samples at once."""
+        count = len(frames)
+        self._reserve(self.length + count)
+
+        end = self.length + count
+        self._frames[self.length:end] = frames
+        self._positions[self.length:end] = positions
+        self._speeds[self.length:end] = speeds
+        self.length = end
+
+    def _reserve(self, capacity):
+        """Grow the arrays geometrically to hold at least capacity samples."""
+        if capacity <= len(self._frames):
+            return
+
+        new_capacity = max(capacity, int(len(self._frames) * TRAJECTORY_GROWTH_FACTOR) + 1)
+        for name in ('_frames', '_positions', '_speeds'):
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.length] = old[:self.length]
+            setattr(self, name, new)
+
+    def __getstate__(self):
+        # Only pickle the used part of the arrays
+        return (self.frames.copy(), self.positions.copy(), self.speeds.copy())
+
+    def __setstate__(self, state):
+        frames, positions, speeds = state
+        self.__init__(capacity=len(frames))
+        self.extend(frames, positions, speeds)
+
+class TrajectoryStore:
+    """Trajectories keyed by tracker ID, in order of first appearance."""
+
+    def __init__(self, initial_capacity=TRAJECTORY_INITIAL_CAPACITY):
+        self.initial_capacity = initial_capacity
+        self.tracks = {}
+
+    def track(self, tracker_id):
+        """Get the trajectory for a tracker ID, creating it if needed."""
+        trajectory = self.tracks.get(tracker_id)
+        if trajectory is None:
+            trajectory = Trajectory(self.initial_capacity)
+            self.tracks[tracker_id] = trajectory
+        return trajectory
+
+    def __getitem__(self, tracker_id):
+        return self.tracks[tracker_id]
+
+    def __contains__(self, tracker_id):
+        return tracker_id in self.tracks
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __iter__(self):
+        return iter(self.tracks)
+
+    def items(self):
+        return self.tracks.items()
+
+    def pop(self, tracker_id):
+        """Remove and return a trajectory."""
+        return self.tracks.pop(tracker_id)
+
+    def sample_count(self):
+        """Total number of samples over all tracks."""
+        return sum(len(trajectory) for trajectory in self.tracks.values())
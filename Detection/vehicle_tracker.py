@@ -2,32 +2,87 @@
 Main vehicle tracker class that coordinates all detection modules.
 """
 
+import os
 import cv2
+import json
+import time
 import numpy as np
-from ultralytics import YOLO
 import supervision as sv
-from collections import defaultdict
 
 from detection_config import *
-from speed_calculator import SpeedCalculator
+from speed_calculator import SpeedEstimator
 from coordinate_transformer import CoordinateTransformer
 from csv_exporter import CSVExporter
 from video_processor import VideoProcessor
+from inference_pool import InferencePool
+from detector_backends import create_detector_backend
+from motion_gate import MotionGate
+from model_input import ModelInputTransform
+from checkpoint import checkpoint_path_for, save_checkpoint, load_checkpoint, remove_checkpoint
+from detection_utils import PipelineProfiler
+from trajectory_store import TrajectoryStore
+from detection_cache import (
+    DetectionRecorder, DetectionReplay, detection_cache_key, detection_cache_path
+)
+from track_cache import TrackRecorder, track_cache_path_for
+from ffmpeg_encoder import preview_path_for
 
 class VehicleTracker:
     def __init__(self, video_path, model_path, output_video_path, output_csv_path, 
-                 start_time=None, end_time=None):
+                 start_time=None, end_time=None, batch_size=INFERENCE_BATCH_SIZE,
+                 pipelined=PIPELINED_PROCESSING, inference_workers=INFERENCE_WORKERS,
+                 trajectories_only=TRAJECTORIES_ONLY, frame_stride=FRAME_STRIDE,
+                 frame_range=None, streaming_export=STREAMING_EXPORT,
+                 track_retire_frames=TRACK_RETIRE_FRAMES, detection_cache=DETECTION_CACHE,
+                 roi_crop=ROI_CROP_INFERENCE, inference_size=None,
+                 inference_downscale=INFERENCE_DOWNSCALE, model=None, detector=None, resume=False,
+                 checkpoint_interval=CHECKPOINT_INTERVAL, profile_report=PROFILE_REPORT,
+                 progress_stream=PROGRESS_STREAM, detector_backend=DETECTOR_BACKEND, backend=None,
+                 motion_gate=MOTION_GATE, live=LIVE_MODE, compact_export=COMPACT_EXPORT,
+                 track_cache=TRACK_CACHE, decoder=VIDEO_DECODER, decoder_scale=DECODER_SCALE,
+                 encoder=VIDEO_ENCODER, preview=PREVIEW_OUTPUT, preview_only=PREVIEW_ONLY):
         self.video_path = video_path
         self.model_path = model_path
         self.output_video_path = output_video_path
         self.output_csv_path = output_csv_path
         self.start_time = start_time
         self.end_time = end_time
+        self.batch_size = batch_size
+        self.pipelined = pipelined
+        self.inference_workers = inference_workers
+        self.trajectories_only = trajectories_only
+        self.frame_stride = frame_stride
+        self.frame_range = frame_range
+        self.streaming_export = streaming_export
+        self.track_retire_frames = track_retire_frames
+        self.detection_cache = detection_cache
+        self.roi_crop = roi_crop
+        self.inference_size = inference_size
+        self.inference_downscale = inference_downscale
+        self.resume = resume
+        self.checkpoint_interval = checkpoint_interval
+        self.profile_report = profile_report
+        self.progress_stream = progress_stream
+        self.detector_backend = detector_backend
+        self.use_motion_gate = motion_gate
+        self.live = live
+        self.compact_export = compact_export
+        self.track_cache = track_cache
+        self.decoder = decoder
+        self.decoder_scale = decoder_scale
+        self.encoder = encoder
+        self.preview = preview or preview_only
+        self.preview_only = preview_only
         
-        # Initialize components
-        self.model = None
+        # Initialize components (a loaded model or backend can be passed in and reused across runs)
+        self.model = model
+        self.backend = backend
+        
+        # Optional replacement for YOLO: a callable (frames, frame_numbers) -> list of
+        # raw sv.Detections in full-frame coordinates, with a class_names dict
+        self.detector = detector
         self.tracker = None
-        self.speed_calculator = None
+        self.speed_estimator = None
         self.coordinate_transformer = None
         self.csv_exporter = None
         self.video_processor = None
@@ -36,36 +91,101 @@ class VehicleTracker:
         self.box_annotator = None
         self.trace_annotator = None
         
+        # Per-stage timings of the run
+        self.profiler = None
+        
         # Vehicle tracking data
-        self.vehicle_data = defaultdict(lambda: {
-            'positions': [],
-            'speeds': [],
-            'frames': [],
-            'initial_position': None
-        })
+        self.vehicle_data = TrajectoryStore()
+        
+        # Track retirement: tracker update count at which each ID was last seen
+        self.tracker_updates = 0
+        self.last_seen = {}
+        self.retire_after = track_retire_frames
         
         # Model class names
         self.class_names = {}
+        
+        # Model input: crop, downscale and the model's image size (None for its default)
+        self.model_input = None
+        self.imgsz = None
+        self.detection_count = 0
+        
+        # Periodic checkpoints of the run (kept next to the output CSV, a live feed can't be resumed)
+        self.checkpoint_path = checkpoint_path_for(output_csv_path) if output_csv_path and not live else None
+        self.frames_since_checkpoint = 0
+        self.csv_resume_state = None
+        self.run_identity = None
+        
+        # Motion gate and the last tracked detections that gated frames carry forward
+        self.motion_gate = None
+        self.last_tracked = None
+        
+        # Raw detection cache (one of these is set when the cache is enabled)
+        self.detection_cache_path = None
+        self.detection_recorder = None
+        self.detection_replay = None
+        
+        # Tracked boxes of every frame, saved for re-deriving trajectories
+        self.track_recorder = None
     
     def initialize(self):
         """Initialize all components."""
         print("Initializing vehicle tracker...")
         
         # Validate input files
-        if not VideoProcessor.validate_input_files(self.video_path, self.model_path):
+        # A detector hook needs no model file
+        model_path = None if self.detector is not None else self.model_path
+        if not VideoProcessor.validate_input_files(None if self.live else self.video_path, model_path):
             raise ValueError("Input file validation failed")
         
-        # Initialize YOLO model
-        print("Loading YOLO model...")
-        self.model = YOLO(self.model_path)
-        self.class_names = self.model.model.names
+        if self.live:
+            if self.resume:
+                raise ValueError("A live source can't be resumed")
+            # Tracks are emitted as soon as they retire, and live frames can't be cached
+            self.streaming_export = True
+            self.detection_cache = False
+            self.track_cache = False
+        
+        # Load the checkpoint of an interrupted run
+        checkpoint = None
+        output_video_path = None if self.trajectories_only else self.output_video_path
+        if self.resume:
+            checkpoint = load_checkpoint(self.checkpoint_path)
+            if checkpoint is None:
+                print(f"No checkpoint found at {self.checkpoint_path}, starting from the beginning")
+            elif output_video_path:
+                # The video written before the interruption can't be appended to
+                base, extension = os.path.splitext(output_video_path)
+                output_video_path = f"{base}_from{checkpoint['next_frame']}{extension}"
+        
+        # Quick-look preview next to the output video, optionally replacing it
+        preview_path = None
+        if output_video_path and self.preview:
+            preview_path = preview_path_for(output_video_path)
+            if self.preview_only:
+                output_video_path = None
         
-        # Initialize video processor
+        # Stage timers, optionally streamed as JSON lines next to the output CSV
+        # (a resumed run continues the interrupted run's stream)
+        progress_path = None
+        if self.progress_stream and self.output_csv_path:
+            progress_path = os.path.splitext(self.output_csv_path)[0] + ".progress.jsonl"
+        self.profiler = PipelineProfiler(progress_path, append=checkpoint is not None)
+        
+        # Initialize video processor (no writer when only trajectories are needed)
         self.video_processor = VideoProcessor(
             self.video_path, 
-            self.output_video_path,
+            output_video_path,
             start_time=self.start_time,
-            end_time=self.end_time
+            end_time=self.end_time,
+            stride=self.frame_stride,
+            frame_range=self.frame_range,
+            profiler=self.profiler,
+            live=self.live,
+            decoder=self.decoder,
+            decoder_scale=self.decoder_scale,
+            encoder=self.encoder,
+            preview_path=preview_path
         )
         self.video_processor.initialize()
         
@@ -75,25 +195,201 @@ class VehicleTracker:
             self.video_processor.frame_height
         )
         
-        # Initialize speed calculator
-        self.speed_calculator = SpeedCalculator(self.video_processor.fps)
+        # Work out what the model sees: ROI crop, downscale and inference size
+        self._configure_model_input()
+        
+        # Look up cached detections for this video, model and frame range
+        if self.detection_cache:
+            self._open_detection_cache()
+        
+        # Gate inference on motion (replays are already cheap and recordings need every frame)
+        if self.use_motion_gate:
+            if self.detection_replay is None and self.detection_recorder is None:
+                self.motion_gate = MotionGate(self.coordinate_transformer.roi_crop_rect())
+                print(f"Motion gate: comparing {self.motion_gate.size[0]}x{self.motion_gate.size[1]} ROI images, "
+                      f"detection forced every {self.motion_gate.max_gated_frames + 1} frames")
+            else:
+                print("Motion gate disabled while the detection cache is in use")
+        
+        # Record tracked boxes next to the output CSV
+        if self.track_cache and self.output_csv_path:
+            self.track_recorder = TrackRecorder()
+            print(f"Recording tracks to {track_cache_path_for(self.output_csv_path)}")
+        
+        # Initialize the detector backend (not needed when replaying cached detections or using a detector)
+        if self.detection_replay is not None:
+            self.class_names = self.detection_replay.class_names
+        elif self.detector is not None:
+            self.class_names = self.detector.class_names
+        else:
+            if self.backend is None:
+                self.backend = create_detector_backend(
+                    self.detector_backend, self.model_path, model=self.model, imgsz=self.imgsz
+                )
+            print(f"Detector backend: {self.backend.name}")
+            self.class_names = self.backend.class_names
+        
+        # Initialize speed filter (frame numbers keep their true gaps when striding)
+        self.speed_estimator = SpeedEstimator(self.video_processor.fps)
+        
+        # Initialize tracker at the rate frames actually reach it
+        self.tracker = sv.ByteTrack(frame_rate=max(1, round(self.video_processor.effective_fps)))
         
-        # Initialize tracker
-        self.tracker = sv.ByteTrack(frame_rate=self.video_processor.fps)
+        # Only retire tracks ByteTrack has dropped for good, so an ID never comes back
+        self.retire_after = max(self.track_retire_frames, getattr(self.tracker, 'max_time_lost', 30))
         
         # Initialize annotators
-        self.box_annotator = sv.BoxAnnotator(thickness=BOX_THICKNESS)
-        self.trace_annotator = sv.TraceAnnotator(
-            thickness=BOX_THICKNESS, 
-            trace_length=TRACE_LENGTH
-        )
+        if not self.trajectories_only:
+            self.box_annotator = sv.BoxAnnotator(thickness=BOX_THICKNESS)
+            self.trace_annotator = sv.TraceAnnotator(
+                thickness=BOX_THICKNESS, 
+                trace_length=TRACE_LENGTH
+            )
         
         # Initialize CSV exporter
-        self.csv_exporter = CSVExporter(self.output_csv_path)
+        self.csv_exporter = CSVExporter(
+            self.output_csv_path,
+            interpolation_gap=self.video_processor.stride,
+            flush_rows=LIVE_CSV_FLUSH_ROWS if self.live else CSV_FLUSH_ROWS,
+            compact=self.compact_export
+        )
         self.csv_exporter.set_coordinate_transformer(self.coordinate_transformer)
         
+        # Settings a checkpoint must share with the run that resumes it
+        # (live sources, which may be device indexes, keep their name as given)
+        self.run_identity = {
+            'video_path': str(self.video_path) if self.live else os.path.abspath(self.video_path),
+            'frame_range': (self.video_processor.start_frame, self.video_processor.end_frame),
+            'stride': self.video_processor.stride,
+            'streaming_export': self.streaming_export
+        }
+        if checkpoint is not None:
+            self._restore_checkpoint(checkpoint)
+        
         print("Vehicle tracker initialized successfully!")
     
+    def _open_detection_cache(self):
+        """Replay cached detections if this run was seen before, otherwise record them."""
+        video = self.video_processor
+        settings = self.model_input.cache_settings()
+        if video.decoder_scale is not None:
+            settings['decoder_scale'] = video.decoder_scale
+        key = detection_cache_key(
+            self.video_path,
+            self.model_path,
+            (video.start_frame, video.end_frame),
+            video.stride,
+            backend=self.backend.name if self.backend is not None else self.detector_backend,
+            imgsz=self.imgsz,
+            **settings
+        )
+        self.detection_cache_path = detection_cache_path(key)
+        
+        if os.path.exists(self.detection_cache_path):
+            self.detection_replay = DetectionReplay(self.detection_cache_path)
+            print(f"Replaying {len(self.detection_replay)} cached frames from {self.detection_cache_path}")
+            
+            # Without annotation the frames themselves are never needed
+            if self.trajectories_only:
+                video.decode_frames = False
+        else:
+            self.detection_recorder = DetectionRecorder()
+            print(f"Recording detections to {self.detection_cache_path}")
+    
+    def _save_checkpoint(self, next_frame):
+        """Save everything needed to continue the run at next_frame."""
+        save_checkpoint(self.checkpoint_path, {
+            'run': self.run_identity,
+            'next_frame': min(next_frame, self.video_processor.end_frame),
+            # Attributes rather than the object: supervision may expose ByteTrack
+            # through a proxy class that can't be pickled by reference
+            'tracker_state': vars(self.tracker),
+            'vehicle_data': self.vehicle_data,
+            'tracker_updates': self.tracker_updates,
+            'last_seen': self.last_seen,
+            'trace_annotator': self.trace_annotator,
+            'detection_recorder': self.detection_recorder,
+            'track_recorder': self.track_recorder,
+            'motion_gate': self.motion_gate,
+            'last_tracked': self.last_tracked,
+            'speed_estimator': self.speed_estimator,
+            'csv': self.csv_exporter.checkpoint() if self.streaming_export else None
+        })
+    
+    def _restore_checkpoint(self, checkpoint):
+        """Restore the state of an interrupted run and skip the frames it processed."""
+        if checkpoint['run'] != self.run_identity:
+            raise ValueError(f"Checkpoint {self.checkpoint_path} was written for a different run: "
+                             f"{checkpoint['run']}")
+        
+        self.tracker.__dict__.update(checkpoint['tracker_state'])
+        self.vehicle_data = checkpoint['vehicle_data']
+        self.tracker_updates = checkpoint['tracker_updates']
+        self.last_seen = checkpoint['last_seen']
+        self.csv_resume_state = checkpoint['csv']
+        if self.trace_annotator is not None and checkpoint['trace_annotator'] is not None:
+            self.trace_annotator = checkpoint['trace_annotator']
+        if self.detection_recorder is not None and checkpoint['detection_recorder'] is not None:
+            self.detection_recorder = checkpoint['detection_recorder']
+        if self.track_recorder is not None and checkpoint.get('track_recorder') is not None:
+            self.track_recorder = checkpoint['track_recorder']
+        if checkpoint.get('speed_estimator') is not None:
+            self.speed_estimator = checkpoint['speed_estimator']
+        if self.motion_gate is not None and checkpoint['motion_gate'] is not None:
+            self.motion_gate = checkpoint['motion_gate']
+            self.last_tracked = checkpoint['last_tracked']
+            
+            # Gate counts cover this run only, like its frame count, timing and detections
+            self.motion_gate.gated_frames = 0
+            self.motion_gate.checked_frames = 0
+        
+        self.video_processor.resume_from(checkpoint['next_frame'])
+        print(f"Resuming from frame {checkpoint['next_frame']} "
+              f"({len(self.vehicle_data)} active tracks restored)")
+    
+    def _after_frames(self, frame_numbers):
+        """Save a checkpoint once checkpoint_interval frames were processed since the last one."""
+        if self.checkpoint_interval <= 0 or self.checkpoint_path is None:
+            return
+        
+        self.frames_since_checkpoint += len(frame_numbers)
+        if self.frames_since_checkpoint >= self.checkpoint_interval:
+            checkpoint_start = time.perf_counter()
+            self._save_checkpoint(frame_numbers[-1] + self.video_processor.stride)
+            self.profiler.add('checkpoint', time.perf_counter() - checkpoint_start)
+            self.frames_since_checkpoint = 0
+    
+    def _configure_model_input(self):
+        """Set up the ROI crop, downscale and inference size for this camera."""
+        frame_width = self.video_processor.frame_width
+        frame_height = self.video_processor.frame_height
+        
+        crop_rect = self.coordinate_transformer.roi_crop_rect() if self.roi_crop else None
+        self.model_input = ModelInputTransform(
+            frame_width,
+            frame_height,
+            crop_rect=crop_rect,
+            downscale=self.inference_downscale
+        )
+        
+        # Explicit size, then the per-camera setting, then the global default
+        # (cameras are keyed by file name, or device index as a string for live capture)
+        self.imgsz = self.inference_size
+        if self.imgsz is None:
+            camera = os.path.basename(str(self.video_path))
+            self.imgsz = CAMERA_INFERENCE_SIZES.get(camera, INFERENCE_IMAGE_SIZE)
+        
+        if crop_rect is not None:
+            x1, y1, x2, y2 = crop_rect
+            print(f"ROI crop inference: {x2 - x1}x{y2 - y1} at ({x1}, {y1}), "
+                  f"{(x2 - x1) * (y2 - y1) / (frame_width * frame_height) * 100:.1f}% of the frame")
+        print(f"Model input: {self.model_input.input_width}x{self.model_input.input_height}, "
+              f"imgsz {self.imgsz or 'model default'}")
+    
+    def _model_classes(self):
+        """Classes the backend keeps: every class when recording the cache, otherwise vehicles."""
+        return None if self.detection_recorder is not None else VEHICLE_CLASS_IDS
+    
     def process_frame(self, frame, frame_number):
         """
         Process a single frame for vehicle detection and tracking.
@@ -105,74 +401,252 @@ class VehicleTracker:
         Returns:
             Processed frame with annotations
         """
-        # Draw ROI
-        frame = self.coordinate_transformer.draw_roi(frame)
+        return self.process_batch([frame], [frame_number])[0]
+    
+    def process_batch(self, frames, frame_numbers):
+        """
+        Process a batch of consecutive frames with a single YOLO call.
+        
+        Detections are handed to the tracker one frame at a time in order,
+        so tracking results match frame-by-frame processing.
+        
+        Args:
+            frames: List of input video frames
+            frame_numbers: Frame number of each frame
+            
+        Returns:
+            list: Processed frames with annotations
+        """
+        # Decide which frames need the model at all
+        if self.motion_gate is not None:
+            gate_start = time.perf_counter()
+            needs_detection = [self.motion_gate.needs_detection(frame) for frame in frames]
+            self.profiler.add('gate', time.perf_counter() - gate_start, len(frames))
+        else:
+            needs_detection = [True] * len(frames)
+        
+        # Run YOLO detection on the whole batch, before anything is drawn on the frames
+        detected = [i for i, needed in enumerate(needs_detection) if needed]
+        detections_batch = []
+        if detected:
+            detect_start = time.perf_counter()
+            detections_batch = self._detect([frames[i] for i in detected], [frame_numbers[i] for i in detected])
+            self.profiler.add('detect', time.perf_counter() - detect_start, len(detected))
+            self.detection_count += sum(len(detections) for detections in detections_batch)
+        detections_batch = iter(detections_batch)
+        
+        # Gated frames advance the tracker with the boxes it predicts for them
+        processed_frames = [
+            self._track_frame(
+                frame,
+                next(detections_batch) if needed else self._gated_detections(),
+                frame_number
+            )
+            for frame, needed, frame_number in zip(frames, needs_detection, frame_numbers)
+        ]
+        self._after_frames(frame_numbers)
+        return processed_frames
+    
+    def process_detections(self, frame, xyxy, confidence, class_id, frame_number):
+        """
+        Track and annotate a frame whose detections were computed elsewhere.
+        
+        Used by the multi-process inference pool, where workers run YOLO and
+        this process consumes their detections in frame order.
+        
+        Args:
+            frame: Input video frame
+            xyxy: Detected boxes as an (N, 4) array
+            confidence: Detection confidences
+            class_id: Detection class ids
+            frame_number: Current frame number
+            
+        Returns:
+            Processed frame with annotations
+        """
+        if self.detection_recorder is not None:
+            self.detection_recorder.add(frame_number, xyxy, confidence, class_id)
+        
+        detections = self._filter_vehicles(sv.Detections(
+            xyxy=xyxy,
+            confidence=confidence,
+            class_id=class_id
+        ))
+        self.detection_count += len(detections)
+        processed_frame = self._track_frame(frame, detections, frame_number)
+        self._after_frames([frame_number])
+        return processed_frame
+    
+    def _detect(self, frames, frame_numbers):
+        """
+        Run YOLO on a list of frames and keep vehicle detections only.
+        
+        Detections come from the cache when replaying, or from the detector
+        hook when one is set. When recording, the model runs without a class
+        filter so the cache holds every class.
+        
+        Returns:
+            list: sv.Detections for each frame
+        """
+        if self.detection_replay is not None:
+            return [
+                self._filter_vehicles(self.detection_replay.detections(frame_number))
+                for frame_number in frame_numbers
+            ]
+        
+        if self.detector is not None:
+            raw_batch = self.detector(frames, frame_numbers)
+        else:
+            raw_batch = self._run_model(frames)
+        
+        detections_batch = []
+        for detections, frame_number in zip(raw_batch, frame_numbers):
+            if self.detection_recorder is not None:
+                self.detection_recorder.add(
+                    frame_number, detections.xyxy, detections.confidence, detections.class_id
+                )
+            detections_batch.append(self._filter_vehicles(detections))
+        return detections_batch
+    
+    def _run_model(self, frames):
+        """Run the detector backend on a list of frames and get their detections in full-frame coordinates."""
+        # Crops are views, so nothing is copied unless the frames are downscaled
+        if not self.model_input.is_identity:
+            frames = [self.model_input.apply(frame) for frame in frames]
         
-        # Run YOLO detection
-        results = self.model(frame, verbose=False)[0]
-        detections = sv.Detections.from_ultralytics(results)
+        detections_batch = self.backend.detect(frames, classes=self._model_classes(), imgsz=self.imgsz)
+        for detections in detections_batch:
+            detections.xyxy = self.model_input.boxes_to_frame(detections.xyxy)
+        return detections_batch
+    
+    def _gated_detections(self):
+        """
+        Detections for a frame the motion gate skipped: the tracker's prediction of the last tracked boxes.
+        
+        Each box is moved one frame along its track's Kalman velocity, so
+        ByteTrack and the speed filter see vehicles keep moving instead of a
+        stale position. Tracks ByteTrack no longer follows are dropped.
+        """
+        if self.last_tracked is None:
+            return sv.Detections.empty()
         
-        # Filter detections for vehicles only
-        mask = np.array([
-            class_id in VEHICLE_CLASS_IDS 
-            for class_id in detections.class_id
-        ])
-        detections = detections[mask]
+        # Kalman state of each followed track: center x, center y, aspect ratio,
+        # height, then their velocities per frame
+        states = {
+            track.external_track_id: track.mean
+            for track in self.tracker.tracked_tracks
+            if track.mean is not None
+        }
+        followed = np.array([tracker_id in states for tracker_id in self.last_tracked.tracker_id.tolist()], dtype=bool)
+        if not followed.any():
+            return sv.Detections.empty()
         
+        means = np.array([states[tracker_id] for tracker_id in self.last_tracked.tracker_id[followed].tolist()])
+        center_x, center_y, aspect, height = (means[:, :4] + means[:, 4:8]).T
+        half_width = aspect * height / 2
+        half_height = height / 2
+        return sv.Detections(
+            xyxy=np.stack([
+                center_x - half_width, center_y - half_height,
+                center_x + half_width, center_y + half_height
+            ], axis=1).astype(np.float32),
+            confidence=self.last_tracked.confidence[followed],
+            class_id=self.last_tracked.class_id[followed]
+        )
+    
+    def _filter_vehicles(self, detections):
+        """Keep only detections of vehicle classes."""
+        return detections[np.isin(detections.class_id, VEHICLE_CLASS_IDS)]
+    
+    def _track_frame(self, frame, detections, frame_number):
+        """Update tracks with a frame's detections and annotate the frame."""
         if len(detections) == 0:
-            return frame  # Return the frame if no vehicles detected
+            # Return the frame if no vehicles detected
+            self.last_tracked = None
+            if self.track_recorder is not None:
+                self.track_recorder.add(frame_number, detections.xyxy, [], detections.class_id)
+            return self._annotate_frame(frame, detections, [])
         
         # Update tracks
+        track_start = time.perf_counter()
         detections = self.tracker.update_with_detections(detections)
+        self.last_tracked = detections
+        self.tracker_updates += 1
+        for tracker_id in detections.tracker_id.tolist():
+            self.last_seen[tracker_id] = self.tracker_updates
+        if self.track_recorder is not None:
+            self.track_recorder.add(frame_number, detections.xyxy, detections.tracker_id, detections.class_id)
+        self.profiler.add('track', time.perf_counter() - track_start)
         
-        # Process each tracked vehicle
-        for confidence, class_id, tracker_id, box in zip(
-            detections.confidence, 
-            detections.class_id, 
-            detections.tracker_id, 
-            detections.xyxy
-        ):
-            self._process_vehicle(box, tracker_id, class_id, frame_number, frame)
+        if self.streaming_export:
+            export_start = time.perf_counter()
+            self._retire_tracks()
+            self.profiler.add('export', time.perf_counter() - export_start)
         
-        # Apply annotations
-        frame = self.trace_annotator.annotate(scene=frame.copy(), detections=detections)
-        frame = self.box_annotator.annotate(scene=frame, detections=detections)
+        # Box centers, ROI membership and bird's eye positions for all vehicles at once
+        vehicles_start = time.perf_counter()
+        boxes = detections.xyxy.astype(int)
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        in_roi = self.coordinate_transformer.points_in_roi(centers)
+        transformed_points = self.coordinate_transformer.transform_points_to_birds_eye(centers[in_roi])
         
-        return frame
-    
-    def _process_vehicle(self, box, tracker_id, class_id, frame_number, frame):
-        """Process a single tracked vehicle."""
-        # Get center point of bounding box
-        x1, y1, x2, y2 = box.astype(int)
-        center_x = (x1 + x2) / 2
-        center_y = (y1 + y2) / 2
-        center_point = np.array([center_x, center_y])
+        # Update the speeds of all vehicles inside the ROI in one step
+        tracker_ids = detections.tracker_id[in_roi]
+        speeds_display, speeds_simulation = self.speed_estimator.update(
+            tracker_ids, 
+            transformed_points, 
+            frame_number
+        )
         
-        # Check if vehicle is in ROI
-        if not self.coordinate_transformer.point_in_roi(center_point):
-            return
+        # Record each tracked vehicle inside the ROI
+        labels = []
+        for box, tracker_id, class_id, transformed_point, speed_display, speed_simulation in zip(
+            boxes[in_roi], 
+            tracker_ids, 
+            detections.class_id[in_roi], 
+            transformed_points,
+            speeds_display.tolist(),
+            speeds_simulation.tolist()
+        ):
+            self._process_vehicle(tracker_id, transformed_point, frame_number, speed_simulation)
+            labels.append((box, tracker_id, class_id, speed_display))
+        self.profiler.add('vehicles', time.perf_counter() - vehicles_start)
         
-        # Transform point to bird's eye view
-        transformed_point = self.coordinate_transformer.transform_to_birds_eye(center_point)
+        return self._annotate_frame(frame, detections, labels)
+    
+    def _process_vehicle(self, tracker_id, transformed_point, frame_number, speed_simulation):
+        """Record a tracked vehicle's bird's eye position and filtered simulation speed."""
+        # Store tracking data
+        trajectory = self.vehicle_data.track(tracker_id)
+        trajectory.append(frame_number, transformed_point, speed_simulation)
+    
+    def _annotate_frame(self, frame, detections, labels):
+        """
+        Draw the ROI, vehicle labels, traces and boxes on a frame.
         
-        # Store initial position
-        if self.vehicle_data[tracker_id]['initial_position'] is None:
-            self.vehicle_data[tracker_id]['initial_position'] = transformed_point
+        Skipped entirely in trajectories-only mode, where the frame is returned
+        untouched and never copied.
+        """
+        if self.trajectories_only:
+            return frame
         
-        # Store tracking data
-        self.vehicle_data[tracker_id]['positions'].append(transformed_point)
-        self.vehicle_data[tracker_id]['frames'].append(frame_number)
+        annotation_start = time.perf_counter()
         
-        # Calculate speeds
-        speed_display, speed_simulation = self.speed_calculator.calculate_speeds(
-            self.vehicle_data[tracker_id]['positions'],
-            self.vehicle_data[tracker_id]['frames']
-        )
+        # Draw ROI
+        frame = self.coordinate_transformer.draw_roi(frame)
         
-        self.vehicle_data[tracker_id]['speeds'].append(speed_simulation)
+        if len(detections) > 0:
+            # Draw vehicle labels
+            for box, tracker_id, class_id, speed_display in labels:
+                x1, y1 = box[:2]
+                self._draw_vehicle_annotation(frame, x1, y1, tracker_id, class_id, speed_display)
+            
+            # Apply annotations
+            frame = self.trace_annotator.annotate(scene=frame.copy(), detections=detections)
+            frame = self.box_annotator.annotate(scene=frame, detections=detections)
         
-        # Draw annotation
-        self._draw_vehicle_annotation(frame, x1, y1, tracker_id, class_id, speed_display)
+        self.profiler.add('annotate', time.perf_counter() - annotation_start)
+        return frame
     
     def _draw_vehicle_annotation(self, frame, x1, y1, tracker_id, class_id, speed_display):
         """Draw vehicle annotation on frame."""
@@ -187,6 +661,71 @@ class VehicleTracker:
             FONT_THICKNESS
         )
     
+    def _report_throughput(self):
+        """Report throughput and the cost of annotation and encoding."""
+        processed_count = self.video_processor.processed_count
+        processing_time = self.video_processor.processing_time
+        if processing_time <= 0:
+            return
+        
+        print(f"Throughput: {processed_count / processing_time:.1f} fps")
+        print(f"Inference setting: {self.model_input.input_width}x{self.model_input.input_height} input, "
+              f"imgsz {self.imgsz or 'model default'} - {processed_count / processing_time:.1f} fps, "
+              f"{self.detection_count} vehicle detections "
+              f"({self.detection_count / max(processed_count, 1):.2f} per frame)")
+        if self.motion_gate is not None:
+            gate = self.motion_gate
+            print(f"Motion gate: {gate.gated_frames} of {gate.checked_frames} frames gated "
+                  f"({gate.gated_frames / max(gate.checked_frames, 1) * 100:.1f}%), "
+                  f"{gate.checked_frames - gate.gated_frames} ran the model")
+        
+        # Measured gain against the last run of this range in the other output mode
+        fps = processed_count / processing_time
+        other_run = self._previous_profile_report()
+        if self.trajectories_only:
+            if other_run is not None:
+                print(f"Trajectories-only mode: {fps:.1f} fps against {other_run['fps']:.1f} fps "
+                      f"measured on the last annotated run of this range ({fps / other_run['fps']:.2f}x)")
+            else:
+                print("Trajectories-only mode: annotation and video encoding skipped "
+                      "(run the same range with annotation once to measure the gain)")
+            return
+        
+        annotation_time = self.profiler.total('annotate')
+        output_time = annotation_time + self.video_processor.encode_time
+        print(f"Annotation: {annotation_time:.1f}s, encoding: {self.video_processor.encode_time:.1f}s "
+              f"({output_time / processing_time * 100:.1f}% of processing time)")
+        if other_run is not None:
+            print(f"Trajectories-only mode: {other_run['fps']:.1f} fps measured on the last run of this range "
+                  f"({other_run['fps'] / fps:.2f}x)")
+            return
+        
+        # Without a measurement, estimate from the stage timings (an upper bound
+        # when encoding overlaps inference in pipelined mode)
+        remaining_time = max(processing_time - output_time, 1e-9)
+        print(f"Trajectories-only mode (estimate from the annotate and encode timings, not measured): "
+              f"up to {processed_count / remaining_time:.1f} fps ({processing_time / remaining_time:.2f}x)")
+    
+    def _retire_tracks(self, retire_all=False):
+        """
+        Stream out tracks that ByteTrack has not seen for retire_after updates.
+        
+        Retired trajectories are handed to the CSV exporter and dropped from
+        memory, so memory stays bounded on long videos.
+        
+        Args:
+            retire_all: Retire every remaining track (end of video)
+        """
+        retired = [
+            tracker_id for tracker_id, seen in self.last_seen.items()
+            if retire_all or self.tracker_updates - seen > self.retire_after
+        ]
+        for tracker_id in retired:
+            del self.last_seen[tracker_id]
+            if tracker_id in self.vehicle_data:
+                self.csv_exporter.write_trajectory(tracker_id, self.vehicle_data.pop(tracker_id))
+        self.speed_estimator.release(retired)
+    
     def process_video(self):
         """Process the entire video."""
         print(f"Starting vehicle detection and tracking for simulation data...")
@@ -194,16 +733,191 @@ class VehicleTracker:
         print(f"Using YOLO model: {self.model_path}")
         print(f"Output CSV format: frame_id,vehicle_id,world_x,world_y,speed")
         
-        # Process video
-        with self.video_processor:
-            self.video_processor.process_video(self.process_frame)
-        
-        # Export CSV data
-        print("Saving tracking data to CSV...")
-        if self.csv_exporter.validate_data(self.vehicle_data):
-            self.csv_exporter.export_vehicle_data(self.vehicle_data)
+        if self.streaming_export:
+            self._process_video_streaming()
         else:
+            self.track_video()
+            
+            # Export CSV data
+            print("Saving tracking data to CSV...")
+            export_start = time.perf_counter()
+            if self.csv_exporter.validate_data(self.vehicle_data):
+                self.csv_exporter.export_vehicle_data(self.vehicle_data)
+            else:
+                print("No valid tracking data to export")
+            self.profiler.add('export', time.perf_counter() - export_start)
+        
+        # The run is complete, so it no longer needs its checkpoint
+        if self.checkpoint_path is not None:
+            remove_checkpoint(self.checkpoint_path)
+        
+        self._write_profile_report()
+    
+    def _write_profile_report(self):
+        """Print the per-stage timings and save them as JSON next to the output CSV."""
+        self.profiler.close()
+        
+        print("Stage timings (percentiles per frame or call):")
+        for name, stage in self.profiler.summary().items():
+            print(f"  {name:<12} {stage['total_s']:8.2f}s  p50 {stage['p50_ms']:8.2f}ms  "
+                  f"p95 {stage['p95_ms']:8.2f}ms  p99 {stage['p99_ms']:8.2f}ms  ({stage['count']} samples)")
+        
+        if not self.profile_report or not self.output_csv_path:
+            return
+        
+        report_path = self._profile_report_path()
+        self.profiler.write_report(
+            report_path,
+            output_csv=self.output_csv_path,
+            **self._profile_run_info(),
+            **self.summary()
+        )
+        print(f"Profile report saved to: {report_path}")
+    
+    def _profile_report_path(self):
+        """Get the profile report next to the output CSV."""
+        return os.path.splitext(self.output_csv_path)[0] + ".profile.json"
+    
+    def _profile_run_info(self):
+        """Get what a profile report records about the run, besides its timings."""
+        return {
+            'video': self.video_path,
+            'frame_range': [self.video_processor.start_frame, self.video_processor.end_frame],
+            'stride': self.video_processor.stride,
+            'backend': self.backend.name if self.backend is not None else self.detector_backend,
+            'trajectories_only': self.trajectories_only
+        }
+    
+    def _previous_profile_report(self):
+        """
+        Load the profile report of the last run of the same range in the other output mode.
+        
+        Returns:
+            dict: The report, or None when there is none to compare against
+        """
+        if not self.profile_report or not self.output_csv_path:
+            return None
+        
+        try:
+            with open(self._profile_report_path()) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        run_info = dict(self._profile_run_info(), trajectories_only=not self.trajectories_only)
+        if any(report.get(key) != value for key, value in run_info.items()) or not report.get('fps'):
+            return None
+        return report
+    
+    def _process_video_streaming(self):
+        """Process the video while streaming retired tracks to the CSV."""
+        print(f"Streaming tracks to CSV (retired after {self.retire_after} tracker updates unseen)")
+        
+        self.csv_exporter.open(resume_state=self.csv_resume_state)
+        completed = False
+        try:
+            self.track_video()
+            
+            # Flush the tracks still active at the end of the video
+            print("Saving remaining tracking data to CSV...")
+            self._retire_tracks(retire_all=True)
+            completed = True
+        finally:
+            self.csv_exporter.close(complete=completed)
+        
+        if self.csv_exporter.exported_vehicles == 0:
             print("No valid tracking data to export")
+        else:
+            print(f"Exported {self.csv_exporter.exported_vehicles} vehicle trajectories "
+                  f"({self.csv_exporter.exported_rows} rows)")
+    
+    def track_video(self):
+        """Detect and track vehicles over the frame range, collecting vehicle_data."""
+        with self.video_processor:
+            # The motion gate needs the tracker state of each frame, so it runs in-process
+            if self.live:
+                self.video_processor.process_video_live(self.process_batch)
+            elif (self.inference_workers > 0 and self.detection_replay is None and self.detector is None
+                    and self.motion_gate is None):
+                pool = InferencePool(
+                    self.video_processor,
+                    self.model_path,
+                    workers=self.inference_workers,
+                    backend=self.backend.name,
+                    classes=self._model_classes(),
+                    imgsz=self.imgsz,
+                    model_input=self.model_input
+                )
+                self.video_processor.process_video_pool(pool, self.process_detections)
+            else:
+                self.video_processor.process_video_batches(
+                    self.process_batch, 
+                    batch_size=self.batch_size,
+                    pipelined=self.pipelined
+                )
+        
+        self._report_throughput()
+        self._save_detection_cache()
+        self._save_track_cache()
+    
+    def _save_detection_cache(self):
+        """Persist recorded detections once the whole frame range was processed."""
+        if self.detection_recorder is None:
+            return
+        
+        recorded_frames = len(self.detection_recorder.frame_numbers)
+        if recorded_frames < self.video_processor.processing_frames:
+            print(f"Detection cache not saved: only {recorded_frames} of "
+                  f"{self.video_processor.processing_frames} frames were processed")
+            return
+        
+        self.detection_recorder.save(self.detection_cache_path, self.class_names)
+        print(f"Detection cache saved to: {self.detection_cache_path}")
+    
+    def _save_track_cache(self):
+        """Persist recorded tracks once the whole frame range was processed."""
+        if self.track_recorder is None:
+            return
+        
+        recorded_frames = len(self.track_recorder.frame_numbers)
+        if recorded_frames < self.video_processor.processing_frames:
+            print(f"Track cache not saved: only {recorded_frames} of "
+                  f"{self.video_processor.processing_frames} frames were processed")
+            return
+        
+        video = self.video_processor
+        cache_path = track_cache_path_for(self.output_csv_path)
+        self.track_recorder.save(
+            cache_path,
+            video=self.video_path,
+            frame_width=video.frame_width,
+            frame_height=video.frame_height,
+            fps=video.fps,
+            stride=video.stride,
+            frame_range=[video.start_frame, video.end_frame],
+            class_names={int(k): v for k, v in self.class_names.items()}
+        )
+        print(f"Track cache saved to: {cache_path}")
+    
+    def summary(self):
+        """
+        Get the key figures of the last run.
+        
+        Returns:
+            dict: Frames, timing, detections and exported vehicles
+        """
+        processed_count = self.video_processor.processed_count
+        processing_time = self.video_processor.processing_time
+        return {
+            'frames_processed': processed_count,
+            'processing_time': round(processing_time, 3),
+            'fps': round(processed_count / processing_time, 2) if processing_time > 0 else 0.0,
+            'vehicle_detections': self.detection_count,
+            'frames_gated': self.motion_gate.gated_frames if self.motion_gate is not None else 0,
+            'frames_dropped': self.video_processor.dropped_frames,
+            'vehicles_exported': self.csv_exporter.exported_vehicles,
+            'rows_exported': self.csv_exporter.exported_rows
+        }
     
     def run(self):
         """Run the complete vehicle tracking pipeline."""
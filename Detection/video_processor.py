@@ -3,19 +3,37 @@ Video processing utilities for vehicle detection and annotation.
 """
 
 import cv2
+import queue
+import threading
 import time
 from pathlib import Path
 from detection_config import *
+from detection_utils import PipelineProfiler
+from live_source import LiveFrameSource
+from ffmpeg_decoder import VIDEO_DECODERS, open_frame_reader, scaled_frame_size
+from ffmpeg_encoder import VIDEO_ENCODERS, FFmpegFrameWriter, preview_settings
 
 class VideoProcessor:
-    def __init__(self, input_path, output_path, start_time=None, end_time=None):
+    def __init__(self, input_path, output_path, start_time=None, end_time=None,
+                 stride=FRAME_STRIDE, frame_range=None, profiler=None, live=False,
+                 decoder=VIDEO_DECODER, decoder_scale=DECODER_SCALE, encoder=VIDEO_ENCODER,
+                 preview_path=None):
         self.input_path = input_path
-        self.output_path = output_path
+        self.output_path = output_path  # None skips video encoding (trajectories only)
+        self.preview_path = preview_path  # Quick-look clip encoded alongside (or instead of) the video
         self.cap = None
+        self.reader = None  # Where frames are read from: the capture itself or an ffmpeg decoder
         self.writer = None
+        self.preview_writer = None
+        self.encoder = encoder
+        self.profiler = profiler or PipelineProfiler()  # Times the decode and encode stages
+        self.processed_count = 0
+        self.processing_time = 0.0
         self.frame_width = 0
         self.frame_height = 0
+        self.source_size = (0, 0)  # Size of the video before decoder scaling
         self.fps = 0
+        self.source_fps = 0.0  # Exact (non-integer) frame rate, for seeking by time
         self.total_frames = 0
         self.video_duration = 0
         
@@ -25,28 +43,77 @@ class VideoProcessor:
         self.start_frame = 0
         self.end_frame = 0
         self.processing_frames = 0
+        self.frame_range = frame_range  # (start_frame, end_frame), overrides the time range
+        
+        # Frame sampling: only every stride-th frame is decoded and processed
+        self.stride = max(1, int(stride))
+        self.effective_fps = 0
+        
+        # When False, batches carry frame numbers with None frames and nothing is
+        # decoded (used when detections are replayed and no video is written)
+        self.decode_frames = True
+        
+        # Live mode: input_path is a capture source that only ever yields its
+        # freshest frame, end_time (if set) limits the capture duration
+        self.live = live
+        self.live_source = None
+        self.dropped_frames = 0
+        
+        # Decoder backend, and the factor the ffmpeg decoder scales frames by
+        self.decoder = decoder
+        self.decoder_scale = decoder_scale if decoder_scale != 1 else None
+    
+    @property
+    def has_writers(self):
+        """Whether processed frames are encoded to a video or a preview."""
+        return self.writer is not None or self.preview_writer is not None
+    
+    @property
+    def encode_time(self):
+        """Total seconds spent encoding the output video."""
+        return self.profiler.total('encode')
     
     def initialize(self):
         """Initialize video capture and writer."""
-        # Initialize video capture
+        if self.live:
+            self._initialize_live()
+            return
+        
+        if self.decoder not in VIDEO_DECODERS:
+            raise ValueError(f"Unknown video decoder '{self.decoder}', expected one of {', '.join(VIDEO_DECODERS)}")
+        if self.decoder_scale is not None and self.decoder != 'ffmpeg':
+            raise ValueError("Decoder scaling needs the ffmpeg decoder")
+        
+        # Initialize video capture (also reads the properties when ffmpeg decodes)
         self.cap = cv2.VideoCapture(self.input_path)
         if not self.cap.isOpened():
             raise ValueError(f"Could not open video file: {self.input_path}")
         
         self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         self.frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        self.fps = int(self.cap.get(cv2.CAP_PROP_FPS))
+        self.source_fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = int(self.source_fps)
         self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         self.video_duration = self.total_frames / self.fps if self.fps > 0 else 0
+        self.effective_fps = self.fps / self.stride
         
         # Calculate frame range for processing
         self._calculate_frame_range()
         
+        # Frames scaled in the decoder are all that the rest of the pipeline sees
+        self.source_size = (self.frame_width, self.frame_height)
+        self.frame_width, self.frame_height = scaled_frame_size(
+            self.frame_width, self.frame_height, self.decoder_scale
+        )
+        
         # Initialize video writer
         self._initialize_writer()
         
         print(f"Video initialized:")
-        print(f"  Resolution: {self.frame_width}x{self.frame_height}")
+        print(f"  Resolution: {self.source_size[0]}x{self.source_size[1]}")
+        if self.decoder_scale is not None:
+            print(f"  Decoded at: {self.frame_width}x{self.frame_height} (scale {self.decoder_scale:g})")
+        print(f"  Decoder: {self.decoder}")
         print(f"  FPS: {self.fps}")
         print(f"  Total frames: {self.total_frames}")
         print(f"  Video duration: {self._format_duration(self.video_duration)}")
@@ -54,11 +121,49 @@ class VideoProcessor:
         if self.start_time is not None or self.end_time is not None:
             print(f"  Processing range: {self._format_duration(self.start_time or 0)} to {self._format_duration(self.end_time or self.video_duration)}")
             print(f"  Processing frames: {self.start_frame} to {self.end_frame} ({self.processing_frames} frames)")
+        
+        if self.stride > 1:
+            print(f"  Frame stride: {self.stride} (effective {self.effective_fps:.1f} fps)")
+    
+    def _initialize_live(self):
+        """Open a live capture source and the writer."""
+        self.live_source = LiveFrameSource(self.input_path)
+        self.live_source.profiler = self.profiler
+        self.live_source.open()
+        
+        self.frame_width = self.live_source.frame_width
+        self.frame_height = self.live_source.frame_height
+        self.fps = self.live_source.fps
+        self.effective_fps = self.fps
+        self.stride = 1
+        self.start_frame = 0
+        self.end_frame = 0
+        self.processing_frames = 0
+        
+        self._initialize_writer()
+        
+        print(f"Live source initialized:")
+        print(f"  Source: {self.input_path}{' (file played at native rate)' if self.live_source.is_file else ''}")
+        print(f"  Resolution: {self.frame_width}x{self.frame_height}")
+        print(f"  FPS: {self.fps:g}")
+        if self.end_time is not None:
+            print(f"  Capture duration: {self._format_duration(self.end_time)}")
     
     def _calculate_frame_range(self):
         """Calculate the frame range to process based on time settings."""
         from detection_utils import validate_time_range
         
+        # An explicit frame range avoids rounding through seconds (used by shards)
+        if self.frame_range is not None:
+            self.start_frame = max(0, self.frame_range[0])
+            self.end_frame = min(self.total_frames, self.frame_range[1])
+            if self.start_frame >= self.end_frame:
+                raise ValueError(f"Invalid frame range: start={self.start_frame}, end={self.end_frame}")
+            self.start_time = self.start_frame / self.fps
+            self.end_time = self.end_frame / self.fps
+            self.processing_frames = len(range(self.start_frame, self.end_frame, self.stride))
+            return
+        
         # Validate and adjust time range
         start_time, end_time, is_valid = validate_time_range(
             self.start_time, self.end_time, self.video_duration
@@ -78,7 +183,24 @@ class VideoProcessor:
         # Ensure frame range is within bounds
         self.start_frame = max(0, self.start_frame)
         self.end_frame = min(self.total_frames, self.end_frame)
-        self.processing_frames = self.end_frame - self.start_frame
+        self.processing_frames = len(range(self.start_frame, self.end_frame, self.stride))
+    
+    def resume_from(self, frame_number):
+        """
+        Start processing at frame_number instead of the range start.
+        
+        Used to continue an interrupted run: the end of the range stays the
+        same, and frame_number must be a frame the stride would sample.
+        
+        Args:
+            frame_number: First frame still to process
+        """
+        if not self.start_frame <= frame_number <= self.end_frame:
+            raise ValueError(f"Resume frame {frame_number} is outside frames {self.start_frame} to {self.end_frame}")
+        
+        self.start_frame = frame_number
+        self.start_time = frame_number / self.fps
+        self.processing_frames = len(range(self.start_frame, self.end_frame, self.stride))
     
     def _format_duration(self, seconds):
         """Format duration in seconds to readable format."""
@@ -88,12 +210,40 @@ class VideoProcessor:
         return format_seconds_to_time(seconds)
     
     def _initialize_writer(self):
-        """Initialize video writer with fallback codec support."""
+        """Initialize the video and preview writers that have an output path."""
+        if self.encoder not in VIDEO_ENCODERS:
+            raise ValueError(f"Unknown video encoder '{self.encoder}', expected one of {', '.join(VIDEO_ENCODERS)}")
+        
+        if self.preview_path is not None:
+            preview_size, frame_step = preview_settings(self.frame_width, self.frame_height, self.effective_fps)
+            self.preview_writer = FFmpegFrameWriter(
+                self.preview_path,
+                (self.frame_width, self.frame_height),
+                self.effective_fps,
+                output_size=preview_size,
+                frame_step=frame_step,
+                crf=PREVIEW_CRF
+            )
+            print(f"Preview: {preview_size[0]}x{preview_size[1]} at {self.effective_fps / frame_step:.1f} fps "
+                  f"to {self.preview_path}")
+        
+        if self.output_path is None:
+            return
+        
+        if self.encoder == 'ffmpeg':
+            self.writer = FFmpegFrameWriter(
+                self.output_path,
+                (self.frame_width, self.frame_height),
+                self.effective_fps
+            )
+            print(f"Encoding with ffmpeg ({FFMPEG_CODEC}, preset {FFMPEG_PRESET}, CRF {FFMPEG_CRF})")
+            return
+        
         # Try primary codec first
         self.writer = cv2.VideoWriter(
             self.output_path,
             cv2.VideoWriter_fourcc(*PRIMARY_CODEC),
-            self.fps,
+            self.effective_fps,
             (self.frame_width, self.frame_height)
         )
         
@@ -103,7 +253,7 @@ class VideoProcessor:
             self.writer = cv2.VideoWriter(
                 self.output_path,
                 cv2.VideoWriter_fourcc(*FALLBACK_CODEC),
-                self.fps,
+                self.effective_fps,
                 (self.frame_width, self.frame_height)
             )
             
@@ -118,63 +268,429 @@ class VideoProcessor:
             frame_processor_func: Function that processes each frame
                                  Should accept (frame, frame_number) and return processed_frame
         """
-        if not self.cap or not self.writer:
+        def batch_processor_func(frames, frame_numbers):
+            return [
+                frame_processor_func(frame, frame_number)
+                for frame, frame_number in zip(frames, frame_numbers)
+            ]
+        
+        self.process_video_batches(batch_processor_func, batch_size=1)
+    
+    def process_video_batches(self, batch_processor_func, batch_size=INFERENCE_BATCH_SIZE,
+                              pipelined=False):
+        """
+        Process video in batches of consecutive frames within the specified time range.
+        
+        Args:
+            batch_processor_func: Function that processes a batch of frames
+                                 Should accept (frames, frame_numbers) and return
+                                 the processed frames in the same order
+            batch_size: Maximum number of frames handed to batch_processor_func at once
+            pipelined: Run decoding and encoding on worker threads so they overlap
+                       with batch_processor_func
+        """
+        if not self.cap:
             raise ValueError("Video processor not initialized. Call initialize() first.")
         
+        batch_size = max(1, int(batch_size))
+        
         print(f"\nStarting video processing...")
         print(f"Processing frames: {self.start_frame} to {self.end_frame} ({self.processing_frames} frames)")
+        if batch_size > 1:
+            print(f"Batch size: {batch_size} frames")
+        if pipelined:
+            print(f"Pipelined mode: decode and encode on worker threads (queue size {PIPELINE_QUEUE_SIZE})")
         
         # Seek to start frame
-        if self.start_frame > 0:
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
-            print(f"Seeking to frame {self.start_frame}...")
+        self._open_reader(batch_size, pipelined)
+        
+        start_time = time.time()
+        
+        if pipelined:
+            processed_count = self._run_pipelined(batch_processor_func, batch_size, start_time)
+        else:
+            processed_count = self._run_sequential(batch_processor_func, batch_size, start_time)
+        
+        self._report_completion(processed_count, start_time)
+    
+    def _open_reader(self, batch_size, pipelined):
+        """
+        Position the frame source at start_frame.
+        
+        The opencv decoder seeks the capture opened by initialize(). The ffmpeg
+        decoder starts an ffmpeg process that seeks on its input and reads into
+        a ring of frame buffers covering every frame the loop can hold at once:
+        one batch when sequential; when pipelined, the batch being decoded, the
+        queued batches, the one being processed and, with writers, the batches
+        waiting for and in the encoder.
+        """
+        if self.decoder == 'opencv':
+            if self.start_frame > 0:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+                print(f"Seeking to frame {self.start_frame}...")
+            self.reader = self.cap
+            return
+        
+        if not self.decode_frames:
+            self.reader = self.cap
+            return
+        
+        held_batches = 1
+        if pipelined:
+            held_batches = PIPELINE_QUEUE_SIZE + 2
+            if self.has_writers:
+                held_batches += PIPELINE_QUEUE_SIZE + 1
+        
+        self.reader = open_frame_reader(
+            self.input_path,
+            self.start_frame,
+            self.end_frame,
+            self.stride,
+            slots=held_batches * batch_size,
+            **self.reader_options()
+        )
+        print(f"Decoding with ffmpeg from frame {self.start_frame} ({held_batches * batch_size} frame buffers)")
+    
+    def reader_options(self):
+        """Decoder settings for opening a reader on the same video (see open_frame_reader)."""
+        return {
+            'decoder': self.decoder,
+            'frame_size': (self.frame_width, self.frame_height),
+            'source_size': self.source_size,
+            'fps': self.source_fps
+        }
+    
+    def process_video_pool(self, pool, frame_consumer_func):
+        """
+        Process video using detections produced by a multi-process inference pool.
+        
+        Args:
+            pool: InferencePool that decodes and runs inference in worker processes
+            frame_consumer_func: Function that tracks and annotates a frame
+                                Should accept (frame, xyxy, confidence, class_id, frame_number)
+                                and return processed_frame
+        """
+        if not self.cap:
+            raise ValueError("Video processor not initialized. Call initialize() first.")
+        
+        print(f"\nStarting video processing...")
+        print(f"Processing frames: {self.start_frame} to {self.end_frame} ({self.processing_frames} frames)")
         
-        frame_number = self.start_frame
         processed_count = 0
         start_time = time.time()
+        results = pool.results()
         
-        while self.cap.isOpened() and frame_number < self.end_frame:
-            ret, frame = self.cap.read()
-            if not ret:
+        while True:
+            # Time spent waiting on the pool's decoder and inference workers
+            wait_start = time.perf_counter()
+            result = next(results, None)
+            if result is None:
                 break
+            self.profiler.add('detect_wait', time.perf_counter() - wait_start)
+            frame, xyxy, confidence, class_id, frame_number = result
             
-            # Process frame
-            processed_frame = frame_processor_func(frame, frame_number)
-            self.writer.write(processed_frame)
+            # The frame lives in the shared ring, so write it before its slot is released
+            processed_frame = frame_consumer_func(frame, xyxy, confidence, class_id, frame_number)
+            self._write_frames([processed_frame])
             
             # Progress reporting
             if processed_count % PROGRESS_UPDATE_INTERVAL == 0:
                 self._report_progress(processed_count, start_time)
             
-            frame_number += 1
             processed_count += 1
         
-        # Final progress report
+        self._report_completion(processed_count, start_time)
+    
+    def process_video_live(self, batch_processor_func):
+        """
+        Process a live source frame by frame, always taking the freshest frame.
+        
+        Frames captured while a frame is being processed are dropped, except
+        the latest one. The end-to-end latency of every frame, from capture to
+        the end of processing and encoding, is recorded as the 'latency' stage.
+        Stops when the source ends, the capture duration is reached or on Ctrl+C.
+        
+        Args:
+            batch_processor_func: Function that processes a batch of frames
+                                 Should accept (frames, frame_numbers) and return
+                                 the processed frames in the same order
+        """
+        if not self.live_source:
+            raise ValueError("Live source not initialized. Call initialize() first.")
+        
+        print(f"\nStarting live processing (Ctrl+C to stop)...")
+        
+        processed_count = 0
+        start_time = time.time()
+        self.live_source.start()
+        try:
+            while True:
+                item = self.live_source.latest()
+                if item is None:
+                    break
+                frame, frame_number, capture_time = item
+                if self.end_time is not None and capture_time - self.live_source.start_time >= self.end_time:
+                    break
+                
+                processed_frames = batch_processor_func([frame], [frame_number])
+                self._write_frames(processed_frames)
+                self.profiler.add('latency', time.monotonic() - capture_time)
+                self.end_frame = frame_number + 1
+                
+                # Progress reporting
+                if processed_count % PROGRESS_UPDATE_INTERVAL == 0:
+                    self._report_progress(processed_count, start_time)
+                
+                processed_count += 1
+        except KeyboardInterrupt:
+            print("\nStopping live processing...")
+        finally:
+            self.live_source.stop()
+        
+        self.dropped_frames = self.live_source.dropped_frames
+        self.processing_frames = processed_count
+        self._report_completion(processed_count, start_time)
+        
+        latency = self.profiler.stage('latency').summary()
+        print(f"Dropped {self.dropped_frames} of {self.live_source.captured_frames} captured frames "
+              f"({self.dropped_frames / max(self.live_source.captured_frames, 1) * 100:.1f}%)")
+        print(f"End-to-end latency: p50 {latency['p50_ms']:.1f}ms, p95 {latency['p95_ms']:.1f}ms, "
+              f"p99 {latency['p99_ms']:.1f}ms")
+    
+    def _run_sequential(self, batch_processor_func, batch_size, start_time):
+        """Decode, process and encode batches one after another on the calling thread."""
+        processed_count = 0
+        
+        for frames, frame_numbers in self._iter_batches(batch_size):
+            # Process batch and write frames in their original order
+            processed_frames = batch_processor_func(frames, frame_numbers)
+            self._write_frames(processed_frames)
+            
+            # Progress reporting
+            if self._crossed_progress_interval(processed_count, len(frames)):
+                self._report_progress(processed_count, start_time)
+            
+            processed_count += len(frames)
+        
+        return processed_count
+    
+    def _run_pipelined(self, batch_processor_func, batch_size, start_time):
+        """
+        Run decode, processing and encode as three stages connected by bounded queues.
+        
+        Decoding and encoding happen on worker threads while the calling thread
+        runs batch_processor_func, so OpenCV I/O (which releases the GIL) overlaps
+        model compute. Each stage handles batches in arrival order, so frame order
+        is preserved, and the bounded queues block a stage that runs ahead.
+        
+        Returns:
+            int: Number of processed frames
+        """
+        decode_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        encode_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        stop_event = threading.Event()
+        errors = []
+        
+        def decode_worker():
+            try:
+                for batch in self._iter_batches(batch_size):
+                    if not self._queue_put(decode_queue, batch, stop_event):
+                        return
+            except Exception as e:
+                errors.append(e)
+                stop_event.set()
+            finally:
+                self._queue_put(decode_queue, None, stop_event)
+        
+        def encode_worker():
+            try:
+                while True:
+                    processed_frames = self._queue_get(encode_queue, stop_event)
+                    if processed_frames is None:
+                        return
+                    self._write_frames(processed_frames)
+            except Exception as e:
+                errors.append(e)
+                stop_event.set()
+        
+        workers = [threading.Thread(target=decode_worker, name="video-decode", daemon=True)]
+        if self.has_writers:
+            workers.append(threading.Thread(target=encode_worker, name="video-encode", daemon=True))
+        for worker in workers:
+            worker.start()
+        
+        processed_count = 0
+        try:
+            while True:
+                batch = self._queue_get(decode_queue, stop_event)
+                if batch is None:
+                    break
+                frames, frame_numbers = batch
+                
+                processed_frames = batch_processor_func(frames, frame_numbers)
+                if self.has_writers and not self._queue_put(encode_queue, processed_frames, stop_event):
+                    break
+                
+                # Progress reporting
+                if self._crossed_progress_interval(processed_count, len(frames)):
+                    self._report_progress(processed_count, start_time)
+                
+                processed_count += len(frames)
+            
+            if self.has_writers:
+                self._queue_put(encode_queue, None, stop_event)
+        except BaseException:
+            stop_event.set()
+            raise
+        finally:
+            for worker in workers:
+                worker.join()
+        
+        if errors:
+            raise errors[0]
+        
+        return processed_count
+    
+    def _write_frames(self, processed_frames):
+        """Encode processed frames, timing how long the writers take."""
+        if not self.has_writers:
+            return
+        write_start = time.perf_counter()
+        for processed_frame in processed_frames:
+            if self.writer:
+                self.writer.write(processed_frame)
+            if self.preview_writer:
+                self.preview_writer.write(processed_frame)
+        self.profiler.add('encode', time.perf_counter() - write_start, len(processed_frames))
+    
+    def _iter_batches(self, batch_size):
+        """Yield (frames, frame_numbers) batches from the current capture position to end_frame."""
+        frame_number = self.start_frame
+        while self.reader.isOpened() and frame_number < self.end_frame:
+            decode_start = time.perf_counter()
+            frames, frame_numbers = self._read_batch(frame_number, batch_size)
+            if not frames:
+                return
+            self.profiler.add('decode', time.perf_counter() - decode_start, len(frames))
+            yield frames, frame_numbers
+            
+            frame_number = frame_numbers[-1] + self.stride
+            if len(frames) < batch_size:
+                return
+    
+    def _read_batch(self, frame_number, batch_size):
+        """
+        Read up to batch_size sampled frames starting at frame_number.
+        
+        Frames between samples are skipped with grab(), which advances the
+        stream without decoding them (the ffmpeg decoder never outputs them).
+        
+        Returns:
+            tuple: (frames, frame_numbers), shorter than batch_size at the end of the range
+        """
+        if not self.decode_frames:
+            frame_numbers = list(range(frame_number, self.end_frame, self.stride))[:batch_size]
+            return [None] * len(frame_numbers), frame_numbers
+        
+        frames = []
+        frame_numbers = []
+        while len(frames) < batch_size and frame_number < self.end_frame:
+            ret, frame = self.reader.read()
+            if not ret:
+                break
+            frames.append(frame)
+            frame_numbers.append(frame_number)
+            
+            # Skip to the next sampled frame
+            for _ in range(min(self.stride, self.end_frame - frame_number) - 1):
+                if not self.reader.grab():
+                    break
+            frame_number += self.stride
+        return frames, frame_numbers
+    
+    @staticmethod
+    def _queue_put(q, item, stop_event):
+        """Put an item on a bounded queue, giving up if the pipeline is stopping."""
+        while True:
+            try:
+                q.put(item, timeout=PIPELINE_QUEUE_TIMEOUT)
+                return True
+            except queue.Full:
+                if stop_event.is_set():
+                    return False
+    
+    @staticmethod
+    def _queue_get(q, stop_event):
+        """Get an item from a queue, returning None if the pipeline is stopping."""
+        while True:
+            try:
+                return q.get(timeout=PIPELINE_QUEUE_TIMEOUT)
+            except queue.Empty:
+                if stop_event.is_set():
+                    return None
+    
+    @staticmethod
+    def _crossed_progress_interval(processed_count, batch_length):
+        """Check whether a batch covers a frame index on the progress interval."""
+        next_report = -processed_count % PROGRESS_UPDATE_INTERVAL
+        return next_report < batch_length
+    
+    def _report_completion(self, processed_count, start_time):
+        """Report the final processing summary."""
         elapsed_time = time.time() - start_time
+        self.processed_count = processed_count
+        self.processing_time = elapsed_time
         print(f"\n\nVideo processing completed in {elapsed_time:.1f} seconds")
         print(f"Processed {processed_count} frames at average {processed_count/elapsed_time:.1f} fps")
         
         if processed_count < self.processing_frames:
             print(f"Warning: Only processed {processed_count} of {self.processing_frames} expected frames")
+        
+        self.profiler.progress(processed_count, self.processing_frames, elapsed_time)
     
     def _report_progress(self, processed_count, start_time):
         """Report processing progress."""
         elapsed_time = time.time() - start_time
         progress = (processed_count / self.processing_frames) * 100 if self.processing_frames > 0 else 0
         frames_per_second = processed_count / elapsed_time if elapsed_time > 0 else 0
-        print(f"\rProcessing frame {processed_count}/{self.processing_frames} ({progress:.1f}%) - {frames_per_second:.1f} fps", end="")
+        if self.live_source:
+            print(f"\rProcessed {processed_count} live frames - {frames_per_second:.1f} fps, "
+                  f"{self.live_source.dropped_frames} dropped", end="")
+        else:
+            print(f"\rProcessing frame {processed_count}/{self.processing_frames} ({progress:.1f}%) - {frames_per_second:.1f} fps", end="")
+        self.profiler.progress(processed_count, self.processing_frames, elapsed_time)
     
     def cleanup(self):
         """Release video resources."""
+        if self.live_source:
+            self.live_source.stop()
+        if self.reader is not None and self.reader is not self.cap:
+            self.reader.release()
+            self.reader = None
         if self.cap:
             self.cap.release()
         if self.writer:
-            self.writer.release()
-        print(f"\nVideo saved to: {self.output_path}")
+            self._release_writer(self.writer, self.output_path, "Video")
+            self.writer = None
+        if self.preview_writer:
+            self._release_writer(self.preview_writer, self.preview_path, "Preview")
+            self.preview_writer = None
+    
+    @staticmethod
+    def _release_writer(writer, path, label):
+        """Finish a video file and report where it went."""
+        if writer.release() is False:
+            # Only the ffmpeg writer reports failures, its messages are already on the console
+            print(f"\nWarning: ffmpeg did not finish {path} cleanly")
+            return
+        print(f"\n{label} saved to: {path}")
     
     def __enter__(self):
         """Context manager entry."""
-        self.initialize()
+        # Initialize only once, the caller may already have opened the capture
+        # and writer to read the video properties
+        if self.cap is None and self.live_source is None:
+            self.initialize()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -187,17 +703,17 @@ class VideoProcessor:
         Validate that input files exist.
         
         Args:
-            video_path: Path to input video
-            model_path: Path to YOLO model
+            video_path: Path to input video (None for a live source)
+            model_path: Path to YOLO model (None when no model file is needed)
             
         Returns:
             bool: True if all files exist
         """
-        if not Path(video_path).exists():
+        if video_path is not None and not Path(video_path).exists():
             print(f"Error: Video file not found: {video_path}")
             return False
         
-        if not Path(model_path).exists():
+        if model_path is not None and not Path(model_path).exists():
             print(f"Error: YOLO model file not found: {model_path}")
             return False
         
@@ -1,6 +1,8 @@
 import pygame
+import numpy as np
 import pandas as pd
 import os
+import json
 import random
 from config import *
 
@@ -69,9 +71,9 @@ class CSVTrafficManager:
         self.load_csv_data()
         
     def load_csv_data(self):
-        """Load traffic data from CSV file"""
+        """Load traffic data, preferring the columnar .npz written next to the CSV"""
         try:
-            self.df = pd.read_csv(self.csv_file_path)
+            self.df = self.read_traffic_data(self.csv_file_path)
             self.max_frame = self.df['frame_id'].max()
             print(f"Loaded traffic data: {len(self.df)} entries, max frame: {self.max_frame}")
             
@@ -86,6 +88,65 @@ class CSVTrafficManager:
             print(f"Error loading CSV data: {e}")
             self.df = pd.DataFrame()
     
+    @staticmethod
+    def read_traffic_data(path):
+        """Read a traffic data CSV or its columnar .npz copy into a DataFrame"""
+        binary_path = os.path.splitext(path)[0] + '.npz'
+        if path.endswith('.npz') or (
+            os.path.exists(binary_path)
+            and (not os.path.exists(path) or os.path.getmtime(binary_path) >= os.path.getmtime(path))
+        ):
+            # Widen the compact column types to what read_csv would give
+            with np.load(binary_path) as data:
+                df = pd.DataFrame({name: data[name].astype(np.int64) for name in data.files})
+        else:
+            df = pd.read_csv(path)
+        
+        # Only compacted exports (marked by the file the exporter writes next to them) are expanded
+        compaction_path = os.path.splitext(path)[0] + '.compaction.json'
+        if not os.path.exists(compaction_path):
+            return df
+        with open(compaction_path) as f:
+            track_gaps = json.load(f)['gaps']
+        return CSVTrafficManager.expand_keyframes(df, track_gaps)
+    
+    @staticmethod
+    def expand_keyframes(df, track_gaps=()):
+        """Fill frame gaps within each vehicle's track by linear interpolation
+        
+        Compacted exports only keep the rows interpolation cannot restore, so
+        this rebuilds one row per frame for playback. The real gaps listed in
+        track_gaps, (vehicle_id, frame before, frame after), are left open.
+        """
+        columns = ['frame_id', 'vehicle_id', 'world_x', 'world_y', 'speed']
+        if df.empty or list(df.columns) != columns:
+            return df
+        
+        rows = df.to_numpy()
+        rows = rows[np.lexsort((rows[:, 0], rows[:, 1]))]
+        gaps = np.diff(rows[:, 0])
+        gaps[rows[1:, 1] != rows[:-1, 1]] = 1
+        if len(track_gaps):
+            track_gaps = np.asarray(track_gaps, dtype=np.int64)
+            keys = (rows[:-1, 1].astype(np.int64) << 32) | rows[:-1, 0].astype(np.int64)
+            gaps[np.isin(keys, (track_gaps[:, 0] << 32) | track_gaps[:, 1])] = 1
+        if (gaps <= 1).all():
+            return df
+        
+        # Each row is followed by (gap - 1) interpolated rows up to the next row of its vehicle
+        repeats = np.r_[np.maximum(gaps, 1), 1]
+        segment = np.repeat(np.arange(len(rows)), repeats)
+        offset = np.arange(len(segment)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        following = np.minimum(segment + 1, len(rows) - 1)
+        t = offset / repeats[segment]
+        
+        dense = np.empty((len(segment), len(columns)), dtype=rows.dtype)
+        dense[:, 0] = rows[segment, 0] + offset
+        dense[:, 1] = rows[segment, 1]
+        dense[:, 2:] = np.round(rows[segment, 2:] + t[:, None] * (rows[following, 2:] - rows[segment, 2:]))
+        dense = dense[np.lexsort((dense[:, 1], dense[:, 0]))]
+        return pd.DataFrame(dense, columns=columns)
+    
     def toggle(self):
         """Toggle traffic on/off"""
         self.enabled = not self.enabled